@@ -1,61 +1,382 @@
+import logging
 import os
+import signal
+import sys
+import time
+from contextlib import contextmanager
+from sqlite3 import Connection, Cursor
+from typing import Dict, Iterator
+
 import tornado.ioloop
 import tornado.web
 from tornado.web import RequestHandler, Application, StaticFileHandler
 import aiosqlite
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.options import define, options, parse_command_line
+from tornado.process import cpu_count
 
 from product_comparison_service.config import (
     PORT_ID,
     CACHE_MAX_LENGTH,
+    CACHE_MAX_BYTES,
+    CACHE_POLICY,
+    CACHE_INVALIDATION_INTERVAL,
+    CACHE_INVALIDATION_RETENTION,
     DATABASE,
+    DATABASE_POOL_SIZE,
+    DATABASE_PRAGMAS,
     LOGGING_FILE,
+    SEED_DATA,
+    REFETCH_LIMIT,
+    SEARCH_INDEX,
+    SUPPLIER_CLIENT,
+    SUPPLIER_DUMMY_DELAY,
+    SUPPLIER_BATCH_SIZE,
+    SUPPLIER_MAX_CONCURRENCY,
+    SUPPLIER_HTTP_MAX_CLIENTS,
+    SUPPLIER_TIMEOUT,
+    SUPPLIER_REFRESH_BUDGET,
+    SUPPLIER_FAILURE_THRESHOLD,
+    SUPPLIER_RESET_TIMEOUT,
+    REFRESH_AHEAD,
+    REFRESHER_INTERVAL,
+    REFRESHER_RATE_LIMIT,
+    REFRESHER_SUPPLIER_RATE_LIMIT,
+    REFRESHER_HIT_DECAY,
+    REFRESHER_MIN_HITS,
+    REFRESHER_MAX_OFFERS,
+    WRITE_BATCH_WINDOW,
+    WRITE_BATCH_SIZE,
+    WRITE_SYNCHRONOUS,
 )
 from product_comparison_service.data_classes.data_classes import (
     Supplier,
     Category,
     Product,
 )
-from product_comparison_service.handlers.handlers import ProductHandler, DocsHandler
-from product_comparison_service.cache.cachedict import CacheDict
-from product_comparison_service.database.database import setup_database
+from product_comparison_service.handlers.handlers import (
+    ProductHandler,
+    BatchSearchHandler,
+    BulkProductHandler,
+    DocsHandler,
+)
+from product_comparison_service.cache.invalidation import CacheInvalidations
+from product_comparison_service.cache.search_cache import SearchCache
+from product_comparison_service.cache.singleflight import SingleFlight
+from product_comparison_service.database.database import (
+    get_database_conn_and_cursor,
+    select_search_results,
+    setup_database,
+)
+from product_comparison_service.database.ingest import SHARD_TABLES, find_shards
+from product_comparison_service.database.loader import load_jsonl
+from product_comparison_service.database.pool import AsyncConnectionPool
+from product_comparison_service.database.rows import row_factory
+from product_comparison_service.database.search_index import SearchIndex
+from product_comparison_service.database.write_buffer import WriteBuffer
+from product_comparison_service.suppliers.clients import (
+    SupplierClient,
+    SupplierClients,
+    DummySupplierClient,
+    HTTPSupplierClient,
+)
+from product_comparison_service.suppliers.refresher import PriceRefresher
+
+LOG = logging.getLogger(__name__)
+
+define("reset_database", default=False, help="Delete the database before starting")
+define("seed", default=False, help="Load seed data into an empty database")
+define("workers", default=1, help="Server processes to fork, or 0 for one per CPU")
 
 
 def make_app():
     """
-    Create tornado app and database populated with test data.
+    Create tornado app, serving the database prepared by prepare_database.
     """
     app = Application(
-        [(r"/v0.1/product", ProductHandler), (r"/v0.1/docs", DocsHandler)]
+        [
+            (r"/v0.1/product", ProductHandler),
+            (r"/v0.1/product/batch", BatchSearchHandler),
+            (r"/v0.1/product/bulk", BulkProductHandler),
+            (r"/v0.1/docs", DocsHandler),
+        ]
+    )
+    # Search cache shared by all handlers; entries expire when results go stale
+    app.cache = SearchCache(
+        cache_len=CACHE_MAX_LENGTH,
+        ttl=REFETCH_LIMIT,
+        max_bytes=CACHE_MAX_BYTES,
+        policy=CACHE_POLICY,
     )
-    app.cache = CacheDict(cache_len=CACHE_MAX_LENGTH)
 
-    # Create and repopulate a fresh copy of the database for testing on app start-up
-    if os.path.exists(DATABASE):
-        os.remove(DATABASE)
-    else:
-        pass
+    # In-flight supplier refreshes, so concurrent identical searches share one
+    app.refreshes = SingleFlight()
 
-    # Create database
-    setup_database(DATABASE)
+    # Long-lived database connections shared by all handlers
+    app.db_pool = AsyncConnectionPool(
+        DATABASE,
+        size=DATABASE_POOL_SIZE,
+        pragmas=DATABASE_PRAGMAS,
+        row_factory=row_factory,
+    )
 
-    # Use CLI tool to auto-populate database is with test data.
-    os.system(
-        "python product_comparison_service/cli.py add_products product_comparison_service/batch_processing_data/products.jsonl"
+    # Single writer applying writes in group commits, on a connection of its own
+    app.writes = WriteBuffer(
+        AsyncConnectionPool(
+            DATABASE,
+            size=1,
+            pragmas=dict(DATABASE_PRAGMAS, synchronous=WRITE_SYNCHRONOUS),
+            row_factory=row_factory,
+        ),
+        window=WRITE_BATCH_WINDOW,
+        max_batch=WRITE_BATCH_SIZE,
     )
-    os.system(
-        "python product_comparison_service/cli.py add_suppliers product_comparison_service/batch_processing_data/suppliers.jsonl"
+
+    # Ranked search results held in memory, loaded by load_search_index
+    app.search_index = SearchIndex() if SEARCH_INDEX else None
+
+    # Search cache and index invalidations, shared with any other server
+    # processes
+    app.invalidations = CacheInvalidations(
+        app.cache,
+        app.db_pool,
+        interval=CACHE_INVALIDATION_INTERVAL,
+        retention=CACHE_INVALIDATION_RETENTION,
+        search_index=app.search_index,
+        writes=app.writes,
     )
-    os.system(
-        "python product_comparison_service/cli.py add_supplier_products product_comparison_service/batch_processing_data/supplier_products.jsonl"
+
+    # Clients used to re-price out of date search results
+    app.supplier_clients = SupplierClients(
+        default=make_supplier_client(),
+        supplier_timeout=SUPPLIER_TIMEOUT,
+        budget=SUPPLIER_REFRESH_BUDGET,
+        failure_threshold=SUPPLIER_FAILURE_THRESHOLD,
+        reset_timeout=SUPPLIER_RESET_TIMEOUT,
+    )
+
+    # Background refreshes keeping popular offers fresh
+    app.refresher = PriceRefresher(
+        app.cache,
+        app.db_pool,
+        app.supplier_clients,
+        refetch_limit=REFETCH_LIMIT,
+        refresh_ahead=REFRESH_AHEAD,
+        interval=REFRESHER_INTERVAL,
+        rate_limit=REFRESHER_RATE_LIMIT,
+        supplier_rate_limit=REFRESHER_SUPPLIER_RATE_LIMIT,
+        hit_decay=REFRESHER_HIT_DECAY,
+        min_hits=REFRESHER_MIN_HITS,
+        max_offers=REFRESHER_MAX_OFFERS,
+        search_index=app.search_index,
+        invalidations=app.invalidations,
     )
 
     return app
 
 
-if __name__ == "__main__":
-    import logging
+def prepare_database(
+    database: str, reset: bool = False, seed: bool = False
+) -> Dict[str, float]:
+    """
+    Get the database ready to serve from, returning the seconds taken by each
+    phase.
+
+    An existing database is kept, with its cached supplier prices, unless
+    reset is set. The schema is created or migrated as needed, and seed data
+    is bulk loaded in-process when seed is set and the database has no
+    products yet.
+    """
+    timings = {}
+
+    with timed(timings, "reset"):
+        if reset:
+            for path in (database, f"{database}-wal", f"{database}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    with timed(timings, "schema"):
+        setup_database(database)
+
+    with timed(timings, "seed"):
+        if seed:
+            conn, cursor = get_database_conn_and_cursor(database)
+            try:
+                cursor.execute("SELECT EXISTS (SELECT 1 FROM product)")
+                if not cursor.fetchone()[0]:
+                    seed_database(conn, cursor, SEED_DATA)
+            finally:
+                conn.close()
+
+    return timings
+
+
+def seed_database(conn: Connection, cursor: Cursor, path: str) -> Dict[str, int]:
+    """
+    Load the JSONL shards in path, in dependency order, returning the number of
+    rows loaded per table
+    """
+    shards = find_shards(path)
+    rows = {table: 0 for table in SHARD_TABLES}
+    for table in SHARD_TABLES:
+        for filename in shards[table]:
+            rows[table] += load_jsonl(conn, cursor, table, filename)
+    return rows
+
+
+@contextmanager
+def timed(timings: Dict[str, float], phase: str) -> Iterator[None]:
+    """
+    Record the seconds taken by a startup phase, and log them
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = time.perf_counter() - started
+        LOG.info("Startup phase %s took %.3fs", phase, timings[phase])
+
+
+def make_supplier_client() -> SupplierClient:
+    """
+    Create the default client for supplier APIs, as configured
+    """
+    if SUPPLIER_CLIENT == "http":
+        return HTTPSupplierClient(
+            batch_size=SUPPLIER_BATCH_SIZE,
+            max_concurrency=SUPPLIER_MAX_CONCURRENCY,
+            max_clients=SUPPLIER_HTTP_MAX_CLIENTS,
+        )
+    return DummySupplierClient(delay=SUPPLIER_DUMMY_DELAY)
+
+
+def serve(workers: int = 1) -> None:
+    """
+    Serve the app until interrupted, then close its database connections.
+
+    With workers other than 1, that many server processes (one per CPU for 0)
+    are forked to share the listening socket. Each builds its own app after the
+    fork, so database connections, caches and supplier clients are never
+    shared between processes, and search cache invalidations reach the other
+    processes through CacheInvalidations.
+    """
+    sockets = bind_sockets(PORT_ID)
+    if workers != 1:
+        fork_workers(workers)
 
-    logging.basicConfig(filename=LOGGING_FILE, level=logging.INFO)
     app = make_app()
-    app.listen(PORT_ID)
-    tornado.ioloop.IOLoop.current().start()
+    io_loop = tornado.ioloop.IOLoop.current()
+    if app.search_index is not None:
+        io_loop.run_sync(lambda: load_search_index(app))
+    server = HTTPServer(app)
+    server.add_sockets(sockets)
+    app.invalidations.start()
+    app.refresher.start()
+
+    def stop_on_signal(*_):
+        # Ignore repeated signals, which would cut the shutdown below short
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        io_loop.add_callback_from_signal(io_loop.stop)
+
+    signal.signal(signal.SIGTERM, stop_on_signal)
+    try:
+        io_loop.start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.invalidations.stop()
+        app.refresher.stop()
+        io_loop.run_sync(app.writes.close)
+        io_loop.run_sync(app.db_pool.close)
+        LOG.info("Search cache stats: %s", app.cache.stats())
+        LOG.info("Group commit stats: %s", app.writes.stats())
+
+
+async def load_search_index(app: Application) -> None:
+    """
+    Load the app's search index from the database
+    """
+    # Writes from then on reach the index as invalidations, so none are missed
+    await app.invalidations.poll()
+    async with app.db_pool.connection() as conn:
+        cursor = await conn.cursor()
+        app.search_index.load(await select_search_results(conn, cursor))
+    LOG.info("Loaded search index of %d offers", len(app.search_index))
+
+
+def fork_workers(workers: int, max_restarts: int = 100) -> int:
+    """
+    Fork workers server processes (one per CPU for 0), returning each one's
+    task id in it, as tornado's fork_processes does.
+
+    The parent only supervises the workers: it restarts those exiting
+    abnormally, up to max_restarts times, passes SIGTERM on to its own
+    workers, and exits once they have all exited.
+    """
+    if workers <= 0:
+        workers = cpu_count()
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def terminate_workers(*_) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def start_worker(task_id: int) -> bool:
+        # SIGTERM is blocked across the fork, so that a new worker never runs
+        # the supervisor's handler, taking the default action until serve
+        # sets its own, and is passed on if the supervisor is stopping
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        try:
+            pid = os.fork()
+            if pid == 0:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                return True
+            children[pid] = task_id
+            if stopping:
+                os.kill(pid, signal.SIGTERM)
+            return False
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+
+    signal.signal(signal.SIGTERM, terminate_workers)
+    LOG.info("Starting %d worker processes", workers)
+    for task_id in range(workers):
+        if start_worker(task_id):
+            return task_id
+
+    restarts = 0
+    while children:
+        pid, status = os.wait()
+        if pid not in children:
+            continue
+        task_id = children.pop(pid)
+        if stopping or os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0:
+            LOG.info("Worker %d (pid %d) exited", task_id, pid)
+            continue
+        restarts += 1
+        if restarts > max_restarts:
+            raise RuntimeError("Too many worker restarts, giving up")
+        LOG.warning(
+            "Worker %d (pid %d) exited abnormally (status %d), restarting",
+            task_id,
+            pid,
+            status,
+        )
+        if start_worker(task_id):
+            return task_id
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename=LOGGING_FILE, level=logging.INFO)
+    parse_command_line()
+    # Set up once, before any workers are forked
+    prepare_database(DATABASE, reset=options.reset_database, seed=options.seed)
+    serve(workers=options.workers)
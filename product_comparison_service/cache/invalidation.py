@@ -0,0 +1,195 @@
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from aiosqlite import Connection as AsyncConnection, Cursor as AsyncCursor
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from product_comparison_service.cache.search_cache import SearchCache
+from product_comparison_service.database.database import (
+    insert_cache_invalidations,
+    select_cache_invalidations,
+    select_last_cache_invalidation,
+    select_products_search_results,
+    select_search_results,
+)
+from product_comparison_service.database.pool import AsyncConnectionPool
+from product_comparison_service.database.search_index import SearchIndex
+from product_comparison_service.database.write_buffer import Write, WriteBuffer
+
+
+class CacheInvalidations:
+    """
+    Keeps the search caches of several server processes consistent.
+
+    Writes invalidate the local cache straight away and publish the
+    invalidation to the cache_invalidation table. Every process polls the
+    table every interval seconds and applies the invalidations published by
+    the others. Published invalidations are kept for retention, after which a
+    process that has not seen them clears its whole cache instead.
+
+    If given, the search index is kept in step the same way: the products
+    invalidated are reloaded from the database, or the whole index if
+    invalidations expired unseen. Price refreshes are published too, so that
+    other processes pick up refreshed prices rather than refreshing them
+    again. If given writes, invalidations are published in its group commits.
+    """
+
+    def __init__(
+        self,
+        cache: SearchCache,
+        pool: AsyncConnectionPool,
+        interval: float = 1,
+        retention: timedelta = timedelta(hours=1),
+        clock: Callable[[], float] = time.time,
+        search_index: Optional[SearchIndex] = None,
+        writes: Optional[WriteBuffer] = None,
+    ):
+        self.cache = cache
+        self.pool = pool
+        self.interval = interval
+        self.retention = retention.total_seconds()
+        self.clock = clock
+        self.search_index = search_index
+        self.writes = writes
+        self._last_seen: Optional[int] = None
+        self._published: Set[int] = set()
+        self._poller: Optional[PeriodicCallback] = None
+
+    async def publish(
+        self,
+        product: str,
+        category: Optional[str] = None,
+        write: Optional[Write] = None,
+    ) -> Any:
+        """
+        Invalidate cached searches affected by a write to product, in this and
+        every other process, applying write if given, see publish_many
+        """
+        return await self.publish_many([(product, category)], write)
+
+    async def publish_many(
+        self,
+        writes: Iterable[Tuple[str, Optional[str]]],
+        write: Optional[Write] = None,
+        local: bool = True,
+    ) -> Any:
+        """
+        Invalidate cached searches affected by writes to products, given as
+        (product, category) pairs, in this and every other process, publishing
+        them in one transaction.
+
+        If given, write is applied in the same transaction, so that it is
+        committed together with its invalidations, and its result returned.
+        Unless local, only the other processes are invalidated, as for price
+        refreshes already applied to this process's cache and index.
+        """
+        writes = list(dict.fromkeys(writes))
+        now = self.clock()
+
+        async def write_and_publish(
+            conn: AsyncConnection, cursor: AsyncCursor
+        ) -> Tuple[Any, List[int]]:
+            result = await write(conn, cursor) if write is not None else None
+            invalidation_ids = await insert_cache_invalidations(
+                conn, cursor, writes, now, now - self.retention, commit=False
+            )
+            return result, invalidation_ids
+
+        if self.writes is not None:
+            result, invalidation_ids = await self.writes.write(write_and_publish)
+        else:
+            async with self.pool.connection() as conn:
+                cursor = await conn.cursor()
+                try:
+                    result, invalidation_ids = await write_and_publish(conn, cursor)
+                    await conn.commit()
+                except BaseException:
+                    await conn.rollback()
+                    raise
+
+        if not local:
+            self._published.update(invalidation_ids)
+            return result
+
+        # Reload the index first, so searches read from it once the cache is
+        # invalidated see the write, then evict those read before
+        if self.search_index is not None:
+            async with self.pool.connection() as conn:
+                cursor = await conn.cursor()
+                await self._reload_products(
+                    conn, cursor, {product for product, _ in writes}
+                )
+        self.cache.invalidate_many(writes)
+        self._published.update(invalidation_ids)
+        return result
+
+    async def poll(self) -> int:
+        """
+        Apply invalidations published by other processes since the last poll,
+        returning how many were applied
+        """
+        async with self.pool.connection() as conn:
+            cursor = await conn.cursor()
+            if self._last_seen is None:
+                # Nothing cached predates the first poll
+                self._last_seen = await select_last_cache_invalidation(conn, cursor)
+                return 0
+            invalidations = await select_cache_invalidations(
+                conn, cursor, self._last_seen
+            )
+        if not invalidations:
+            return 0
+
+        # Ids are consecutive, so a gap means invalidations expired unseen
+        expired = invalidations[0]["id"] > self._last_seen + 1
+
+        applied = []
+        for invalidation in invalidations:
+            if invalidation["id"] in self._published:
+                self._published.discard(invalidation["id"])
+                continue
+            applied.append((invalidation["product"], invalidation["category"]))
+        self._last_seen = invalidations[-1]["id"]
+
+        # Reload the index first, so searches read from it once the cache is
+        # invalidated see the writes
+        if self.search_index is not None and (expired or applied):
+            async with self.pool.connection() as conn:
+                cursor = await conn.cursor()
+                if expired:
+                    self.search_index.load(await select_search_results(conn, cursor))
+                else:
+                    await self._reload_products(
+                        conn, cursor, {product for product, _ in applied}
+                    )
+
+        if expired:
+            self.cache.clear()
+        if applied:
+            self.cache.invalidate_many(applied)
+        return len(applied)
+
+    async def _reload_products(
+        self, conn: AsyncConnection, cursor: AsyncCursor, products: Set[str]
+    ) -> None:
+        # One query for all products, including those no longer offered
+        search_results: Dict[str, List] = {product: [] for product in products}
+        for result in await select_products_search_results(conn, cursor, products):
+            search_results[result["product"]].append(result)
+        for product, results in search_results.items():
+            self.search_index.replace_product(product, results)
+
+    def start(self) -> None:
+        """
+        Start polling on the current IOLoop
+        """
+        IOLoop.current().spawn_callback(self.poll)
+        self._poller = PeriodicCallback(self.poll, self.interval * 1000)
+        self._poller.start()
+
+    def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.stop()
+            self._poller = None
@@ -0,0 +1,304 @@
+from collections import OrderedDict, defaultdict
+from typing import Dict, Hashable, List, Optional
+
+_MASK_64 = (1 << 64) - 1
+
+
+class EvictionPolicy:
+    """
+    Base class for the eviction policies of a WeightedCache.
+
+    The cache tells its policy about every lookup, insertion, hit and removal,
+    and asks it for a victim to evict while over its limits. The victim may be
+    the candidate being inserted, in which case the candidate is rejected.
+    """
+
+    def __init__(self, max_weight: float, capacity: int):
+        self.max_weight = max_weight
+        self.capacity = capacity
+
+    def record(self, key: Hashable) -> None:
+        """
+        Note a lookup of key, whether cached or not
+        """
+
+    def insert(self, key: Hashable, weight: float) -> None:
+        """
+        Track key, newly cached or updated with the given weight
+        """
+        raise NotImplementedError
+
+    def access(self, key: Hashable) -> None:
+        """
+        Note a cache hit for key
+        """
+        raise NotImplementedError
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Stop tracking key
+        """
+        raise NotImplementedError
+
+    def victim(self, candidate: Optional[Hashable] = None) -> Hashable:
+        """
+        Choose a tracked key to evict, making room for candidate if given
+        """
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """
+    Evicts the least recently used key
+    """
+
+    def __init__(self, max_weight: float, capacity: int):
+        super().__init__(max_weight, capacity)
+        self._order: Dict[Hashable, float] = OrderedDict()
+
+    def insert(self, key: Hashable, weight: float) -> None:
+        self._order[key] = weight
+        self._order.move_to_end(key)
+
+    def access(self, key: Hashable) -> None:
+        self._order.move_to_end(key)
+
+    def remove(self, key: Hashable) -> None:
+        del self._order[key]
+
+    def victim(self, candidate: Optional[Hashable] = None) -> Hashable:
+        return next(iter(self._order))
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Evicts the least frequently used key, least recently used first among keys
+    used equally often.
+
+    Keys are kept in buckets by use count, so hits are O(1); removing the last
+    key of the least used bucket scans the remaining buckets.
+    """
+
+    def __init__(self, max_weight: float, capacity: int):
+        super().__init__(max_weight, capacity)
+        self._counts: Dict[Hashable, int] = {}
+        self._buckets: Dict[int, Dict[Hashable, None]] = defaultdict(OrderedDict)
+        self._min_count = 0
+
+    def insert(self, key: Hashable, weight: float) -> None:
+        if key in self._counts:
+            self.access(key)
+            return
+        self._counts[key] = 1
+        self._buckets[1][key] = None
+        self._min_count = 1
+
+    def access(self, key: Hashable) -> None:
+        count = self._unbucket(key)
+        if count == self._min_count and count not in self._buckets:
+            self._min_count = count + 1
+        self._counts[key] = count + 1
+        self._buckets[count + 1][key] = None
+
+    def remove(self, key: Hashable) -> None:
+        count = self._unbucket(key)
+        del self._counts[key]
+        if count == self._min_count and count not in self._buckets:
+            self._min_count = min(self._buckets, default=0)
+
+    def victim(self, candidate: Optional[Hashable] = None) -> Hashable:
+        # A new candidate is always least used, so evict the next key instead
+        keys = iter(self._buckets[self._min_count])
+        victim = next(keys)
+        if victim == candidate and len(self._counts) > 1:
+            victim = next(keys, None)
+            if victim is None:
+                count = min(count for count in self._buckets if count > self._min_count)
+                victim = next(iter(self._buckets[count]))
+        return victim
+
+    def _unbucket(self, key: Hashable) -> int:
+        count = self._counts[key]
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+        return count
+
+
+class FrequencySketch:
+    """
+    Count-min sketch estimating how often keys were looked up recently.
+
+    The sketch is 16 counters wide per expected entry, within bounds, so that
+    keys seen once rarely look popular. Counts saturate at 15, and are halved
+    once 10 times as many lookups as the sketch is wide have been counted, so
+    old popularity fades.
+    """
+
+    # Each row indexes counters by the top bits of the key's hash times its
+    # own odd multiplier, so keys colliding in one row rarely do in another
+    SEEDS = (
+        0x9E3779B97F4A7C15,
+        0xC2B2AE3D27D4EB4F,
+        0x165667B19E3779F9,
+        0x27D4EB2F165667C5,
+    )
+    MAX_COUNT = 15
+    MIN_WIDTH = 1 << 8
+    MAX_WIDTH = 1 << 16
+
+    def __init__(self, capacity: int):
+        width = min(max(16 * capacity, self.MIN_WIDTH), self.MAX_WIDTH)
+        self.width = 1 << (width - 1).bit_length()
+        self._shift = 64 - (self.width.bit_length() - 1)
+        self._table = bytearray(len(self.SEEDS) * self.width)
+        self._sample_size = 10 * self.width
+        self._additions = 0
+
+    def _indexes(self, key: Hashable) -> List[int]:
+        key_hash = hash(key) & _MASK_64
+        return [
+            row * self.width + ((key_hash * seed & _MASK_64) >> self._shift)
+            for row, seed in enumerate(self.SEEDS)
+        ]
+
+    def increment(self, key: Hashable) -> None:
+        added = False
+        for index in self._indexes(key):
+            if self._table[index] < self.MAX_COUNT:
+                self._table[index] += 1
+                added = True
+        if added:
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._table = bytearray(count >> 1 for count in self._table)
+                self._additions //= 2
+
+    def frequency(self, key: Hashable) -> int:
+        return min(self._table[index] for index in self._indexes(key))
+
+
+class TinyLFUPolicy(LRUPolicy):
+    """
+    Evicts the least recently used key, but only admits a new key if it has
+    been looked up more often than that victim, so one-off lookups do not
+    displace popular keys
+    """
+
+    def __init__(self, max_weight: float, capacity: int):
+        super().__init__(max_weight, capacity)
+        self.sketch = FrequencySketch(capacity)
+
+    def record(self, key: Hashable) -> None:
+        self.sketch.increment(key)
+
+    def victim(self, candidate: Optional[Hashable] = None) -> Hashable:
+        victim = next(iter(self._order))
+        if candidate is None or victim == candidate:
+            return victim
+        if self.sketch.frequency(candidate) > self.sketch.frequency(victim):
+            return victim
+        return candidate
+
+
+class WTinyLFUPolicy(EvictionPolicy):
+    """
+    Window TinyLFU: new keys enter a small LRU window, holding window of the
+    weight, and move on to the probation segment of a segmented LRU as the
+    window overflows. Keys hit while on probation are promoted to the
+    protected segment, holding protected of the main weight.
+
+    Evictions pit the newest key on probation against the least recently used
+    one, keeping whichever has been looked up more often. The window lets
+    bursts of new keys build up a frequency before they have to compete.
+    """
+
+    def __init__(
+        self,
+        max_weight: float,
+        capacity: int,
+        window: float = 0.01,
+        protected: float = 0.8,
+    ):
+        super().__init__(max_weight, capacity)
+        self.sketch = FrequencySketch(capacity)
+        self.window_max = window * max_weight
+        self.protected_max = protected * (max_weight - self.window_max)
+        self._window: Dict[Hashable, float] = OrderedDict()
+        self._probation: Dict[Hashable, float] = OrderedDict()
+        self._protected: Dict[Hashable, float] = OrderedDict()
+        self._window_weight = 0.0
+        self._protected_weight = 0.0
+
+    def record(self, key: Hashable) -> None:
+        self.sketch.increment(key)
+
+    def insert(self, key: Hashable, weight: float) -> None:
+        if key in self._window:
+            self._window_weight += weight - self._window[key]
+            self._window[key] = weight
+            self._window.move_to_end(key)
+        elif key in self._protected:
+            self._protected_weight += weight - self._protected[key]
+            self._protected[key] = weight
+            self._protected.move_to_end(key)
+        elif key in self._probation:
+            self._probation[key] = weight
+            self.access(key)
+        else:
+            self._window[key] = weight
+            self._window_weight += weight
+
+        # Move the window's overflow on to probation, least recent first
+        while self._window_weight > self.window_max and len(self._window) > 1:
+            overflow, overflow_weight = self._window.popitem(last=False)
+            self._window_weight -= overflow_weight
+            self._probation[overflow] = overflow_weight
+
+    def access(self, key: Hashable) -> None:
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+        else:
+            weight = self._probation.pop(key)
+            self._protected[key] = weight
+            self._protected_weight += weight
+
+            # Demote the protected segment's overflow back to probation
+            while (
+                self._protected_weight > self.protected_max and len(self._protected) > 1
+            ):
+                demoted, demoted_weight = self._protected.popitem(last=False)
+                self._protected_weight -= demoted_weight
+                self._probation[demoted] = demoted_weight
+
+    def remove(self, key: Hashable) -> None:
+        if key in self._window:
+            self._window_weight -= self._window.pop(key)
+        elif key in self._protected:
+            self._protected_weight -= self._protected.pop(key)
+        else:
+            del self._probation[key]
+
+    def victim(self, candidate: Optional[Hashable] = None) -> Hashable:
+        if self._probation:
+            victim = next(iter(self._probation))
+            challenger = next(reversed(self._probation))
+            if challenger != victim and self.sketch.frequency(
+                challenger
+            ) <= self.sketch.frequency(victim):
+                return challenger
+            return victim
+        if self._protected:
+            return next(iter(self._protected))
+        return next(iter(self._window))
+
+
+POLICIES = {
+    "lru": LRUPolicy,
+    "lfu": LFUPolicy,
+    "tinylfu": TinyLFUPolicy,
+    "w-tinylfu": WTinyLFUPolicy,
+}
@@ -0,0 +1,160 @@
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from product_comparison_service.cache.weighted_cache import WeightedCache
+from product_comparison_service.database.rows import sizeof_rows
+
+
+class SearchCache:
+    """
+    Application-wide cache of search results, shared by all request handlers.
+
+    Keys are (product, category, limit, cursor, text) tuples, one per page of
+    a GET /product search, with batch searches sharing the first pages.
+    Entries expire once they are older than the configured time-to-live, and
+    are evicted when a product they may hold is written to, judged by the
+    product and category of their key. Entries are ejected as chosen by policy (see WeightedCache) to keep at most cache_len
+    entries and, if given, at most max_bytes of search results, as estimated
+    by sizeof.
+
+    Every invalidation increments generation, so that results read before a
+    write are not cached after its invalidation: callers note the generation
+    before reading, and cache the results only if it has not changed since.
+    """
+
+    def __init__(
+        self,
+        cache_len: int = 10,
+        ttl: timedelta = timedelta(hours=1),
+        clock: Callable[[], float] = time.monotonic,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = sizeof_rows,
+        policy: str = "lru",
+    ):
+        self.ttl = ttl.total_seconds()
+        self.clock = clock
+        self.max_bytes = max_bytes
+        self.generation = 0
+        if max_bytes is None:
+            self._entries = WeightedCache(cache_len, policy=policy)
+        else:
+            self._entries = WeightedCache(
+                max_bytes,
+                weigher=lambda entry: sizeof(entry[1]),
+                max_len=cache_len,
+                policy=policy,
+            )
+
+    @property
+    def bytes(self) -> int:
+        """
+        Estimated bytes of search results cached, if limited by max_bytes
+        """
+        return self._entries.weight if self.max_bytes is not None else 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache's hit, miss, eviction and rejection counters
+        """
+        return self._entries.stats()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (self.clock() + self.ttl, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        del self._entries[key]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get cached value for key, treating expired entries as missing
+        """
+        entry = self._entries.peek(key)
+        if entry is not None and self.clock() >= entry[0]:
+            del self._entries[key]
+
+        # Count hits and uses only for live entries
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def invalidate(self, product: str, category: Optional[str] = None) -> int:
+        """
+        Evict every cached search whose results may include product.
+
+        A search is affected if it filters on the product itself, or if it
+        does not filter on product and either matches the category or already
+        contains a row for the product. Returns the number of evicted keys.
+        """
+        return self.invalidate_many([(product, category)])
+
+    def invalidate_many(self, writes: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """
+        Evict every cached search whose results may include any of the
+        products written to, given as (product, category) pairs, as invalidate
+        does for each, in a single pass over the cache
+        """
+        self.generation += 1
+        products = set()
+        categories = set()
+        for product, category in writes:
+            products.add(product)
+            if category:
+                categories.add(category)
+        stale_keys = [
+            key
+            for key, (_, results) in self._entries.items()
+            if _is_affected(key, results, products, categories)
+        ]
+        for key in stale_keys:
+            del self._entries[key]
+        return len(stale_keys)
+
+    def update_results(self, updated_results: Dict[Tuple[str, str], Dict]) -> int:
+        """
+        Replace cached result rows with refreshed copies, keyed by (supplier,
+        product), without changing entries' expiry or eviction order. Returns
+        the number of rows replaced.
+        """
+        replaced = 0
+        for _, results in self._entries.values():
+            for i, result in enumerate(results):
+                offer = (result.get("supplier"), result.get("product"))
+                if offer in updated_results:
+                    results[i] = updated_results[offer]
+                    replaced += 1
+        return replaced
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+
+def _is_affected(
+    key: Tuple[Optional[str], Optional[str]],
+    results: Any,
+    products: Set[str],
+    categories: Set[str],
+) -> bool:
+    key_product, key_category = key[0], key[1]
+
+    if key_product in products:
+        return True
+    if key_product:
+        return False
+    if not key_category or key_category in categories:
+        return True
+    return any(result.get("product") in products for result in results)
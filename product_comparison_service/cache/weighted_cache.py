@@ -0,0 +1,152 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterator,
+    KeysView,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from product_comparison_service.cache.policies import POLICIES, EvictionPolicy
+
+_MISSING = object()
+
+
+class WeightedCache:
+    """
+    Dict-like cache bounded by the total weight of its values, and optionally
+    by its length, ejecting entries chosen by an eviction policy as needed.
+
+    Values weigh weigher(value), 1 by default. The policy is one of "lru",
+    "lfu", "tinylfu" or "w-tinylfu" (see cache/policies.py), or an
+    EvictionPolicy. Lookups, insertions and deletions are O(1), and hits,
+    misses, evictions and rejections (values not admitted, or weighing more
+    than max_weight) are counted.
+    """
+
+    def __init__(
+        self,
+        max_weight: float,
+        weigher: Optional[Callable[[Any], float]] = None,
+        max_len: Optional[int] = None,
+        policy: Union[str, EvictionPolicy] = "lru",
+    ):
+        assert max_weight > 0 and (max_len is None or max_len > 0)
+        self.max_weight = max_weight
+        self.max_len = max_len
+        self.weigher = weigher or (lambda _: 1)
+        if isinstance(policy, str):
+            policy = POLICIES[policy](max_weight, max_len or int(max_weight))
+        self.policy = policy
+        self._data: Dict[Hashable, Tuple[float, Any]] = {}
+        self._weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    @property
+    def weight(self) -> float:
+        return self._weight
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache's counters
+        """
+        return {
+            "length": len(self._data),
+            "weight": self._weight,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "rejections": self.rejections,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        weight = self.weigher(value)
+        if weight > self.max_weight:
+            if key in self._data:
+                self._remove(key)
+            self.rejections += 1
+            return
+
+        candidate = None
+        if key in self._data:
+            self._weight -= self._data[key][0]
+        else:
+            candidate = key
+        self._data[key] = (weight, value)
+        self._weight += weight
+        self.policy.insert(key, weight)
+
+        while self._weight > self.max_weight or (
+            self.max_len is not None and len(self._data) > self.max_len
+        ):
+            victim = self.policy.victim(candidate)
+            self._remove(victim)
+            if victim == candidate:
+                self.rejections += 1
+                candidate = None
+            else:
+                self.evictions += 1
+
+    def __delitem__(self, key: Hashable) -> None:
+        if key not in self._data:
+            raise KeyError(key)
+        self._remove(key)
+
+    def _remove(self, key: Hashable) -> None:
+        weight, _ = self._data.pop(key)
+        self._weight -= weight
+        self.policy.remove(key)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get the cached value for key, counting a hit or miss
+        """
+        self.policy.record(key)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.policy.access(key)
+        return entry[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get the cached value for key without counting it as a use
+        """
+        entry = self._data.get(key)
+        return default if entry is None else entry[1]
+
+    def keys(self) -> KeysView:
+        return self._data.keys()
+
+    def values(self) -> Iterator[Any]:
+        return (value for _, value in self._data.values())
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        return ((key, value) for key, (_, value) in self._data.items())
+
+    def clear(self) -> None:
+        for key in list(self._data):
+            self._remove(key)
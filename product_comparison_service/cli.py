@@ -1,15 +1,11 @@
-import json
+import time
 
 import click
 
-from database.database import (
-    get_database_conn_and_cursor,
-    insert_product,
-    insert_supplier,
-    insert_supplier_product,
-)
-from config import DATABASE
-from data_classes.data_classes import Product, Supplier, SupplierProduct
+from database.database import get_database_conn_and_cursor
+from database.loader import load_jsonl, describe_load
+from database.ingest import ingest_shards
+from config import DATABASE, IMPORT_CHUNK_SIZE
 
 
 @click.group()
@@ -20,74 +16,101 @@ def cli():
     pass
 
 
+def import_options(command):
+    """
+    Options shared by the JSONL import commands
+    """
+    command = click.option(
+        "--chunk-size",
+        default=IMPORT_CHUNK_SIZE,
+        show_default=True,
+        help="Rows inserted per transaction",
+    )(command)
+    command = click.option(
+        "--upsert",
+        is_flag=True,
+        help="Update rows that already exist instead of failing",
+    )(command)
+    return click.argument("filename")(command)
+
+
+def import_jsonl(table: str, filename: str, chunk_size: int, upsert: bool) -> None:
+    """
+    Stream table entries from a JSONL file into the database, reporting throughput
+    """
+    conn, cursor = get_database_conn_and_cursor(DATABASE)
+    try:
+        started = time.perf_counter()
+        rows = load_jsonl(conn, cursor, table, filename, chunk_size, upsert)
+        click.echo(describe_load(table, rows, time.perf_counter() - started))
+    finally:
+        conn.close()
+
+
 @click.command(
     name="add_products",
-    help='Inserts products from a JSONL file of the format: {"name": "organutan", "description": "Ball of evervescent orange fury", "category": "Great Apes", "last_updated":"now", "rating": 0.999} to database',
+    help='Inserts products from a JSONL file of the format: {"name": "orangutan", "description": "Ball of evervescent orange fury", "category": "Great Apes", "last_updated":"2020-10-17T04:15:00.000", "rating": 0.999} to database',
 )
-@click.argument("filename")
-def add_products(filename: str):
+@import_options
+def add_products(filename: str, chunk_size: int, upsert: bool):
     """
     Insert product table entries
     """
-    with open(filename, encoding="utf-8") as file:
-        products = [json.loads(l.rstrip("\n")) for l in file if l]
-        conn, cursor = get_database_conn_and_cursor(DATABASE)
-        for product in products:
-            current_product = Product(
-                name=product.get("name"),
-                description=product.get("description"),
-                category=product.get("category"),
-                last_updated=product.get("last_updated"),
-                rating=product.get("rating"),
-            )
-            insert_product(conn, cursor, current_product)
+    import_jsonl("product", filename, chunk_size, upsert)
 
 
 @click.command(
     name="add_suppliers",
     help='Inserts suppliers from a JSONL file of the format: {"name": "iPet", "pull_url": "www.ipet.com/animals", "rating": 0.1} to database',
 )
-@click.argument("filename")
-def add_suppliers(filename: str):
+@import_options
+def add_suppliers(filename: str, chunk_size: int, upsert: bool):
     """
     Insert supplier table entries
     """
-    with open(filename, encoding="utf-8") as file:
-        suppliers = [json.loads(l.rstrip("\n")) for l in file if l]
-        conn, cursor = get_database_conn_and_cursor(DATABASE)
-        for supplier in suppliers:
-            current_supplier = Supplier(
-                name=supplier.get("name"),
-                pull_url=supplier.get("pull_url"),
-                rating=supplier.get("rating"),
-            )
-            insert_supplier(conn, cursor, current_supplier)
+    import_jsonl("supplier", filename, chunk_size, upsert)
 
 
 @click.command(
     name="add_supplier_products",
     help='Inserts supplier_products from a JSONL file of the format: {"supplier": "iPet", "product": "coyotee", "price": 5.99} to database',
 )
-@click.argument("filename")
-def add_supplier_products(filename: str):
+@import_options
+def add_supplier_products(filename: str, chunk_size: int, upsert: bool):
     """
     Insert supplier_product table entries
     """
-    with open(filename, encoding="utf-8") as file:
-        supplier_products = [json.loads(l.rstrip("\n")) for l in file if l]
-        conn, cursor = get_database_conn_and_cursor(DATABASE)
-        for supplier_product in supplier_products:
-            current_supplier_product = SupplierProduct(
-                supplier=supplier_product.get("supplier"),
-                product=supplier_product.get("product"),
-                price=supplier_product.get("price"),
-            )
-            insert_supplier_product(conn, cursor, current_supplier_product)
+    import_jsonl("supplier_product", filename, chunk_size, upsert)
+
+
+@click.command(
+    name="ingest",
+    help="Inserts every JSONL shard in a directory, or matching a glob, to database: suppliers*.jsonl, then products*.jsonl, then supplier_products*.jsonl shards",
+)
+@import_options
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Processes parsing shards  [default: number of CPUs]",
+)
+def ingest(filename: str, chunk_size: int, upsert: bool, workers: int):
+    """
+    Insert supplier, product and supplier_product table entries from shards,
+    parsed in parallel and written by a single writer
+    """
+    started = time.perf_counter()
+    rows = ingest_shards(DATABASE, filename, chunk_size, upsert, workers)
+    seconds = time.perf_counter() - started
+    for table, table_rows in rows.items():
+        click.echo(f"{table}: {table_rows} rows")
+    click.echo(describe_load("shard", sum(rows.values()), seconds))
 
 
 cli.add_command(add_products)
 cli.add_command(add_suppliers)
 cli.add_command(add_supplier_products)
+cli.add_command(ingest)
 
 
 if __name__ == "__main__":
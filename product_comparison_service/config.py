@@ -1,7 +1,81 @@
+import os
 from datetime import timedelta
 
 PORT_ID = 8888
 CACHE_MAX_LENGTH = 100
+# Estimated bytes of search results the search cache may hold, per process
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Search cache eviction policy: "lru", "lfu", "tinylfu" or "w-tinylfu"
+CACHE_POLICY = "w-tinylfu"
+# Seconds between polls for search cache invalidations published by other
+# server processes, and how long published invalidations are kept
+CACHE_INVALIDATION_INTERVAL = 1
+CACHE_INVALIDATION_RETENTION = timedelta(hours=1)
+# Answer searches from an in-process index of all search results, loaded at
+# startup, rather than querying the database
+SEARCH_INDEX = True
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+# Searches accepted by a single POST to the batch search endpoint
+BATCH_SEARCH_MAX_QUERIES = 100
+# Items accepted by a single push to the bulk write endpoint
+BULK_WRITE_MAX_ITEMS = 10000
 DATABASE = "product.db"
+# Rows inserted per transaction by batch imports
+IMPORT_CHUNK_SIZE = 10000
+# JSONL shards loaded into an empty database when the app is started with --seed
+SEED_DATA = os.path.join(os.path.dirname(__file__), "batch_processing_data")
 REFETCH_LIMIT = timedelta(hours=1)
 LOGGING_FILE = "logs.log"
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+DATABASE_POOL_SIZE = 5
+DATABASE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -20000,  # KiB, i.e. ~20MB page cache per connection
+    "mmap_size": 268435456,
+    "busy_timeout": 5000,
+    "foreign_keys": "ON",
+}
+# Writes are applied by a single writer in group commits of the writes made
+# within WRITE_BATCH_WINDOW seconds of each other, up to WRITE_BATCH_SIZE.
+# Callers always wait for the commit; WRITE_SYNCHRONOUS sets its durability:
+# "FULL" syncs every commit to disk, "NORMAL" (in WAL mode) may lose the last
+# commits on power loss, though never corrupts the database.
+WRITE_BATCH_WINDOW = 0.002
+WRITE_BATCH_SIZE = 100
+WRITE_SYNCHRONOUS = "NORMAL"
+# Serve out of date search results immediately while refreshing them in the
+# background, unless any result is older than HARD_STALENESS_LIMIT
+STALE_WHILE_REVALIDATE = False
+HARD_STALENESS_LIMIT = timedelta(hours=24)
+# Client used for suppliers without one registered for their pull_url:
+# "dummy" mocks supplier APIs, "http" calls them
+SUPPLIER_CLIENT = "dummy"
+SUPPLIER_DUMMY_DELAY = 1
+SUPPLIER_BATCH_SIZE = 100
+SUPPLIER_MAX_CONCURRENCY = 4
+SUPPLIER_HTTP_MAX_CLIENTS = 50
+# Time limits for re-pricing from suppliers, in seconds: per supplier call,
+# and for the whole fan-out of a single request
+SUPPLIER_TIMEOUT = 2
+SUPPLIER_REFRESH_BUDGET = 3
+# Consecutive failures before a supplier's circuit opens, and seconds it stays
+# open before a trial call is let through
+SUPPLIER_FAILURE_THRESHOLD = 5
+SUPPLIER_RESET_TIMEOUT = 30
+# Background refreshes of popular offers due to go out of date within
+# REFRESH_AHEAD, every REFRESHER_INTERVAL seconds, limited to
+# REFRESHER_RATE_LIMIT offers per second overall and
+# REFRESHER_SUPPLIER_RATE_LIMIT per supplier. Request counts ranking offers
+# decay by REFRESHER_HIT_DECAY per interval, and offers whose count decays
+# below REFRESHER_MIN_HITS are no longer refreshed. Every server process runs
+# its own refresher, so with --workers these limits apply per process.
+REFRESH_AHEAD = timedelta(minutes=10)
+REFRESHER_INTERVAL = 10
+REFRESHER_RATE_LIMIT = 20
+REFRESHER_SUPPLIER_RATE_LIMIT = 5
+REFRESHER_HIT_DECAY = 0.9
+REFRESHER_MIN_HITS = 1
+REFRESHER_MAX_OFFERS = 10000
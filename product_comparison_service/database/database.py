@@ -1,4 +1,5 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Iterable, List, Dict, NamedTuple, Optional, Tuple
+import itertools
 import sqlite3
 import aiosqlite
 from datetime import datetime
@@ -11,6 +12,264 @@ from product_comparison_service.data_classes.data_classes import (
     SupplierProduct,
     Category,
 )
+from product_comparison_service.database.rows import drop_values
+
+# Schema changes applied in order to new and existing databases, each taking
+# the database to the next PRAGMA user_version. Only ever append to this list.
+SCHEMA_MIGRATIONS = [
+    # 1: (supplier, product) key, and indexes for supplier_product joins,
+    # updates and category searches
+    """
+    DELETE FROM supplier_product WHERE rowid NOT IN (
+        SELECT MAX(rowid) FROM supplier_product GROUP BY supplier, product
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS supplier_product_key
+        ON supplier_product (supplier, product);
+    CREATE INDEX IF NOT EXISTS supplier_product_product
+        ON supplier_product (product);
+    CREATE INDEX IF NOT EXISTS product_category ON product (category);
+    """,
+    # 2: Ranking columns stored on supplier_product and kept up to date by
+    # triggers, with covering indexes serving ranked searches in index order
+    """
+    ALTER TABLE supplier_product ADD COLUMN category text;
+    ALTER TABLE supplier_product ADD COLUMN combined_rating real;
+    UPDATE supplier_product SET
+        category = (
+            SELECT category FROM product WHERE name = supplier_product.product
+        ),
+        combined_rating = (
+            (SELECT rating FROM product WHERE name = supplier_product.product)
+            + (SELECT rating FROM supplier WHERE name = supplier_product.supplier)
+        ) / 2;
+    CREATE TRIGGER supplier_product_ranking_insert
+    AFTER INSERT ON supplier_product
+    BEGIN
+        UPDATE supplier_product SET
+            category = (SELECT category FROM product WHERE name = NEW.product),
+            combined_rating = (
+                (SELECT rating FROM product WHERE name = NEW.product)
+                + (SELECT rating FROM supplier WHERE name = NEW.supplier)
+            ) / 2
+        WHERE rowid = NEW.rowid;
+    END;
+    CREATE TRIGGER product_ranking_update
+    AFTER UPDATE OF category, rating ON product
+    BEGIN
+        UPDATE supplier_product SET
+            category = NEW.category,
+            combined_rating = (
+                NEW.rating
+                + (SELECT rating FROM supplier WHERE name = supplier_product.supplier)
+            ) / 2
+        WHERE product = NEW.name;
+    END;
+    CREATE TRIGGER supplier_ranking_update
+    AFTER UPDATE OF rating ON supplier
+    BEGIN
+        UPDATE supplier_product SET
+            combined_rating = (
+                (SELECT rating FROM product WHERE name = supplier_product.product)
+                + NEW.rating
+            ) / 2
+        WHERE supplier = NEW.name;
+    END;
+    DROP INDEX IF EXISTS supplier_product_product;
+    CREATE INDEX supplier_product_rank
+        ON supplier_product (combined_rating DESC, supplier, product, price);
+    CREATE INDEX supplier_product_product_rank
+        ON supplier_product (product, combined_rating DESC, supplier, price);
+    CREATE INDEX supplier_product_category_rank
+        ON supplier_product (category, combined_rating DESC, supplier, product, price);
+    """,
+    # 3: combined_rating stored rounded as served, so that keyset pagination
+    # cursors taken from search results match the stored ranking exactly
+    """
+    UPDATE supplier_product SET combined_rating = ROUND(combined_rating, 2);
+    DROP TRIGGER supplier_product_ranking_insert;
+    DROP TRIGGER product_ranking_update;
+    DROP TRIGGER supplier_ranking_update;
+    CREATE TRIGGER supplier_product_ranking_insert
+    AFTER INSERT ON supplier_product
+    BEGIN
+        UPDATE supplier_product SET
+            category = (SELECT category FROM product WHERE name = NEW.product),
+            combined_rating = ROUND((
+                (SELECT rating FROM product WHERE name = NEW.product)
+                + (SELECT rating FROM supplier WHERE name = NEW.supplier)
+            ) / 2, 2)
+        WHERE rowid = NEW.rowid;
+    END;
+    CREATE TRIGGER product_ranking_update
+    AFTER UPDATE OF category, rating ON product
+    BEGIN
+        UPDATE supplier_product SET
+            category = NEW.category,
+            combined_rating = ROUND((
+                NEW.rating
+                + (SELECT rating FROM supplier WHERE name = supplier_product.supplier)
+            ) / 2, 2)
+        WHERE product = NEW.name;
+    END;
+    CREATE TRIGGER supplier_ranking_update
+    AFTER UPDATE OF rating ON supplier
+    BEGIN
+        UPDATE supplier_product SET
+            combined_rating = ROUND((
+                (SELECT rating FROM product WHERE name = supplier_product.product)
+                + NEW.rating
+            ) / 2, 2)
+        WHERE supplier = NEW.name;
+    END;
+    """,
+    # 4: Search cache invalidations published by each server process, polled
+    # by the others to keep their caches consistent
+    """
+    CREATE TABLE IF NOT EXISTS cache_invalidation (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product text NOT NULL,
+        category text,
+        created real NOT NULL
+    );
+    """,
+    # 5: Freshness per offer, as prices are refreshed per (supplier, product),
+    # added to the rank indexes so they still cover ranked searches
+    """
+    ALTER TABLE supplier_product ADD COLUMN last_updated timestamp;
+    UPDATE supplier_product SET last_updated = (
+        SELECT last_updated FROM product WHERE name = supplier_product.product
+    );
+    CREATE TRIGGER supplier_product_freshness_insert
+    AFTER INSERT ON supplier_product
+    WHEN NEW.last_updated IS NULL
+    BEGIN
+        UPDATE supplier_product SET
+            last_updated = (SELECT last_updated FROM product WHERE name = NEW.product)
+        WHERE rowid = NEW.rowid;
+    END;
+    DROP INDEX supplier_product_rank;
+    DROP INDEX supplier_product_product_rank;
+    DROP INDEX supplier_product_category_rank;
+    CREATE INDEX supplier_product_rank ON supplier_product
+        (combined_rating DESC, supplier, product, price, last_updated);
+    CREATE INDEX supplier_product_product_rank ON supplier_product
+        (product, combined_rating DESC, supplier, price, last_updated);
+    CREATE INDEX supplier_product_category_rank ON supplier_product
+        (category, combined_rating DESC, supplier, product, price, last_updated);
+    """,
+    # 6: Timestamps as integer seconds since the epoch, so staleness is a
+    # plain comparison. Unparseable timestamps become 0, i.e. out of date.
+    """
+    UPDATE product SET last_updated = COALESCE(
+        CAST(strftime('%s', last_updated) AS INTEGER), 0
+    ) WHERE typeof(last_updated) = 'text';
+    UPDATE supplier_product SET last_updated = COALESCE(
+        CAST(strftime('%s', last_updated) AS INTEGER), 0
+    ) WHERE typeof(last_updated) = 'text';
+    """,
+]
+
+# Search results: offers joined with their product and supplier
+SEARCH_RESULTS_SQL = """
+    SELECT product.name as product,
+        product.description as description,
+        product.category as category,
+        supplier_product.price as price,
+        supplier_product.supplier as supplier,
+        product.rating as product_rating,
+        supplier.rating as supplier_rating,
+        supplier_product.combined_rating as combined_rating,
+        supplier_product.last_updated as last_updated
+    FROM supplier_product
+    INNER JOIN product
+    ON product.name = supplier_product.product
+    INNER JOIN supplier
+    ON supplier.name = supplier_product.supplier"""
+
+# Search results of a set of products' offers, given up to PRODUCTS_PER_QUERY
+# at a time, within SQLite's default limit of bound parameters
+PRODUCTS_SEARCH_RESULTS_SQL = (
+    SEARCH_RESULTS_SQL + "\n    WHERE supplier_product.product IN ({products})"
+)
+PRODUCTS_PER_QUERY = 500
+
+# Ranked search, filtered by product and or category, optionally starting
+# after a (combined_rating, supplier, product) position in the ranking. Each
+# variant is a fixed, parameterized statement, so SQLite can reuse it from its
+# statement cache.
+SEARCH_SQL = (
+    SEARCH_RESULTS_SQL
+    + """ {filter_term}
+    ORDER BY supplier_product.combined_rating DESC,
+        supplier_product.supplier,
+        supplier_product.product
+    LIMIT ?
+    """
+)
+
+# One search of a batch, tagged with its position in the batch: the search's
+# own ranked and limited statement, so it keeps to its rank index and reads
+# no more offers than its limit. search_many runs a batch's searches as one
+# UNION ALL of these.
+SEARCH_MANY_TERM_SQL = "SELECT ? AS search, * FROM ({statement})"
+
+SEARCH_MANY_ORDER_SQL = """
+    ORDER BY search, combined_rating DESC, supplier, product
+    """
+
+# Bulk writes: products and offers upserted, keeping the ranking triggers in
+# play, and products deleted once their last offer is
+BULK_PRODUCT_UPSERT_SQL = """
+    INSERT INTO product (name, description, category, last_updated, rating)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (name) DO UPDATE SET
+        description = excluded.description,
+        category = excluded.category,
+        last_updated = excluded.last_updated,
+        rating = excluded.rating
+    """
+
+BULK_OFFER_UPSERT_SQL = """
+    INSERT INTO supplier_product (supplier, product, price, last_updated)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (supplier, product) DO UPDATE SET
+        price = excluded.price,
+        last_updated = excluded.last_updated
+    """
+
+BULK_OFFER_DELETE_SQL = """
+    DELETE FROM supplier_product WHERE supplier = ? AND product = ?
+    """
+
+BULK_PRODUCT_DELETE_SQL = """
+    DELETE FROM product WHERE name = ?1 AND NOT EXISTS (
+        SELECT 1 FROM supplier_product WHERE product = ?1
+    )
+    """
+
+SEARCH_FILTER_TERMS = (
+    "supplier_product.product = ?",
+    "supplier_product.category = ?",
+    # Text searches without the search index match names and descriptions by
+    # substring, see like_pattern
+    "(product.name LIKE ? ESCAPE '\\' OR product.description LIKE ? ESCAPE '\\')",
+    # Range on combined_rating first, so the rank indexes can seek to it
+    "supplier_product.combined_rating <= ? AND ("
+    "supplier_product.combined_rating < ?"
+    " OR (supplier_product.supplier, supplier_product.product) > (?, ?))",
+)
+
+SEARCH_STATEMENTS = {
+    filters: SEARCH_SQL.format(
+        filter_term="".join(
+            f"\n    {'AND' if i else 'WHERE'} {term}"
+            for i, term in enumerate(
+                term for term, used in zip(SEARCH_FILTER_TERMS, filters) if used
+            )
+        )
+    )
+    for filters in itertools.product((False, True), repeat=4)
+}
 
 
 def setup_database(database: str) -> None:
@@ -18,6 +277,7 @@ def setup_database(database: str) -> None:
     create_product_table(conn=conn, cursor=cursor)
     create_supplier_table(conn=conn, cursor=cursor)
     create_supplier_product_table(conn=conn, cursor=cursor)
+    migrate_database(conn=conn, cursor=cursor)
 
 
 def get_database_conn_and_cursor(database: str) -> None:
@@ -26,10 +286,40 @@ def get_database_conn_and_cursor(database: str) -> None:
     """
     # Connect to DB (or create if does not exist)
     conn = sqlite3.connect(database)
+    conn.execute("PRAGMA foreign_keys = ON")
     cursor = conn.cursor()
     return conn, cursor
 
 
+def get_schema_version(cursor: Cursor) -> int:
+    """
+    Get number of schema migrations applied to database
+    """
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def migrate_database(conn: Connection, cursor: Cursor) -> int:
+    """
+    Apply pending schema migrations, each in its own transaction, in place
+
+    Returns the resulting schema version
+    """
+    version = get_schema_version(cursor)
+
+    for number, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        try:
+            cursor.executescript(
+                f"BEGIN;\n{migration}\nPRAGMA user_version = {number};\nCOMMIT;"
+            )
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        version = number
+
+    return version
+
+
 def create_product_table(conn: Connection, cursor: Cursor) -> None:
     """ 
     Create product table 
@@ -97,32 +387,40 @@ def insert_product(conn: Connection, cursor: Cursor, product: Product) -> None:
 
 
 async def update_product_search_results(
-    conn: AsyncConnection, cursor: AsyncCursor, search_results: Dict[str, str]
+    conn: AsyncConnection,
+    cursor: AsyncCursor,
+    search_results: List[Dict],
+    commit: bool = True,
 ) -> None:
     """
     Update product search results in database
-    """
-
-    for result in search_results:
 
-        supplier_product_sql = """UPDATE supplier_product
-            SET price = ?
-            WHERE supplier = ? AND product = ?"""
-
-        await cursor.execute(
-            supplier_product_sql,
-            (result.get("price"), result.get("supplier"), result.get("product")),
-        )
-
-        product_sql = """UPDATE product
-            SET last_updated = ?
-            WHERE name = ?"""
-
-        await cursor.execute(
-            product_sql, (result.get("last_updated"), result.get("product"))
+    Writes back the price and last_updated timestamp of each refreshed
+    (supplier, product) offer with one batched statement, in one short
+    transaction unless commit is unset.
+    """
+    # Never move a timestamp back, e.g. behind a concurrent refresh
+    try:
+        await cursor.executemany(
+            """UPDATE supplier_product
+            SET price = ?1, last_updated = ?4
+            WHERE supplier = ?2 AND product = ?3 AND last_updated < ?4""",
+            [
+                (
+                    result.get("price"),
+                    result.get("supplier"),
+                    result.get("product"),
+                    result.get("last_updated"),
+                )
+                for result in search_results
+            ],
         )
-
-    await conn.commit()
+        if commit:
+            await conn.commit()
+    except BaseException:
+        if commit:
+            await conn.rollback()
+        raise
 
 
 async def delete_supplier_product_data(
@@ -148,7 +446,8 @@ async def delete_supplier_product_data(
     product_select_sql = """SELECT supplier FROM supplier_product 
         WHERE product = ?"""
 
-    select_results = await cursor.execute(product_select_sql, (product,))
+    await cursor.execute(product_select_sql, (product,))
+    select_results = await cursor.fetchone()
 
     if not select_results:
 
@@ -160,6 +459,59 @@ async def delete_supplier_product_data(
         await conn.commit()
 
 
+class BulkWrite(NamedTuple):
+    """
+    Write of a bulk push: an "upsert", with the product row in product table
+    column order and the (supplier, product, price, last_updated) offer row,
+    or a "delete", with no product row and the (supplier, product) offer
+    """
+
+    op: str
+    product: Optional[Tuple]
+    offer: Tuple
+
+
+async def bulk_write_supplier_product_data(
+    conn: AsyncConnection,
+    cursor: AsyncCursor,
+    writes: List[BulkWrite],
+    commit: bool = True,
+) -> None:
+    """
+    Apply bulk upserts and deletes of supplier_product data, in order, in one
+    transaction unless commit is unset
+
+    Runs of writes of the same kind are applied with one batched statement
+    per table. As with update_supplier_product_data and
+    delete_supplier_product_data, upserts create or update products, and
+    products left without suppliers are deleted.
+    """
+    try:
+        for op, run in itertools.groupby(writes, key=lambda write: write.op):
+            run = list(run)
+            if op == "upsert":
+                await cursor.executemany(
+                    BULK_PRODUCT_UPSERT_SQL, [write.product for write in run]
+                )
+                await cursor.executemany(
+                    BULK_OFFER_UPSERT_SQL, [write.offer for write in run]
+                )
+            else:
+                await cursor.executemany(
+                    BULK_OFFER_DELETE_SQL, [write.offer for write in run]
+                )
+                await cursor.executemany(
+                    BULK_PRODUCT_DELETE_SQL,
+                    [(product,) for product in {write.offer[1] for write in run}],
+                )
+        if commit:
+            await conn.commit()
+    except BaseException:
+        if commit:
+            await conn.rollback()
+        raise
+
+
 async def update_supplier_product_data(
     conn: AsyncConnection,
     cursor: AsyncCursor,
@@ -169,7 +521,8 @@ async def update_supplier_product_data(
     price: float,
     supplier: str,
     product_rating: float,
-    last_updated: str,
+    last_updated: int,
+    commit: bool = True,
 ) -> None:
     """
     Update product search results in database
@@ -181,7 +534,8 @@ async def update_supplier_product_data(
     product_select_sql = """SELECT name FROM product 
         WHERE name = ?"""
 
-    select_results = await cursor.execute(product_select_sql, (product,))
+    await cursor.execute(product_select_sql, (product,))
+    select_results = await cursor.fetchone()
 
     # If product exists, update data
     if select_results:
@@ -189,11 +543,14 @@ async def update_supplier_product_data(
         product_sql = """UPDATE product
             SET description = ?,
             category = ?,
-            product_rating = ?, 
+            rating = ?, 
             last_updated = ?
             WHERE name = ?"""
 
-        await cursor.execute(product_sql, (last_updated, product))
+        await cursor.execute(
+            product_sql,
+            (description, category, product_rating, last_updated, product),
+        )
 
     # Else create product
     else:
@@ -204,10 +561,13 @@ async def update_supplier_product_data(
 
     # Insert supplier_product
     await cursor.execute(
-        "INSERT INTO supplier_product values(?, ?, ?)", (supplier, product, price)
+        """INSERT INTO supplier_product (supplier, product, price, last_updated)
+        VALUES (?, ?, ?, ?)""",
+        (supplier, product, price, last_updated),
     )
 
-    await conn.commit()
+    if commit:
+        await conn.commit()
 
 
 def insert_supplier(conn: Connection, cursor: Cursor, supplier: Supplier) -> None:
@@ -228,55 +588,227 @@ def insert_supplier_product(
     Insert supplier into database
     """
     cursor.execute(
-        "INSERT INTO supplier_product values(?, ?, ?)",
+        "INSERT INTO supplier_product (supplier, product, price) VALUES (?, ?, ?)",
         (supplier_product.supplier, supplier_product.product, supplier_product.price),
     )
     conn.commit()
 
 
+async def select_suppliers(
+    conn: AsyncConnection, cursor: AsyncCursor, names: List[str]
+) -> Dict[str, Supplier]:
+    """
+    Select suppliers by name
+    """
+    names = list(names)
+    placeholders = ", ".join("?" for _ in names)
+    await cursor.execute(
+        f"SELECT name, pull_url, rating FROM supplier WHERE name IN ({placeholders})",
+        names,
+    )
+    rows = await cursor.fetchall()
+    return {
+        row["name"]: Supplier(
+            name=row["name"], pull_url=row["pull_url"], rating=row["rating"]
+        )
+        for row in rows
+    }
+
+
+async def insert_cache_invalidations(
+    conn: AsyncConnection,
+    cursor: AsyncCursor,
+    invalidations: List[Tuple[str, Optional[str]]],
+    created: float,
+    expired: float,
+    commit: bool = True,
+) -> List[int]:
+    """
+    Publish search cache invalidations for (product, category) writes in one
+    transaction unless commit is unset, pruning those created before expired,
+    and return their ids
+    """
+    await cursor.execute("DELETE FROM cache_invalidation WHERE created < ?", [expired])
+    invalidation_ids = []
+    for product, category in invalidations:
+        await cursor.execute(
+            "INSERT INTO cache_invalidation (product, category, created)"
+            " VALUES (?, ?, ?)",
+            [product, category, created],
+        )
+        invalidation_ids.append(cursor.lastrowid)
+    if commit:
+        await conn.commit()
+    return invalidation_ids
+
+
+async def select_cache_invalidations(
+    conn: AsyncConnection, cursor: AsyncCursor, after: int
+) -> List[Dict]:
+    """
+    Select search cache invalidations published after the given id, in order
+    """
+    await cursor.execute(
+        "SELECT id, product, category FROM cache_invalidation WHERE id > ? ORDER BY id",
+        [after],
+    )
+    return await cursor.fetchall()
+
+
+async def select_last_cache_invalidation(
+    conn: AsyncConnection, cursor: AsyncCursor
+) -> int:
+    """
+    Get the id of the latest search cache invalidation, or 0 if none
+    """
+    await cursor.execute("SELECT COALESCE(MAX(id), 0) AS id FROM cache_invalidation")
+    row = await cursor.fetchone()
+    return row["id"]
+
+
+async def select_search_results(
+    conn: AsyncConnection, cursor: AsyncCursor, product: Optional[str] = None
+) -> List[Dict]:
+    """
+    Select the search results of every offer, or of product's offers, unranked
+    """
+    if product is None:
+        await cursor.execute(SEARCH_RESULTS_SQL)
+    else:
+        await cursor.execute(
+            SEARCH_RESULTS_SQL + "\n    WHERE supplier_product.product = ?",
+            (product,),
+        )
+    return await cursor.fetchall()
+
+
+async def select_products_search_results(
+    conn: AsyncConnection, cursor: AsyncCursor, products: Iterable[str]
+) -> List[Dict]:
+    """
+    Select the search results of the given products' offers, unranked, with
+    one query per PRODUCTS_PER_QUERY products
+    """
+    products = list(products)
+    search_results = []
+    for start in range(0, len(products), PRODUCTS_PER_QUERY):
+        chunk = products[start : start + PRODUCTS_PER_QUERY]
+        await cursor.execute(
+            PRODUCTS_SEARCH_RESULTS_SQL.format(products=", ".join("?" * len(chunk))),
+            chunk,
+        )
+        search_results += await cursor.fetchall()
+    return search_results
+
+
 async def search_by_product_or_category(
-    conn, cursor, product: str = "", category: str = ""
+    conn,
+    cursor,
+    product: str = "",
+    category: str = "",
+    limit: int = -1,
+    after: Optional[Tuple[float, str, str]] = None,
+    text: str = "",
 ) -> List[str]:
     """
-    Search products by product and or category
+    Search products by product and or category, and optionally by text found
+    in their names or descriptions
 
-    Returns results ranked by combined product.rating + supplier.rating
+    Returns results ranked by combined product.rating + supplier.rating,
+    as stored in supplier_product.combined_rating. Gives up to limit results
+    (or all, if negative), starting after the given (combined_rating,
+    supplier, product) position in the ranking.
     """
 
-    if (not product) and (not category):
-        filter_term = ""
-    elif product and category:
-        filter_term = (
-            f"\n        WHERE product = '{product}' AND category = '{category}'"
-        )
-    elif product:
-        filter_term = f"\n        WHERE product = '{product}'"
-    else:
-        filter_term = f"\n        WHERE category = '{category}'"
-
-    statement = f"""
-        SELECT product.name as product,
-            product.description as description,
-            product.category as category,
-            supplier_product.price as price,
-            supplier_product.supplier as supplier,
-            supplier_product.price as price,
-            product.rating as product_rating,
-            supplier.rating as supplier_rating,
-            ROUND(((product.rating + supplier.rating)/2),2) as combined_rating,
-            product.last_updated as last_updated 
-        FROM product 
-        INNER JOIN supplier_product
-        ON product.name = supplier_product.product
-        INNER JOIN supplier 
-        ON supplier_product.supplier = supplier.name {filter_term}
-        ORDER BY (product.rating + supplier.rating) DESC
-        """
-    await cursor.execute(statement)
+    await cursor.execute(*get_search_statement(product, category, limit, after, text))
     categories = await cursor.fetchall()
     return categories
 
 
+async def search_many(
+    conn: AsyncConnection,
+    cursor: AsyncCursor,
+    searches: List[Tuple[Optional[str], Optional[str], int]],
+) -> List[List[Dict]]:
+    """
+    Run a batch of (product, category, limit) searches with a single query
+
+    Runs each search's statement, as search_by_product_or_category would,
+    within a single UNION ALL query, and splits the offers selected into the
+    results of each search. Every search must filter on product or category.
+    """
+    statements = []
+    parameters = []
+    for search, (product, category, limit) in enumerate(searches):
+        statement, search_parameters = get_search_statement(
+            product or "", category or "", limit, None
+        )
+        statements.append(SEARCH_MANY_TERM_SQL.format(statement=statement))
+        parameters += [search, *search_parameters]
+    await cursor.execute(
+        "\n    UNION ALL\n    ".join(statements) + SEARCH_MANY_ORDER_SQL, parameters
+    )
+
+    found: List[List[Dict]] = [[] for _ in searches]
+    for result in await cursor.fetchall():
+        found[result["search"]].append(drop_values(result, "search"))
+    return found
+
+
+async def iter_search_by_product_or_category(
+    conn,
+    cursor,
+    product: str = "",
+    category: str = "",
+    limit: int = -1,
+    after: Optional[Tuple[float, str, str]] = None,
+    chunk_size: int = 500,
+    text: str = "",
+) -> AsyncIterator[List[Dict]]:
+    """
+    Search products by product and or category, as search_by_product_or_category,
+    yielding results in chunks of up to chunk_size rather than all at once
+    """
+
+    await cursor.execute(*get_search_statement(product, category, limit, after, text))
+    while True:
+        results = await cursor.fetchmany(chunk_size)
+        if not results:
+            break
+        yield results
+
+
+def get_search_statement(
+    product: str,
+    category: str,
+    limit: int,
+    after: Optional[Tuple[float, str, str]],
+    text: str = "",
+) -> Tuple[str, List]:
+    """
+    Get search statement and its parameters for the given filters
+    """
+    statement = SEARCH_STATEMENTS[
+        (bool(product), bool(category), bool(text), bool(after))
+    ]
+    parameters = [term for term in (product, category) if term]
+    if text:
+        parameters += [like_pattern(text)] * 2
+    if after:
+        combined_rating, supplier, after_product = after
+        parameters += [combined_rating, combined_rating, supplier, after_product]
+    parameters.append(limit)
+    return statement, parameters
+
+
+def like_pattern(text: str) -> str:
+    """
+    Get a LIKE pattern matching text anywhere in a value, escaping wildcards
+    """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
 def insert_supplier(conn, cursor, supplier: Supplier) -> None:
     """
     Insert supplier into database
@@ -0,0 +1,162 @@
+import glob
+import itertools
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+
+from product_comparison_service.database.database import (
+    get_database_conn_and_cursor,
+)
+from product_comparison_service.database.loader import (
+    bulk_insert,
+    read_jsonl,
+    to_row,
+)
+
+# Tables in the order their shards are loaded, so that the suppliers and
+# products referenced by supplier_product rows always exist first
+SHARD_TABLES = ("supplier", "product", "supplier_product")
+
+
+def shard_table(filename: str) -> Optional[str]:
+    """
+    Get the table a shard is loaded into from its file name, e.g.
+    products-0001.jsonl is loaded into product
+    """
+    name = os.path.basename(filename)
+    # Longest first, so supplier_products* shards are not taken for suppliers*
+    for table in sorted(SHARD_TABLES, key=len, reverse=True):
+        if name.startswith(table):
+            return table
+    return None
+
+
+def find_shards(path: str) -> Dict[str, List[str]]:
+    """
+    Find the JSONL shards in a directory, or matching a glob, by table
+    """
+    pattern = os.path.join(path, "*.jsonl") if os.path.isdir(path) else path
+    shards = {table: [] for table in SHARD_TABLES}
+    for filename in sorted(glob.glob(pattern)):
+        table = shard_table(filename)
+        if table is not None:
+            shards[table].append(filename)
+    return shards
+
+
+def parse_batch(table: str, lines: List[str], filename: str, start: int) -> List[Tuple]:
+    """
+    Decode and validate a batch of shard lines into table rows. Run in worker
+    processes, so must stay a picklable module level function.
+    """
+    try:
+        return [to_row(table, record) for record in read_jsonl(lines, start)]
+    except ValueError as error:
+        raise ValueError(f"{filename}: {error}")
+
+
+class ShardWriter(threading.Thread):
+    """
+    Single writer inserting batches of rows taken from a bounded queue, each
+    in its own transaction, through its own connection.
+
+    After a failed write the remaining batches are drained and discarded, so
+    producers never block on a full queue; the error is kept in error.
+    """
+
+    def __init__(self, database: str, queue_size: int, upsert: bool = False):
+        super().__init__(daemon=True)
+        self.database = database
+        self.upsert = upsert
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.rows = {table: 0 for table in SHARD_TABLES}
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        conn, cursor = get_database_conn_and_cursor(self.database)
+        try:
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    return
+                if self.error is not None:
+                    continue
+                table, rows = batch
+                try:
+                    self.rows[table] += bulk_insert(
+                        conn,
+                        cursor,
+                        table,
+                        rows,
+                        chunk_size=max(len(rows), 1),
+                        upsert=self.upsert,
+                    )
+                except BaseException as error:
+                    self.error = error
+        finally:
+            conn.close()
+
+    def put(self, table: str, rows: List[Tuple]) -> None:
+        self.queue.put((table, rows))
+
+    def stop(self) -> None:
+        self.queue.put(None)
+        self.join()
+
+
+def ingest_shards(
+    database: str,
+    path: str,
+    chunk_size: int = 10000,
+    upsert: bool = False,
+    workers: Optional[int] = None,
+    queue_size: int = 8,
+) -> Dict[str, int]:
+    """
+    Load every shard in a directory or glob into the database, returning the
+    number of rows loaded per table.
+
+    Shards are read in batches of chunk_size lines, which are decoded and
+    validated in a pool of worker processes. Parsed batches are handed, in
+    order, to a single writer thread through a queue of at most queue_size
+    batches, so SQLite only ever sees one writer and memory stays bounded.
+    """
+    assert chunk_size > 0
+    shards = find_shards(path)
+    workers = workers or os.cpu_count() or 1
+    # Enough batches in flight to keep every worker busy
+    max_pending = 2 * workers
+    pending: Deque[Tuple[str, Future]] = deque()
+
+    writer = ShardWriter(database, queue_size=queue_size, upsert=upsert)
+    writer.start()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for table in SHARD_TABLES:
+                for filename in shards[table]:
+                    with open(filename, encoding="utf-8") as file:
+                        start = 1
+                        while writer.error is None:
+                            lines = list(itertools.islice(file, chunk_size))
+                            if not lines:
+                                break
+                            future = pool.submit(
+                                parse_batch, table, lines, filename, start
+                            )
+                            pending.append((table, future))
+                            start += len(lines)
+                            while len(pending) >= max_pending:
+                                table_parsed, parsed = pending.popleft()
+                                writer.put(table_parsed, parsed.result())
+            while pending:
+                table_parsed, parsed = pending.popleft()
+                writer.put(table_parsed, parsed.result())
+    finally:
+        writer.stop()
+
+    if writer.error is not None:
+        raise writer.error
+    return writer.rows
@@ -0,0 +1,168 @@
+import itertools
+import json
+from typing import Dict, Iterable, Iterator, NamedTuple, Tuple, Type
+from sqlite3 import Connection, Cursor
+
+from product_comparison_service.data_classes.data_classes import (
+    Product,
+    Supplier,
+    SupplierProduct,
+)
+from product_comparison_service.timestamps import to_epoch
+
+
+class BulkTable(NamedTuple):
+    """
+    Table loaded from batch files: the data class validating its records, the
+    columns loaded, the key that upserts resolve conflicts on and the columns
+    holding timestamps, stored as seconds since the epoch
+    """
+
+    data_class: Type
+    columns: Tuple[str, ...]
+    key: Tuple[str, ...]
+    timestamps: Tuple[str, ...] = ()
+
+
+BULK_TABLES = {
+    "product": BulkTable(
+        data_class=Product,
+        columns=("name", "description", "category", "last_updated", "rating"),
+        key=("name",),
+        timestamps=("last_updated",),
+    ),
+    "supplier": BulkTable(
+        data_class=Supplier,
+        columns=("name", "pull_url", "rating"),
+        key=("name",),
+    ),
+    "supplier_product": BulkTable(
+        data_class=SupplierProduct,
+        columns=("supplier", "product", "price"),
+        key=("supplier", "product"),
+    ),
+}
+
+
+def read_jsonl(lines: Iterable[str], start: int = 1) -> Iterator[Dict]:
+    """
+    Lazily parse JSONL lines, numbered from start, skipping blank ones
+    """
+    for line_number, line in enumerate(lines, start=start):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise ValueError(f"Invalid JSON on line {line_number}: {error}")
+
+
+def to_row(table: str, record: Dict) -> Tuple:
+    """
+    Validate record against the table's data class and get its column values,
+    in column order. Fields missing from record take the data class default.
+    Timestamps may be given as DATETIME_FORMAT strings or epoch seconds.
+    """
+    bulk_table = BULK_TABLES[table]
+    try:
+        entry = bulk_table.data_class(
+            **{
+                column: record[column]
+                for column in bulk_table.columns
+                if column in record
+            }
+        )
+        return tuple(
+            to_epoch(getattr(entry, column))
+            if column in bulk_table.timestamps
+            else getattr(entry, column)
+            for column in bulk_table.columns
+        )
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Invalid {table} record {record}: {error}")
+
+
+def get_insert_statement(table: str, upsert: bool = False) -> str:
+    """
+    Get parameterized INSERT statement for table, updating existing rows with
+    the same key when upsert is set
+    """
+    bulk_table = BULK_TABLES[table]
+    statement = "INSERT INTO {table} ({columns}) VALUES ({placeholders})".format(
+        table=table,
+        columns=", ".join(bulk_table.columns),
+        placeholders=", ".join("?" for _ in bulk_table.columns),
+    )
+    if upsert:
+        statement += " ON CONFLICT ({key}) DO UPDATE SET {updates}".format(
+            key=", ".join(bulk_table.key),
+            updates=", ".join(
+                f"{column} = excluded.{column}"
+                for column in bulk_table.columns
+                if column not in bulk_table.key
+            ),
+        )
+    return statement
+
+
+def bulk_insert(
+    conn: Connection,
+    cursor: Cursor,
+    table: str,
+    rows: Iterable[Tuple],
+    chunk_size: int = 10000,
+    upsert: bool = False,
+) -> int:
+    """
+    Insert rows into table with executemany, committing one transaction per
+    chunk_size rows, and return the number of rows inserted.
+
+    rows is consumed lazily, so may be a generator over a file of any size.
+    On failure the current chunk is rolled back; earlier chunks stay committed.
+    """
+    assert chunk_size > 0
+    statement = get_insert_statement(table, upsert)
+    rows = iter(rows)
+    count = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return count
+        try:
+            cursor.executemany(statement, chunk)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        count += len(chunk)
+
+
+def load_jsonl(
+    conn: Connection,
+    cursor: Cursor,
+    table: str,
+    filename: str,
+    chunk_size: int = 10000,
+    upsert: bool = False,
+) -> int:
+    """
+    Stream a JSONL file of table records into the database, returning the
+    number of rows loaded
+    """
+    with open(filename, encoding="utf-8") as file:
+        return bulk_insert(
+            conn,
+            cursor,
+            table,
+            (to_row(table, record) for record in read_jsonl(file)),
+            chunk_size=chunk_size,
+            upsert=upsert,
+        )
+
+
+def describe_load(table: str, rows: int, seconds: float) -> str:
+    """
+    Summarise a load with its throughput, for reporting
+    """
+    rate = rows / seconds if seconds > 0 else float("inf")
+    return f"Loaded {rows} {table} rows in {seconds:.2f}s ({rate:.0f} rows/s)"
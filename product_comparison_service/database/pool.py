@@ -0,0 +1,100 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+
+import aiosqlite
+from aiosqlite import Connection as AsyncConnection
+
+
+class AsyncConnectionPool:
+    """
+    Fixed-size pool of long-lived aiosqlite connections.
+
+    Connections are opened lazily, up to size, and configured with the given
+    pragmas when first created. Acquirers wait for a free connection once the
+    pool is exhausted. Each aiosqlite connection owns a background thread, so
+    close() must be awaited on shutdown to stop them.
+    """
+
+    def __init__(
+        self,
+        database: str,
+        size: int = 5,
+        pragmas: Optional[Dict[str, Union[str, int]]] = None,
+        row_factory: Optional[Callable] = None,
+    ):
+        assert size > 0
+        self.database = database
+        self.size = size
+        self.pragmas = pragmas or {}
+        self.row_factory = row_factory
+        self._connections: List[AsyncConnection] = []
+        self._opening = 0
+        self._idle: Optional[asyncio.Queue] = None
+        self._closed = False
+
+    async def _connect(self) -> AsyncConnection:
+        conn = await aiosqlite.connect(self.database)
+        try:
+            for pragma, value in self.pragmas.items():
+                await conn.execute(f"PRAGMA {pragma} = {value}")
+        except BaseException:
+            await conn.close()
+            raise
+        conn.row_factory = self.row_factory
+        return conn
+
+    async def acquire(self) -> AsyncConnection:
+        """
+        Take a connection from the pool, opening a new one if below size
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        # Created lazily so the queue binds to the running event loop
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+
+        opened = len(self._connections) + self._opening
+        if self._idle.empty() and opened < self.size:
+            # Count the connection before awaiting so concurrent acquirers
+            # cannot open more than size connections
+            self._opening += 1
+            try:
+                conn = await self._connect()
+            finally:
+                self._opening -= 1
+            self._connections.append(conn)
+            return conn
+
+        conn = await self._idle.get()
+
+        # Discard any transaction left open by a failed request
+        if conn.in_transaction:
+            await conn.rollback()
+        return conn
+
+    def release(self, conn: AsyncConnection) -> None:
+        """
+        Return a connection to the pool
+        """
+        if self._closed:
+            return
+        self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[AsyncConnection]:
+        conn = await self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    async def close(self) -> None:
+        """
+        Close all connections, stopping their background threads
+        """
+        self._closed = True
+        connections, self._connections = self._connections, []
+        for conn in connections:
+            await conn.close()
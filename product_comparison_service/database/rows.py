@@ -0,0 +1,120 @@
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Mapping, Tuple, Type
+
+
+class Row(tuple):
+    """
+    Compact database row: a tuple of column values, read like a dict of column
+    names to values.
+
+    Rows of a query share one Row subclass holding its column names, see
+    row_class, so each row stores only its values. Rows are read-only; use
+    replace to get a copy with some values changed.
+    """
+
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._index
+
+    def __repr__(self) -> str:
+        return f"Row({dict(self.items())!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def values(self) -> Tuple:
+        return tuple(self)
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._fields, self)
+
+    def replace(self, **changes) -> "Row":
+        """
+        Copy the row with the given columns changed
+        """
+        values = list(self)
+        for column, value in changes.items():
+            values[self._index[column]] = value
+        return type(self)(values)
+
+
+@lru_cache(maxsize=None)
+def row_class(fields: Tuple[str, ...]) -> Type[Row]:
+    """
+    Get the Row subclass for rows with the given column names
+    """
+    return type(
+        "Row",
+        (Row,),
+        {
+            "__slots__": (),
+            "_fields": fields,
+            "_index": {field: index for index, field in enumerate(fields)},
+        },
+    )
+
+
+# Column descriptions are shared by all rows of a query, so the Row subclass
+# for the last one seen is kept at hand
+_last_row_class: Tuple[Any, Type[Row]] = (None, Row)
+
+
+def row_factory(cursor, row: Tuple) -> Row:
+    """
+    Row factory for sqlite3 and aiosqlite connections, giving Rows that share
+    their query's column names
+    """
+    global _last_row_class
+    description, cls = _last_row_class
+    if description is not cursor.description:
+        description = cursor.description
+        cls = row_class(tuple(column[0] for column in description))
+        _last_row_class = (description, cls)
+    return cls(row)
+
+
+def replace_values(row: Mapping, **changes) -> Mapping:
+    """
+    Copy a Row or dict row with the given columns changed, keeping its type
+    """
+    if isinstance(row, Row):
+        return row.replace(**changes)
+    return dict(row, **changes)
+
+
+def drop_values(row: Mapping, *columns: str) -> Mapping:
+    """
+    Copy a Row or dict row without the given columns, keeping its type
+    """
+    if isinstance(row, Row):
+        fields = tuple(field for field in row._fields if field not in columns)
+        return row_class(fields)(row[field] for field in fields)
+    return {column: value for column, value in row.items() if column not in columns}
+
+
+def sizeof_rows(rows: Iterable[Mapping]) -> int:
+    """
+    Estimate the bytes held by a list of Row or dict rows, counting each row
+    and its values but not the column names rows share
+    """
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        size += sum(sys.getsizeof(value) for value in row.values())
+    return size
@@ -0,0 +1,165 @@
+import bisect
+import heapq
+import itertools
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from product_comparison_service.database.rows import replace_values
+from product_comparison_service.database.text_index import TextIndex
+
+# Position of a search result in the ranking: by combined_rating descending,
+# then supplier and product, as SEARCH_SQL orders results
+RankKey = Tuple[float, str, str]
+
+
+def rank_key(result: Mapping) -> RankKey:
+    return (-result["combined_rating"], result["supplier"], result["product"])
+
+
+class SearchIndex:
+    """
+    In-process read model of ranked search results, loaded from and kept in
+    step with the database, which remains the system of record.
+
+    Holds the search result of every (supplier, product) offer, and posting
+    lists of offers for the whole ranking, by product and by category, each
+    kept sorted by rank. A search is a lookup, a bisect to the cursor and a
+    slice. Text searches match products by the words of their names and
+    descriptions (see TextIndex), and merge their postings in rank order.
+    Writes replace the postings of the product written to, and price
+    refreshes replace results in place, as they do not change the ranking.
+    """
+
+    def __init__(self):
+        self._results: Dict[Tuple[str, str], Mapping] = {}
+        self._ranking: List[RankKey] = []
+        self._by_product: Dict[str, List[RankKey]] = {}
+        self._by_category: Dict[str, List[RankKey]] = {}
+        self._text = TextIndex()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def load(self, search_results: Iterable[Mapping]) -> None:
+        """
+        Replace the index with the given search results, in any order
+        """
+        self._results = {}
+        self._by_product = {}
+        self._by_category = {}
+        self._text = TextIndex()
+        for result in search_results:
+            key = rank_key(result)
+            self._results[(result["supplier"], result["product"])] = result
+            if result["product"] not in self._by_product:
+                self._text.add(result["product"], result["description"])
+            self._by_product.setdefault(result["product"], []).append(key)
+            self._by_category.setdefault(result["category"], []).append(key)
+        self._ranking = sorted(rank_key(result) for result in self._results.values())
+        for postings in itertools.chain(
+            self._by_product.values(), self._by_category.values()
+        ):
+            postings.sort()
+
+    def search(
+        self,
+        product: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = -1,
+        after: Optional[Tuple[float, str, str]] = None,
+        text: Optional[str] = None,
+    ) -> List[Mapping]:
+        """
+        Search as search_by_product_or_category does, giving up to limit
+        results (or all, if negative) after the given position in the ranking,
+        of products matching text if given
+        """
+        if text:
+            products = self._text.match(text)
+            if product:
+                products &= {product}
+            candidates = [self._by_product[match] for match in products]
+        elif product:
+            candidates = [self._by_product.get(product, [])]
+        elif category:
+            candidates = [self._by_category.get(category, [])]
+        else:
+            candidates = [self._ranking]
+
+        postings = []
+        for candidate in candidates:
+            start = 0
+            if after is not None:
+                combined_rating, supplier, after_product = after
+                start = bisect.bisect_right(
+                    candidate, (-combined_rating, supplier, after_product)
+                )
+            postings.append(itertools.islice(candidate, start, None))
+
+        # Products' offers are few, so filter them by category directly
+        filter_category = category and (product or text)
+
+        results = []
+        for _, supplier, result_product in heapq.merge(*postings):
+            if len(results) == limit:
+                break
+            result = self._results[(supplier, result_product)]
+            if filter_category and result["category"] != category:
+                continue
+            results.append(result)
+        return results
+
+    def replace_product(self, product: str, search_results: List[Mapping]) -> None:
+        """
+        Replace the search results for product's offers, after a write to it
+        """
+        for _, supplier, _ in list(self._by_product.get(product, [])):
+            self._remove((supplier, product))
+        for result in search_results:
+            self._add(result)
+
+    def update_results(self, search_results: Iterable[Mapping]) -> int:
+        """
+        Replace the prices and timestamps of refreshed offers, unless the
+        indexed results are as recent. Returns the number of results replaced.
+        """
+        replaced = 0
+        for result in search_results:
+            offer = (result["supplier"], result["product"])
+            current = self._results.get(offer)
+            if current is None or current["last_updated"] >= result["last_updated"]:
+                continue
+            # Only the price and timestamp are written back, as in the database
+            self._results[offer] = replace_values(
+                current, price=result["price"], last_updated=result["last_updated"]
+            )
+            replaced += 1
+        return replaced
+
+    def _add(self, result: Mapping) -> None:
+        key = rank_key(result)
+        self._results[(result["supplier"], result["product"])] = result
+        if result["product"] not in self._text:
+            self._text.add(result["product"], result["description"])
+        bisect.insort(self._ranking, key)
+        bisect.insort(self._by_product.setdefault(result["product"], []), key)
+        bisect.insort(self._by_category.setdefault(result["category"], []), key)
+
+    def _remove(self, offer: Tuple[str, str]) -> None:
+        result = self._results.pop(offer)
+        key = rank_key(result)
+        _discard(self._ranking, key)
+        for postings, term in (
+            (self._by_product, result["product"]),
+            (self._by_category, result["category"]),
+        ):
+            _discard(postings[term], key)
+            if not postings[term]:
+                del postings[term]
+        if result["product"] not in self._by_product:
+            self._text.remove(result["product"])
+
+
+def _discard(postings: List[RankKey], key: RankKey) -> None:
+    index = bisect.bisect_left(postings, key)
+    if index < len(postings) and postings[index] == key:
+        del postings[index]
@@ -0,0 +1,154 @@
+import bisect
+import itertools
+import re
+from collections import Counter
+from typing import Dict, Iterator, List, Set
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lower case words
+    """
+    return _WORD.findall(text.lower()) if text else []
+
+
+def trigrams(word: str) -> Set[str]:
+    """
+    Get the trigrams of word, padded at its start only, so that the trigrams
+    of a prefix of a word are among those of the word
+    """
+    padded = "  " + word
+    return {padded[i : i + 3] for i in range(len(word))}
+
+
+def prefix_distance(word: str, term: str, max_distance: int) -> int:
+    """
+    Get the edit distance from word to the closest prefix of term, counting
+    insertions, deletions, substitutions and transpositions of adjacent
+    letters, or max_distance + 1 if it is greater than max_distance
+    """
+    previous = None
+    row = list(range(len(term) + 1))
+    for i in range(1, len(word) + 1):
+        current = [i] + [0] * len(term)
+        for j in range(1, len(term) + 1):
+            current[j] = min(
+                row[j] + 1,
+                current[j - 1] + 1,
+                row[j - 1] + (word[i - 1] != term[j - 1]),
+            )
+            if (
+                i > 1
+                and j > 1
+                and word[i - 1] == term[j - 2]
+                and word[i - 2] == term[j - 1]
+            ):
+                current[j] = min(current[j], previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous, row = row, current
+    return min(row)
+
+
+class TextIndex:
+    """
+    Index of the words in product names and descriptions, matching search
+    text to products.
+
+    A product matches if, for each word of the search text, its name or
+    description has a word starting with it, give or take typos: up to
+    one edit for words of 4 to 7 letters, and two for longer words. Words
+    are kept sorted, so exact prefixes are a bisect away, and by trigram, so
+    typo-tolerant matches are only checked against words sharing enough
+    trigrams with the search word to be within reach.
+    """
+
+    def __init__(self):
+        self._products: Dict[str, Set[str]] = {}
+        self._words: Dict[str, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._trigrams: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def __contains__(self, product: str) -> bool:
+        return product in self._products
+
+    def add(self, product: str, description: str) -> None:
+        """
+        Index product by the words of its name and description, replacing
+        any words it was indexed by before
+        """
+        self.remove(product)
+        words = set(tokenize(product)) | set(tokenize(description))
+        self._products[product] = words
+        for word in words:
+            if word not in self._words:
+                self._words[word] = set()
+                bisect.insort(self._vocabulary, word)
+                for trigram in trigrams(word):
+                    self._trigrams.setdefault(trigram, set()).add(word)
+            self._words[word].add(product)
+
+    def remove(self, product: str) -> None:
+        """
+        Stop indexing product, if indexed
+        """
+        for word in self._products.pop(product, ()):
+            products = self._words[word]
+            products.discard(product)
+            if products:
+                continue
+            del self._words[word]
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+            for trigram in trigrams(word):
+                words = self._trigrams[trigram]
+                words.discard(word)
+                if not words:
+                    del self._trigrams[trigram]
+
+    def match(self, text: str) -> Set[str]:
+        """
+        Get the products matching every word of text
+        """
+        products = None
+        for word in set(tokenize(text)):
+            word_products = set()
+            for term in self._terms(word):
+                word_products |= self._words[term]
+            products = word_products if products is None else products & word_products
+            if not products:
+                break
+        return products or set()
+
+    def _terms(self, word: str) -> Iterator[str]:
+        # Words starting with word
+        start = bisect.bisect_left(self._vocabulary, word)
+        for term in itertools.islice(self._vocabulary, start, None):
+            if not term.startswith(word):
+                break
+            yield term
+
+        max_edits = 0 if len(word) < 4 else 1 if len(word) < 8 else 2
+        if not max_edits:
+            return
+
+        # Each edit changes at most 3 of the word's trigrams, so words within
+        # max_edits of it share all but 3 * max_edits of them
+        word_trigrams = trigrams(word)
+        shared = Counter(
+            term
+            for trigram in word_trigrams
+            for term in self._trigrams.get(trigram, ())
+        )
+        min_shared = len(word_trigrams) - 3 * max_edits
+        for term, count in shared.items():
+            if (
+                count >= min_shared
+                and not term.startswith(word)
+                and prefix_distance(word, term, max_edits) <= max_edits
+            ):
+                yield term
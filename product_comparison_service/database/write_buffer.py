@@ -0,0 +1,138 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiosqlite import Connection as AsyncConnection, Cursor as AsyncCursor
+
+from product_comparison_service.database.pool import AsyncConnectionPool
+
+# A write: statements run on the writer's connection and cursor, not
+# committing, and the future resolved with their result once committed
+Write = Callable[[AsyncConnection, AsyncCursor], Awaitable[Any]]
+_Pending = Tuple[Write, asyncio.Future]
+
+
+class WriteBuffer:
+    """
+    Funnels database writes through a single writer coroutine, which applies
+    them in group commits.
+
+    Writes arriving within window seconds of the first one waiting, up to
+    max_batch of them, are applied in one transaction, each within a
+    savepoint of its own, so that a failing write is rolled back and fails
+    alone. Callers are resumed once the transaction commits, so concurrent
+    writers share one commit, and one fsync, instead of queueing on the
+    database lock for their own.
+
+    The writer uses the given pool's connection, whose pragmas set the
+    durability of commits (see WRITE_SYNCHRONOUS in config.py). close() must
+    be awaited on shutdown to apply pending writes and close the pool.
+    """
+
+    def __init__(
+        self, pool: AsyncConnectionPool, window: float = 0.002, max_batch: int = 100
+    ):
+        assert window >= 0 and max_batch > 0
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.commits = 0
+        self.writes = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Future] = None
+        self._closed = False
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the number of writes committed and of commits they took
+        """
+        return {"writes": self.writes, "commits": self.commits}
+
+    async def write(self, write: Write) -> Any:
+        """
+        Apply write in the next group commit, returning its result once
+        committed, or raising its error once rolled back
+        """
+        if self._closed:
+            raise RuntimeError("Write buffer is closed")
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._writer = asyncio.ensure_future(self._run())
+
+        future = asyncio.get_event_loop().create_future()
+        self._queue.put_nowait((write, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._gather()
+            try:
+                await self._commit(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _gather(self) -> List[_Pending]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_event_loop().time() + self.window
+        while len(batch) < self.max_batch:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - asyncio.get_event_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _commit(self, batch: List[_Pending]) -> None:
+        outcomes = []
+        async with self.pool.connection() as conn:
+            cursor = await conn.cursor()
+            try:
+                await cursor.execute("BEGIN IMMEDIATE")
+                for write, future in batch:
+                    await cursor.execute("SAVEPOINT write")
+                    try:
+                        outcomes.append((future, await write(conn, cursor), None))
+                    except Exception as error:
+                        await cursor.execute("ROLLBACK TO write")
+                        outcomes.append((future, None, error))
+                    await cursor.execute("RELEASE write")
+                await conn.commit()
+            except BaseException as error:
+                if conn.in_transaction:
+                    await conn.rollback()
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                if not isinstance(error, Exception):
+                    raise
+                return
+
+        self.commits += 1
+        self.writes += sum(error is None for _, _, error in outcomes)
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    async def close(self) -> None:
+        """
+        Apply pending writes, then stop the writer and close its pool
+        """
+        self._closed = True
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        await self.pool.close()
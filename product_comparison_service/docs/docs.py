@@ -31,7 +31,7 @@ DOCS = """
 <script src="https://cdnjs.cloudflare.com/ajax/libs/swagger-ui/3.24.2/swagger-ui-standalone-preset.js"> </script>
 <script>
 window.onload = function() {
-  var spec = {"swagger": "2.0", "info": {"description": "Coding test project for Relayr.", "version": "0.1", "title": "Product Comparison Service", "contact": {"email": "butleraidan@gmail.com"}}, "host": "localhost:8888", "basePath": "/v0.1/", "tags": [{"name": "product", "description": "Products", "externalDocs": {"description": "Products", "url": "localhost:8888/product"}}], "schemes": ["http"], "paths": {"/product": {"get": {"tags": ["product"], "summary": "Search products by name and category", "description": "Multiple status values can be provided with comma separated strings", "operationId": "searchProduct", "produces": ["application/json"], "parameters": [{"name": "product", "type": "string", "in": "query", "description": "Name of product to filter by", "required": false, "collectionFormat": "multi"}, {"name": "category", "type": "string", "in": "query", "description": "Category of product to filter by", "required": false, "collectionFormat": "multi"}], "responses": {"200": {"description": "successful operation", "schema": {"type": "array", "items": {"$ref": "#/definitions/Product"}}}}}, "put": {"tags": ["product"], "summary": "Upsert product", "description": "Creates or updates a product for a supplier", "operationId": "upsertProduct", "produces": ["application/json"], "parameters": [{"name": "product", "type": "string", "in": "query", "description": "Name of product", "required": true, "collectionFormat": "multi"}, {"name": "category", "type": "string", "in": "query", "description": "Category of product", "required": true, "collectionFormat": "multi"}, {"name": "description", "type": "string", "in": "query", "description": "Description of product", "required": true, "collectionFormat": "multi"}, {"name": "price", "type": "number", "in": "query", "description": "Price of product", "required": true, "collectionFormat": "multi"}, {"name": "supplier", "type": "string", "in": "query", "description": "Supplier of product at given price", "required": true, "collectionFormat": "multi"}, {"name": "product_rating", "type": "number", "in": "query", "description": "Real value in range [0,1]", "required": false, "collectionFormat": "multi"}], "responses": {"200": {"description": "successful operation", "schema": {"type": "array", "items": {"$ref": "#/definitions/Upsert"}}}, "400": {"description": "bad request"}}}, "delete": {"tags": ["product"], "summary": "Deletes a product for supplier", "description": "", "operationId": "deleteProduct", "produces": ["application/json"], "parameters": [{"name": "product", "type": "string", "in": "query", "description": "Name of product to filter by", "required": false, "collectionFormat": "multi"}, {"name": "category", "type": "string", "in": "query", "description": "Category of product to filter by", "required": false, "collectionFormat": "multi"}], "responses": {"200": {"description": "successful operation", "schema": {"type": "array", "items": {"$ref": "#/definitions/Deletion"}}}, "400": {"description": "bad request"}}}}}, "definitions": {"Product": {"type": "object", "properties": {"success": {"type": "boolean"}, "search_results": {"type": "object", "properties": {"product": {"type": "string"}, "description": {"type": "string"}, "category": {"type": "string"}, "price": {"type": "string"}, "supplier": {"type": "string"}, "product_rating": {"type": "number"}, "supplier_rating": {"type": "number"}, "combined_ratng": {"type": "number"}, "last_updated": {"type": "string"}}}}}, "Upsert": {"type": "object", "properties": {"success": {"type": "boolean"}, "upsert": {"type": "object", "properties": {"product": {"type": "string"}, "description": {"type": "string"}, "category": {"type": "string"}, "price": {"type": "string"}, "supplier": {"type": "string"}, "product_rating": {"type": "number"}, "last_updated": {"type": "string"}}}}}, "Deletion": {"type": "object", "properties": {"success": {"type": "boolean"}, "upsert": {"type": "object", "properties": {"product": {"type": "string"}, "supplier": {"type": "string"}}}}}}};
+  var spec = {"swagger": "2.0", "info": {"description": "Coding test project for Relayr.", "version": "0.1", "title": "Product Comparison Service", "contact": {"email": "butleraidan@gmail.com"}}, "host": "localhost:8888", "basePath": "/v0.1/", "tags": [{"name": "product", "description": "Products", "externalDocs": {"description": "Products", "url": "localhost:8888/product"}}], "schemes": ["http"], "paths": {"/product": {"get": {"tags": ["product"], "summary": "Search products by name and category", "description": "Multiple status values can be provided with comma separated strings", "operationId": "searchProduct", "produces": ["application/json"], "parameters": [{"name": "product", "type": "string", "in": "query", "description": "Name of product to filter by", "required": false, "collectionFormat": "multi"}, {"name": "category", "type": "string", "in": "query", "description": "Category of product to filter by", "required": false, "collectionFormat": "multi"}, {"name": "q", "type": "string", "in": "query", "description": "Text to search product names and descriptions for, matching word prefixes and tolerating typos", "required": false}, {"name": "limit", "type": "integer", "in": "query", "description": "Maximum number of results per page (default 100, at most 1000, or all results when streamed)", "required": false}, {"name": "cursor", "type": "string", "in": "query", "description": "Opaque cursor of the page to get, as given by next_cursor in the previous page", "required": false}, {"name": "stream", "type": "boolean", "in": "query", "description": "Stream all results (or up to limit) from the database as chunked JSON, bypassing the cache and supplier refreshes and flagging out of date results as stale", "required": false}], "responses": {"200": {"description": "successful operation", "schema": {"type": "array", "items": {"$ref": "#/definitions/Product"}}}}}, "put": {"tags": ["product"], "summary": "Upsert product", "description": "Creates or updates a product for a supplier", "operationId": "upsertProduct", "produces": ["application/json"], "parameters": [{"name": "product", "type": "string", "in": "query", "description": "Name of product", "required": true, "collectionFormat": "multi"}, {"name": "category", "type": "string", "in": "query", "description": "Category of product", "required": true, "collectionFormat": "multi"}, {"name": "description", "type": "string", "in": "query", "description": "Description of product", "required": true, "collectionFormat": "multi"}, {"name": "price", "type": "number", "in": "query", "description": "Price of product", "required": true, "collectionFormat": "multi"}, {"name": "supplier", "type": "string", "in": "query", "description": "Supplier of product at given price", "required": true, "collectionFormat": "multi"}, {"name": "product_rating", "type": "number", "in": "query", "description": "Real value in range [0,1]", "required": false, "collectionFormat": "multi"}], "responses": {"200": {"description": "successful operation", "schema": {"type": "array", "items": {"$ref": "#/definitions/Upsert"}}}, "400": {"description": "bad request"}}}, "delete": {"tags": ["product"], "summary": "Deletes a product for supplier", "description": "", "operationId": "deleteProduct", "produces": ["application/json"], "parameters": [{"name": "product", "type": "string", "in": "query", "description": "Name of product to filter by", "required": false, "collectionFormat": "multi"}, {"name": "category", "type": "string", "in": "query", "description": "Category of product to filter by", "required": false, "collectionFormat": "multi"}], "responses": {"200": {"description": "successful operation", "schema": {"type": "array", "items": {"$ref": "#/definitions/Deletion"}}}, "400": {"description": "bad request"}}}}, "/product/batch": {"post": {"tags": ["product"], "summary": "Search products in batch", "description": "Runs up to 100 searches by product and or category at once, giving the first page of results of each, in order", "operationId": "batchSearchProducts", "consumes": ["application/json"], "produces": ["application/json"], "parameters": [{"name": "body", "in": "body", "description": "Searches, each with a product and or category and an optional limit (default 100, at most 1000)", "required": true, "schema": {"$ref": "#/definitions/BatchSearch"}}], "responses": {"200": {"description": "successful operation", "schema": {"$ref": "#/definitions/BatchSearchResults"}}, "400": {"description": "bad request"}}}}, "/product/bulk": {"post": {"tags": ["product"], "summary": "Upsert and delete products in bulk", "description": "Takes a JSON array or NDJSON lines of up to 10000 items, each upserting a product for a supplier as PUT does, or deleting it as DELETE does if its op is delete. Valid items are applied in one transaction; the status of each item is returned.", "operationId": "bulkWriteProducts", "consumes": ["application/json", "application/x-ndjson"], "produces": ["application/json"], "parameters": [{"name": "body", "in": "body", "required": true, "schema": {"type": "array", "items": {"$ref": "#/definitions/BulkItem"}}}], "responses": {"200": {"description": "successful operation", "schema": {"$ref": "#/definitions/BulkResults"}}, "400": {"description": "bad request"}}}}}, "definitions": {"BulkItem": {"type": "object", "properties": {"op": {"type": "string", "enum": ["upsert", "delete"]}, "product": {"type": "string"}, "description": {"type": "string"}, "category": {"type": "string"}, "price": {"type": "number"}, "supplier": {"type": "string"}, "product_rating": {"type": "number"}}}, "BulkResults": {"type": "object", "properties": {"success": {"type": "boolean"}, "upserted": {"type": "integer"}, "deleted": {"type": "integer"}, "invalid": {"type": "integer"}, "items": {"type": "array", "items": {"type": "object", "properties": {"index": {"type": "integer"}, "status": {"type": "string", "enum": ["upserted", "deleted", "invalid"]}, "error": {"type": "string"}}}}}}, "BatchSearch": {"type": "object", "properties": {"queries": {"type": "array", "items": {"type": "object", "properties": {"product": {"type": "string"}, "category": {"type": "string"}, "limit": {"type": "integer"}}}}}}, "BatchSearchResults": {"type": "object", "properties": {"success": {"type": "boolean"}, "results": {"type": "array", "items": {"type": "object", "properties": {"product": {"type": "string"}, "category": {"type": "string"}, "search_results": {"type": "array", "items": {"type": "object"}}, "next_cursor": {"type": "string"}}}}}}, "Product": {"type": "object", "properties": {"success": {"type": "boolean"}, "search_results": {"type": "object", "properties": {"product": {"type": "string"}, "description": {"type": "string"}, "category": {"type": "string"}, "price": {"type": "string"}, "supplier": {"type": "string"}, "product_rating": {"type": "number"}, "supplier_rating": {"type": "number"}, "combined_ratng": {"type": "number"}, "last_updated": {"type": "string"}}}, "next_cursor": {"type": "string", "description": "Cursor of the next page, if the page is full"}}}, "Upsert": {"type": "object", "properties": {"success": {"type": "boolean"}, "upsert": {"type": "object", "properties": {"product": {"type": "string"}, "description": {"type": "string"}, "category": {"type": "string"}, "price": {"type": "string"}, "supplier": {"type": "string"}, "product_rating": {"type": "number"}, "last_updated": {"type": "string"}}}}}, "Deletion": {"type": "object", "properties": {"success": {"type": "boolean"}, "upsert": {"type": "object", "properties": {"product": {"type": "string"}, "supplier": {"type": "string"}}}}}}};
   // Build a system
   const ui = SwaggerUIBundle({
     spec: spec,
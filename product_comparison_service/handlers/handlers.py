@@ -1,24 +1,38 @@
+import base64
 import json
-from datetime import datetime
-import asyncio
-from typing import List, Dict, Tuple
-from datetime import datetime
+from functools import partial
+from sqlite3 import IntegrityError
+from typing import Any, List, Dict, Optional, Set, Tuple
 
-from tornado.web import RequestHandler
-import aiosqlite
+from tornado.ioloop import IOLoop
+from tornado.web import RequestHandler, HTTPError
 from aiosqlite import Connection as AsyncConnection, Cursor as AsyncCursor
 
 from product_comparison_service.database.database import (
+    BulkWrite,
+    bulk_write_supplier_product_data,
     search_by_product_or_category,
+    search_many,
+    iter_search_by_product_or_category,
+    select_suppliers,
     update_product_search_results,
     delete_supplier_product_data,
     update_supplier_product_data,
 )
-from product_comparison_service.cache.cachedict import CacheDict
+from product_comparison_service.cache.search_cache import SearchCache
+from product_comparison_service.database.loader import read_jsonl, to_row
 from product_comparison_service.docs.docs import DOCS
-from product_comparison_service.config import DATABASE, CACHE_MAX_LENGTH, REFETCH_LIMIT
-
-DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+from product_comparison_service.timestamps import epoch_now, serialize_results, to_iso
+from product_comparison_service.config import (
+    REFETCH_LIMIT,
+    STALE_WHILE_REVALIDATE,
+    HARD_STALENESS_LIMIT,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    STREAM_CHUNK_SIZE,
+    BATCH_SEARCH_MAX_QUERIES,
+    BULK_WRITE_MAX_ITEMS,
+)
 
 
 def dict_factory(cursor, row) -> Dict:
@@ -31,136 +45,527 @@ def dict_factory(cursor, row) -> Dict:
     return d
 
 
+def encode_cursor(result: Dict) -> str:
+    """
+    Helper method to encode the ranking position of a search result as an
+    opaque pagination cursor
+    """
+    position = [result["combined_rating"], result["supplier"], result["product"]]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str, str]:
+    """
+    Helper method to decode a pagination cursor, raising ValueError if invalid
+    """
+    try:
+        combined_rating, supplier, product = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+        return float(combined_rating), str(supplier), str(product)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+
+
+def with_ages(search_results: List[Dict], now: int) -> List[Dict]:
+    """
+    Helper method to copy search results for a response, marking each with
+    its age in seconds
+    """
+    return [
+        dict(result, age_seconds=now - timestamp)
+        for result, timestamp in zip(
+            serialize_results(search_results),
+            (result["last_updated"] for result in search_results),
+        )
+    ]
+
+
+def parse_batch_searches(body: bytes) -> List[Tuple[str, str, int]]:
+    """
+    Helper method to parse the body of a batch search into (product,
+    category, limit) searches, raising ValueError if invalid
+    """
+    try:
+        queries = json.loads(body)["queries"]
+    except (TypeError, ValueError, KeyError) as error:
+        raise ValueError("Body must be a JSON object with a queries list") from error
+
+    if (
+        not isinstance(queries, list)
+        or not 0 < len(queries) <= BATCH_SEARCH_MAX_QUERIES
+    ):
+        raise ValueError(f"queries must list 1 to {BATCH_SEARCH_MAX_QUERIES} searches")
+
+    searches = []
+    for query in queries:
+        if not isinstance(query, dict):
+            raise ValueError(f"Invalid query: {query}")
+        product = query.get("product")
+        category = query.get("category")
+        limit = query.get("limit", DEFAULT_PAGE_SIZE)
+        if not all(isinstance(term, (str, type(None))) for term in (product, category)):
+            raise ValueError(f"product and category must be strings: {query}")
+        if not (product or category):
+            raise ValueError(f"Each query needs a product or category: {query}")
+        if not isinstance(limit, int) or not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}: {query}")
+        searches.append((product, category, limit))
+    return searches
+
+
+def parse_bulk_items(body: bytes) -> List[Any]:
+    """
+    Helper method to parse the body of a bulk write, a JSON array or NDJSON
+    lines, into its items, raising ValueError if invalid
+    """
+    text = body.decode("utf-8")
+    if text.lstrip().startswith("["):
+        items = json.loads(text)
+    else:
+        items = list(read_jsonl(text.splitlines()))
+
+    if not 0 < len(items) <= BULK_WRITE_MAX_ITEMS:
+        raise ValueError(f"Body must hold 1 to {BULK_WRITE_MAX_ITEMS} items")
+    return items
+
+
+# Fields of bulk upsert items, by the product and supplier_product columns
+# they are validated and stored as
+BULK_PRODUCT_FIELDS = {
+    "name": "product",
+    "description": "description",
+    "category": "category",
+    "rating": "product_rating",
+}
+BULK_OFFER_FIELDS = {"supplier": "supplier", "product": "product", "price": "price"}
+
+
+def to_bulk_write(item: Any, last_updated: int) -> BulkWrite:
+    """
+    Helper method to validate a bulk write item, validating upserts against
+    the Product and SupplierProduct data classes as batch imports do, and
+    raising ValueError if invalid
+    """
+    if not isinstance(item, dict):
+        raise ValueError(f"Invalid item: {item}")
+
+    fields = dict(item)
+    op = fields.pop("op", "upsert")
+
+    for field in ("product", "supplier", "description", "category"):
+        if not isinstance(fields.get(field, ""), str):
+            raise ValueError(f"{field} must be a string: {item}")
+    for field in ("price", "product_rating"):
+        value = fields.get(field, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{field} must be a number: {item}")
+
+    if op == "delete":
+        if set(fields) != {"product", "supplier"}:
+            raise ValueError(f"Deletes take a product and supplier only: {item}")
+        return BulkWrite(op, None, (fields["supplier"], fields["product"]))
+
+    if op != "upsert":
+        raise ValueError(f"Unknown op: {op}")
+
+    unexpected = set(fields) - set(BULK_PRODUCT_FIELDS.values())
+    unexpected -= set(BULK_OFFER_FIELDS.values())
+    if unexpected:
+        raise ValueError(f"Unexpected fields {sorted(unexpected)}: {item}")
+
+    product = {
+        column: fields[field]
+        for column, field in BULK_PRODUCT_FIELDS.items()
+        if field in fields
+    }
+    product["last_updated"] = last_updated
+    offer = {
+        column: fields[field]
+        for column, field in BULK_OFFER_FIELDS.items()
+        if field in fields
+    }
+    return BulkWrite(
+        op,
+        to_row("product", product),
+        to_row("supplier_product", offer) + (last_updated,),
+    )
+
+
+def cache_unless_invalidated(
+    cache: SearchCache, key: Tuple, search_results: List[Dict], generation: int
+) -> None:
+    """
+    Helper method to cache search results, unless the cache has been
+    invalidated since generation, noted before they were read, in which case
+    they may predate a write
+    """
+    if cache.generation == generation:
+        cache[key] = search_results
+
+
+def replace_refreshed(
+    search_results: List[Dict], updated_results: Dict[Tuple[str, str], Dict]
+) -> List[Dict]:
+    """
+    Helper method to replace search results with their refreshed copies,
+    keyed by (supplier, product)
+    """
+    return [
+        updated_results.get((result["supplier"], result["product"]), result)
+        for result in search_results
+    ]
+
+
+def flag_stale(
+    search_results: List[Dict], stale_offers: Set[Tuple[str, str]]
+) -> List[Dict]:
+    """
+    Helper method to copy search results, flagging those of the given
+    (supplier, product) offers as stale
+    """
+    return [
+        (
+            dict(result, stale=True)
+            if (result["supplier"], result["product"]) in stale_offers
+            else result
+        )
+        for result in search_results
+    ]
+
+
 class ProductHandler(RequestHandler):
     def __init__(self, *args, **kwargs):
         """
         Initialize Product endpoint handler, with instance variables
-        storing database connection and cache dict
+        storing database connection, the application-wide search cache, its
+        invalidations, in-flight search refreshes, the background price
+        refresher and the search index, if enabled
         """
         super(ProductHandler, self).__init__(*args, **kwargs)
         self.async_conn = None
-        self.cache_dict = CacheDict(cache_len=CACHE_MAX_LENGTH)
+        self.cache_dict = self.application.cache
+        self.invalidations = self.application.invalidations
+        self.refreshes = self.application.refreshes
+        self.refresher = self.application.refresher
+        self.search_index = self.application.search_index
 
     async def get_async_conn_and_cur(self) -> Tuple[AsyncConnection, AsyncCursor]:
         """
-        Get async database connection and cursor        
+        Get async database connection and cursor, acquiring the connection
+        from the application pool on first use within the request
         """
-        if self.async_conn:
-            cursor = await self.async_conn.cursor()
-        else:
-            self.async_conn = await aiosqlite.connect(DATABASE)
-            self.async_conn.row_factory = dict_factory
-            cursor = await self.async_conn.cursor()
+        if not self.async_conn:
+            self.async_conn = await self.application.db_pool.acquire()
+        cursor = await self.async_conn.cursor()
         return self.async_conn, cursor
 
+    def release_async_conn(self) -> None:
+        """
+        Return the request's database connection to the application pool,
+        before waiting on anything that may take another from it
+        """
+        if self.async_conn:
+            self.application.db_pool.release(self.async_conn)
+            self.async_conn = None
+
+    def on_finish(self) -> None:
+        """
+        Return the request's database connection to the application pool
+        """
+        self.release_async_conn()
+
     async def get(self) -> None:
         """
         Returns search results ordered by combined product and supplier scores.
 
         Handles calls to GET method of /product end-point
         - First searches cache for search results
-        - If no results found in cache, searches database
-        - If results not found or out of date results found, searches supplier APIs
+        - If no results found in cache, searches the search index if enabled,
+        or else the database
+        - If out of date results found, re-prices them through supplier APIs
         - Updates database and cache with new results
         - Gives results as response
 
+        In stale-while-revalidate mode, out of date results are given as response
+        straight away, marked with their age, and refreshed in the background.
+
+        Results are paginated: up to limit results are given per page, with a
+        next_cursor to pass as cursor to get the following page. With
+        stream=true, all results (or up to limit) are streamed from the database
+        instead, see stream_search_results.
+
+        With q, results are limited to products with words in their names or
+        descriptions starting with each word of q, tolerating typos, if the
+        search index is enabled; otherwise, and when streamed, q is matched as
+        a substring of names or descriptions.
+
         localhost:8888/v0.1/product?product=coyotee&category=Canines
 
+        localhost:8888/v0.1/product?q=coyote
+
+        localhost:8888/v0.1/product?category=Canines&limit=2&cursor=<next_cursor>
+
         curl -d "product=coyotee&category=Canines" -X GET localhost:8888/v0.1/product
         """
         out_of_date_results = []
 
         product = self.get_argument("product", default=None)
         category = self.get_argument("category", default=None)
+        text = self.get_argument("q", default=None)
+        limit = self.get_argument("limit", default=None)
+        page_cursor = self.get_argument("cursor", default=None)
+        stream = self.get_argument("stream", default="false").lower() == "true"
+
+        try:
+            limit = int(limit) if limit else None
+            after = decode_cursor(page_cursor) if page_cursor else None
+        except ValueError:
+            raise HTTPError(400, reason="Invalid limit or cursor")
+
+        if limit is not None and limit <= 0:
+            raise HTTPError(400, reason="limit must be positive")
+
+        # Streamed results are not held in memory, so need not be paged
+        if stream:
+            await self.stream_search_results(product, category, limit, after, text)
+            return
+
+        if limit is None:
+            limit = DEFAULT_PAGE_SIZE
+
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise HTTPError(400, reason=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+        key = (product, category, limit, page_cursor, text)
+
+        # Results read from here on are only cached if no write invalidates
+        # the cache in the meantime
+
+        generation = self.cache_dict.generation
 
         # Check if search results in cache
 
-        if (product, category) in self.cache_dict:
+        results = self.cache_dict.get(key)
+
+        # Check if search results in search index, if enabled
 
-            results = self.cache_dict[(product, category)]
+        if results is None and self.search_index is not None:
+
+            results = self.search_index.search(product, category, limit, after, text)
+
+            cache_unless_invalidated(self.cache_dict, key, results, generation)
 
         # Check if search results in database
 
-        else:
+        if results is None:
 
             conn, cursor = await self.get_async_conn_and_cur()
 
             results = await search_by_product_or_category(
-                conn=conn, cursor=cursor, product=product, category=category
+                conn=conn,
+                cursor=cursor,
+                product=product,
+                category=category,
+                limit=limit,
+                after=after,
+                text=text or "",
             )
 
-        now = datetime.now()
+            self.release_async_conn()
 
-        # Check if any results out of date
+            cache_unless_invalidated(self.cache_dict, key, results, generation)
+
+        now = epoch_now()
+
+        # Check if any results out of date, comparing integer timestamps
+
+        stale_before = now - REFETCH_LIMIT.total_seconds()
 
         out_of_date_results = [
-            result
-            for result in results
-            if now - datetime.strptime(result.get("last_updated"), DATETIME_FORMAT)
-            > REFETCH_LIMIT
+            result for result in results if result["last_updated"] < stale_before
         ]
 
-        # Update results in db and cache
-
-        if out_of_date_results or not results:
+        # Update results in db and cache, sharing a single refresh between
+        # concurrent requests for the same search
 
-            updated_results = await self.make_dummy_calls_to_supplier_apis(results)
+        revalidating = False
 
-            combined_results = []
+        if out_of_date_results:
 
-            for result in results:
+            refresh = partial(
+                self.refresh_search_results,
+                key,
+                results,
+                out_of_date_results,
+                generation,
+            )
 
-                key = (result["supplier"], result["product"])
+            # Serve stale results now and refresh in the background, unless
+            # they are too old to be served at all
 
-                if key in updated_results:
-                    combined_results.append(updated_results[key])
+            oldest = min(result["last_updated"] for result in out_of_date_results)
 
-                else:
-                    combined_results.append(result)
+            if (
+                STALE_WHILE_REVALIDATE
+                and now - oldest <= HARD_STALENESS_LIMIT.total_seconds()
+            ):
+                IOLoop.current().spawn_callback(self.refreshes.do, key, refresh)
+                revalidating = True
 
-            results = combined_results
+            else:
+                results = await self.refreshes.do(key, refresh)
 
-            await self.update_db(combined_results)
+        # Count requests for the offers served, to keep popular ones fresh
+        self.refresher.record(results)
 
-            self.cache_dict[(product, category)] = results
+        # A full page may be followed by more results
+        next_cursor = encode_cursor(results[-1]) if len(results) == limit else None
 
         # Write response
-        self.write({"success": True, "search_results": results})
+        if STALE_WHILE_REVALIDATE:
+            self.write(
+                {
+                    "success": True,
+                    "revalidating": revalidating,
+                    "search_results": with_ages(results, now),
+                    "next_cursor": next_cursor,
+                }
+            )
+        else:
+            self.write(
+                {
+                    "success": True,
+                    "search_results": serialize_results(results),
+                    "next_cursor": next_cursor,
+                }
+            )
 
-    async def make_dummy_calls_to_supplier_apis(
-        self, search_results: List[Dict]
-    ) -> Dict[Tuple[str, str], List]:
+    async def stream_search_results(
+        self,
+        product: str,
+        category: str,
+        limit: Optional[int],
+        after: Optional[Tuple[float, str, str]],
+        text: Optional[str] = None,
+    ) -> None:
         """
-        Method mocks simultaneous asynchronous calls to external APIs
+        Write search results straight from the database as a chunked JSON
+        response, holding at most STREAM_CHUNK_SIZE results in memory.
+
+        Streamed results bypass the cache and are not refreshed from supplier
+        APIs; out of date results are flagged as stale instead.
         """
-        updated_results_dict = {}
-        num_api_calls = len(search_results) or 10
+        conn, cursor = await self.get_async_conn_and_cur()
 
-        delay_in_seconds = 1
-        print(
-            f"Simulating {num_api_calls} simultaneous asynchronous API calls, each with a delay of {delay_in_seconds} seconds..."
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.write('{"success": true, "search_results": [')
+
+        count = 0
+        last_result = None
+
+        async for results in iter_search_by_product_or_category(
+            conn=conn,
+            cursor=cursor,
+            product=product,
+            category=category,
+            limit=limit or -1,
+            after=after,
+            chunk_size=STREAM_CHUNK_SIZE,
+            text=text or "",
+        ):
+            stale_before = epoch_now() - REFETCH_LIMIT.total_seconds()
+            rows = serialize_results(results)
+            for row, result in zip(rows, results):
+                if result["last_updated"] < stale_before:
+                    row["stale"] = True
+            chunk = ", ".join(json.dumps(row) for row in rows)
+            self.write(f", {chunk}" if count else chunk)
+            await self.flush()
+            count += len(results)
+            last_result = results[-1]
+
+        next_cursor = encode_cursor(last_result) if limit and count == limit else None
+        self.write(f'], "next_cursor": {json.dumps(next_cursor)}}}')
+
+    async def refresh_search_results(
+        self,
+        key: Tuple,
+        results: List[Dict],
+        out_of_date_results: List[Dict],
+        generation: int,
+    ) -> List[Dict]:
+        """
+        Refresh out of date search results from supplier APIs, then update
+        database and cache, unless invalidated since generation. Results that
+        could not be refreshed are flagged as stale.
+        """
+        updated_results, unrefreshed_keys = await self.refresh_offers(
+            out_of_date_results
         )
-        starttime = datetime.now()
-        dummy_external_api_calls = [
-            asyncio.sleep(delay_in_seconds) for i in range(num_api_calls)
-        ]
-        await asyncio.gather(*dummy_external_api_calls, return_exceptions=True)
 
-        now = datetime.strftime(datetime.now(), DATETIME_FORMAT)
+        combined_results = replace_refreshed(results, updated_results)
+
+        cache_unless_invalidated(self.cache_dict, key, combined_results, generation)
+
+        # Flag results that suppliers failed to refresh in time, which are
+        # served from the database as they are
 
-        for result in search_results:
-            result["last_updated"] = now
-            result["price"] += 1
-            updated_results_dict[(result["supplier"], result["product"])] = result
+        return flag_stale(combined_results, unrefreshed_keys)
 
-        time_taken = datetime.now() - starttime
-        print(f"Total time for asynchronous API calls taken: {time_taken}")
+    async def refresh_offers(
+        self, out_of_date_results: List[Dict]
+    ) -> Tuple[Dict[Tuple[str, str], Dict], Set[Tuple[str, str]]]:
+        """
+        Re-price out of date search results from supplier APIs and update the
+        database, giving the refreshed results and the (supplier, product)
+        offers that could not be refreshed
+        """
+        updated_results = await self.call_supplier_apis(out_of_date_results)
+
+        await self.update_db(list(updated_results.values()))
+
+        unrefreshed_keys = {
+            (result["supplier"], result["product"]) for result in out_of_date_results
+        } - updated_results.keys()
+
+        return updated_results, unrefreshed_keys
+
+    async def call_supplier_apis(
+        self, search_results: List[Dict]
+    ) -> Dict[Tuple[str, str], Dict]:
+        """
+        Re-price search results with one call per supplier, through the
+        application's supplier clients
+        """
+        async with self.application.db_pool.connection() as conn:
+            cursor = await conn.cursor()
+            suppliers = await select_suppliers(
+                conn, cursor, {result["supplier"] for result in search_results}
+            )
 
-        return search_results
+        return await self.application.supplier_clients.refresh(
+            suppliers, search_results
+        )
 
     async def update_db(self, search_results: List[Dict]) -> None:
-        conn, cursor = await self.get_async_conn_and_cur()
-        await update_product_search_results(conn, cursor, search_results)
+        """
+        Write refreshed search results to database, publishing them to the
+        other processes' caches and search indexes in the same commit
+        """
+        if not search_results:
+            return
+        await self.invalidations.publish_many(
+            ((result["product"], None) for result in search_results),
+            write=partial(
+                update_product_search_results,
+                search_results=search_results,
+                commit=False,
+            ),
+            local=False,
+        )
+        if self.search_index is not None:
+            self.search_index.update_results(search_results)
 
     async def put(self) -> None:
         """
@@ -179,19 +584,28 @@ class ProductHandler(RequestHandler):
         price = self.get_argument("price")
         supplier = self.get_argument("supplier")
         product_rating = self.get_argument("product_rating", default=0.5)
-        last_updated = datetime.strftime(datetime.now(), DATETIME_FORMAT)
-        conn, cursor = await self.get_async_conn_and_cur()
-        await update_supplier_product_data(
-            conn,
-            cursor,
-            product,
-            description,
-            category,
-            price,
-            supplier,
-            product_rating,
-            last_updated,
-        )
+        last_updated = epoch_now()
+
+        # The write is committed together with its cache invalidation
+        try:
+            await self.invalidations.publish(
+                product,
+                category,
+                write=partial(
+                    update_supplier_product_data,
+                    product=product,
+                    description=description,
+                    category=category,
+                    price=price,
+                    supplier=supplier,
+                    product_rating=product_rating,
+                    last_updated=last_updated,
+                    commit=False,
+                ),
+            )
+        except IntegrityError as error:
+            # e.g. supplier does not exist
+            raise HTTPError(400, reason=f"Invalid product data: {error}")
         self.write(
             {
                 "success": True,
@@ -202,7 +616,7 @@ class ProductHandler(RequestHandler):
                     "price": price,
                     "supplier": supplier,
                     "product_rating": product_rating,
-                    "last_updated": last_updated,
+                    "last_updated": to_iso(last_updated),
                 },
             }
         )
@@ -220,13 +634,294 @@ class ProductHandler(RequestHandler):
         """
         product = self.get_argument("product")
         supplier = self.get_argument("supplier")
-        conn, cursor = await self.get_async_conn_and_cur()
-        await delete_supplier_product_data(conn, cursor, product, supplier)
+        await self.invalidations.publish(
+            product,
+            write=partial(
+                delete_supplier_product_data,
+                product=product,
+                supplier=supplier,
+                commit=False,
+            ),
+        )
         self.write(
             {"success": True, "deleted": {"product": product, "supplier": supplier}}
         )
 
 
+class BatchSearchHandler(ProductHandler):
+    SUPPORTED_METHODS = ("POST",)
+
+    async def post(self) -> None:
+        """
+        Returns search results for a batch of searches, ordered by combined
+        product and supplier scores.
+
+        Handles calls to POST method of /product/batch end-point, taking a JSON
+        body listing searches by product and or category, each with an
+        optional limit
+        - First searches cache for each search's results
+        - If not found in cache, searches the search index if enabled
+        - Searches database for all remaining searches in a single query
+        - If out of date results found in any search, re-prices them all
+        through supplier APIs at once, with one call per supplier
+        - Updates database and cache with new results
+        - Gives the first page of results of each search, in order, as response
+
+        curl -d '{"queries": [{"product": "coyotee"}, {"category": "Canines", "limit": 2}]}' -X POST localhost:8888/v0.1/product/batch
+        """
+        try:
+            searches = parse_batch_searches(self.request.body)
+        except ValueError as error:
+            raise HTTPError(400, reason=str(error))
+
+        # Searches share their cache entries with the first pages of GET
+        keys = [
+            (product, category, limit, None, None)
+            for product, category, limit in searches
+        ]
+
+        # Results read from here on are only cached if no write invalidates
+        # the cache in the meantime
+
+        generation = self.cache_dict.generation
+
+        # Check if search results in cache, or in search index if enabled
+
+        results_by_key = {}
+
+        for key in keys:
+
+            results = self.cache_dict.get(key)
+
+            if results is None and self.search_index is not None:
+
+                results = self.search_index.search(key[0], key[1], key[2])
+
+                cache_unless_invalidated(self.cache_dict, key, results, generation)
+
+            if results is not None:
+                results_by_key[key] = results
+
+        # Check if remaining search results in database, all at once
+
+        missing_keys = [key for key in dict.fromkeys(keys) if key not in results_by_key]
+
+        if missing_keys:
+
+            conn, cursor = await self.get_async_conn_and_cur()
+
+            found = await search_many(conn, cursor, [key[:3] for key in missing_keys])
+
+            self.release_async_conn()
+
+            for key, results in zip(missing_keys, found):
+
+                results_by_key[key] = results
+
+                cache_unless_invalidated(self.cache_dict, key, results, generation)
+
+        now = epoch_now()
+
+        # Check if any results out of date, across all searches
+
+        stale_before = now - REFETCH_LIMIT.total_seconds()
+
+        out_of_date_results = {
+            (result["supplier"], result["product"]): result
+            for results in results_by_key.values()
+            for result in results
+            if result["last_updated"] < stale_before
+        }
+
+        # Re-price every out of date offer with a single refresh, shared with
+        # concurrent batches of the same offers
+
+        revalidating = False
+
+        if out_of_date_results:
+
+            refresh = partial(
+                self.refresh_batch_results,
+                results_by_key,
+                list(out_of_date_results.values()),
+                generation,
+            )
+
+            oldest = min(
+                result["last_updated"] for result in out_of_date_results.values()
+            )
+
+            if (
+                STALE_WHILE_REVALIDATE
+                and now - oldest <= HARD_STALENESS_LIMIT.total_seconds()
+            ):
+                IOLoop.current().spawn_callback(refresh)
+                revalidating = True
+
+            else:
+                results_by_key = await refresh()
+
+        # Count requests for the offers served, to keep popular ones fresh
+        for results in results_by_key.values():
+            self.refresher.record(results)
+
+        # Write response, with a result for each search
+        search_results = []
+
+        for key in keys:
+
+            product, category, limit = key[:3]
+
+            results = results_by_key[key]
+
+            search_results.append(
+                {
+                    "product": product,
+                    "category": category,
+                    "search_results": (
+                        with_ages(results, now)
+                        if STALE_WHILE_REVALIDATE
+                        else serialize_results(results)
+                    ),
+                    "next_cursor": (
+                        encode_cursor(results[-1]) if len(results) == limit else None
+                    ),
+                }
+            )
+
+        response = {"success": True, "results": search_results}
+
+        if STALE_WHILE_REVALIDATE:
+            response["revalidating"] = revalidating
+
+        self.write(response)
+
+    async def refresh_batch_results(
+        self,
+        results_by_key: Dict[Tuple, List[Dict]],
+        out_of_date_results: List[Dict],
+        generation: int,
+    ) -> Dict[Tuple, List[Dict]]:
+        """
+        Refresh out of date search results of a batch of searches from supplier
+        APIs, then update database and cache, as refresh_search_results does
+        for a single search.
+
+        Re-pricing is shared with concurrent batches of the same out of date
+        offers, each applying the refreshed offers to its own searches.
+        """
+        updated_results, unrefreshed_keys = await self.refreshes.do(
+            frozenset(
+                (result["supplier"], result["product"])
+                for result in out_of_date_results
+            ),
+            partial(self.refresh_offers, out_of_date_results),
+        )
+
+        refreshed = {}
+
+        for key, results in results_by_key.items():
+
+            combined_results = replace_refreshed(results, updated_results)
+
+            cache_unless_invalidated(self.cache_dict, key, combined_results, generation)
+
+            refreshed[key] = flag_stale(combined_results, unrefreshed_keys)
+
+        return refreshed
+
+
+class BulkProductHandler(ProductHandler):
+    SUPPORTED_METHODS = ("POST",)
+
+    async def post(self) -> None:
+        """
+        Handles calls to POST method of /product/bulk end-point, taking a JSON
+        array or NDJSON lines of items to upsert or delete
+        - Validates each item, as PUT and DELETE would take it, upserting
+        unless its op is "delete"
+        - Applies every valid item, in order, in one transaction
+        - Invalidates cached searches for the products written to
+        - Returns the status of each item, with the reason any were invalid
+
+        curl -d '[{"product": "owl", "description": "wise", "category": "Birds", "price": 3, "supplier": "DavesPets"}, {"op": "delete", "product": "coyotee", "supplier": "iPet"}]' -X POST localhost:8888/v0.1/product/bulk
+        """
+        try:
+            items = parse_bulk_items(self.request.body)
+        except ValueError as error:
+            raise HTTPError(400, reason=str(error))
+
+        last_updated = epoch_now()
+
+        statuses = [{"index": index} for index in range(len(items))]
+
+        writes: Dict[int, BulkWrite] = {}
+
+        for index, item in enumerate(items):
+
+            try:
+                writes[index] = to_bulk_write(item, last_updated)
+
+            except ValueError as error:
+                statuses[index].update(status="invalid", error=str(error))
+
+        # Check suppliers upfront, so that one unknown supplier does not fail
+        # the whole transaction
+
+        applied_writes = []
+
+        if writes:
+
+            # Released before publishing, which takes connections of its own
+
+            async with self.application.db_pool.connection() as conn:
+                cursor = await conn.cursor()
+                suppliers = await select_suppliers(
+                    conn, cursor, {write.offer[0] for write in writes.values()}
+                )
+
+            for index, write in writes.items():
+
+                if write.offer[0] in suppliers:
+                    statuses[index]["status"] = (
+                        "upserted" if write.op == "upsert" else "deleted"
+                    )
+                    applied_writes.append(write)
+
+                else:
+                    statuses[index].update(
+                        status="invalid", error=f"Unknown supplier: {write.offer[0]}"
+                    )
+
+        if applied_writes:
+
+            # Upserts may move products to another category, so invalidate
+            # searches of the category in their product rows too. The writes
+            # are committed together with their cache invalidations.
+
+            try:
+                await self.invalidations.publish_many(
+                    (
+                        (write.offer[1], write.product[2] if write.product else None)
+                        for write in applied_writes
+                    ),
+                    write=partial(
+                        bulk_write_supplier_product_data,
+                        writes=applied_writes,
+                        commit=False,
+                    ),
+                )
+            except IntegrityError as error:
+                raise HTTPError(400, reason=f"Invalid product data: {error}")
+
+        counts = {"upserted": 0, "deleted": 0, "invalid": 0}
+
+        for status in statuses:
+            counts[status["status"]] += 1
+
+        self.write({"success": True, **counts, "items": statuses})
+
+
 class DocsHandler(RequestHandler):
     async def get(self) -> None:
         """
@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tornado.httpclient import AsyncHTTPClient
+
+from product_comparison_service.data_classes.data_classes import Supplier
+from product_comparison_service.database.rows import replace_values
+from product_comparison_service.suppliers.circuit_breaker import CircuitBreaker
+from product_comparison_service.suppliers.planner import RefreshPlanner
+from product_comparison_service.timestamps import epoch_now
+
+LOG = logging.getLogger(__name__)
+
+
+class SupplierClient:
+    """
+    Base class for clients pulling current product prices from a supplier API
+    """
+
+    async def fetch_prices(
+        self, supplier: Supplier, search_results: List[Dict]
+    ) -> Dict[str, float]:
+        """
+        Fetch current prices for the products in search_results, all of which
+        are offered by supplier, as a dict of product name to price
+        """
+        raise NotImplementedError
+
+
+class DummySupplierClient(SupplierClient):
+    """
+    Mocks a supplier API, taking delay seconds to respond to each request and
+    raising the price of every requested product by one
+    """
+
+    def __init__(self, delay: float = 1):
+        self.delay = delay
+
+    async def fetch_prices(
+        self, supplier: Supplier, search_results: List[Dict]
+    ) -> Dict[str, float]:
+        LOG.info(
+            "Simulating API call to %s for %d products, with a delay of %s seconds",
+            supplier.name,
+            len(search_results),
+            self.delay,
+        )
+        await asyncio.sleep(self.delay)
+        return {result["product"]: result["price"] + 1 for result in search_results}
+
+
+class HTTPSupplierClient(SupplierClient):
+    """
+    Pulls prices from a supplier's pull_url over HTTP.
+
+    Products are requested in batches of up to batch_size as a POST of
+    {"products": [<name>, ...]}, answered with {"prices": {<name>: <price>}}.
+    Requests share a single HTTP client, see make_http_client, and each
+    supplier gets at most max_concurrency requests in flight at once.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_clients: int = 50,
+        request_timeout: float = 10,
+    ):
+        assert batch_size > 0 and max_concurrency > 0
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_clients = max_clients
+        self.request_timeout = request_timeout
+        self._http_client: Optional[AsyncHTTPClient] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def http_client(self) -> AsyncHTTPClient:
+        if self._http_client is None:
+            self._http_client = make_http_client(self.max_clients)
+        return self._http_client
+
+    def _semaphore(self, supplier: Supplier) -> asyncio.Semaphore:
+        if supplier.name not in self._semaphores:
+            self._semaphores[supplier.name] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[supplier.name]
+
+    async def fetch_prices(
+        self, supplier: Supplier, search_results: List[Dict]
+    ) -> Dict[str, float]:
+        products = sorted({result["product"] for result in search_results})
+        batches = [
+            products[i : i + self.batch_size]
+            for i in range(0, len(products), self.batch_size)
+        ]
+        prices = {}
+        for batch_prices in await asyncio.gather(
+            *[self._fetch_batch(supplier, batch) for batch in batches]
+        ):
+            prices.update(batch_prices)
+        return prices
+
+    async def _fetch_batch(
+        self, supplier: Supplier, products: List[str]
+    ) -> Dict[str, float]:
+        async with self._semaphore(supplier):
+            response = await self.http_client.fetch(
+                supplier_url(supplier),
+                method="POST",
+                headers={"Content-Type": "application/json"},
+                body=json.dumps({"products": products}),
+                request_timeout=self.request_timeout,
+            )
+        prices = json.loads(response.body).get("prices", {})
+        return {
+            product: float(price)
+            for product, price in prices.items()
+            if product in products
+        }
+
+    def close(self) -> None:
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+
+
+class SupplierClients:
+    """
+    Registry of supplier clients keyed on supplier pull_url, falling back to a
+    default client for suppliers without one of their own.
+
+    Refreshes are bounded in time: each supplier call has a timeout, the whole
+    fan-out has a latency budget, and a circuit breaker per supplier stops
+    calling suppliers that keep failing.
+    """
+
+    def __init__(
+        self,
+        default: SupplierClient,
+        supplier_timeout: float = 2,
+        budget: float = 3,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+    ):
+        self.default = default
+        self.supplier_timeout = supplier_timeout
+        self.budget = budget
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.planner = RefreshPlanner()
+        self._clients: Dict[str, SupplierClient] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def register(self, pull_url: str, client: SupplierClient) -> None:
+        self._clients[pull_url] = client
+
+    def client_for(self, supplier: Supplier) -> SupplierClient:
+        return self._clients.get(supplier.pull_url, self.default)
+
+    def breaker_for(self, supplier: Supplier) -> CircuitBreaker:
+        if supplier.name not in self._breakers:
+            self._breakers[supplier.name] = CircuitBreaker(
+                failure_threshold=self.failure_threshold,
+                reset_timeout=self.reset_timeout,
+            )
+        return self._breakers[supplier.name]
+
+    async def refresh(
+        self, suppliers: Dict[str, Supplier], search_results: Iterable[Dict]
+    ) -> Dict[Tuple[str, str], Dict]:
+        """
+        Re-price search results with at most one call per supplier, made
+        concurrently, as planned by the refresh planner.
+
+        Returns copies of the re-priced results, stamped with the time of the
+        refresh and keyed by (supplier, product). Results whose supplier is
+        unknown, open-circuited, failed or missed the deadline, or whose
+        product the supplier did not price, are left out.
+        """
+        planned, joined = self.planner.plan(
+            result for result in search_results if result["supplier"] in suppliers
+        )
+
+        calls = {}
+        for name, results in planned.items():
+            supplier = suppliers[name]
+            if not self.breaker_for(supplier).allow():
+                LOG.warning("Skipping refresh from %s: circuit open", name)
+                continue
+            calls[name] = asyncio.ensure_future(
+                asyncio.wait_for(
+                    self.client_for(supplier).fetch_prices(supplier, results),
+                    self.supplier_timeout,
+                )
+            )
+            self.planner.track(name, results, calls[name])
+
+        awaited = set(calls.values()) | {call for _, call in joined.values()}
+        done = set()
+        if awaited:
+            done, pending = await asyncio.wait(awaited, timeout=self.budget)
+            # Calls joined from other requests are left to those requests
+            for call in pending & set(calls.values()):
+                call.cancel()
+
+        now = epoch_now()
+
+        updated_results = {}
+        for name, call in calls.items():
+            breaker = self.breaker_for(suppliers[name])
+
+            if call not in done:
+                LOG.warning("Refresh from %s missed the latency budget", name)
+                breaker.record_failure()
+                continue
+
+            if call.exception() is not None:
+                LOG.warning("Refresh from %s failed: %r", name, call.exception())
+                breaker.record_failure()
+                continue
+
+            breaker.record_success()
+            prices = call.result()
+            for result in planned[name]:
+                if result["product"] in prices:
+                    updated_results[(name, result["product"])] = replace_values(
+                        result, price=prices[result["product"]], last_updated=now
+                    )
+
+        for offer, (result, call) in joined.items():
+            if call in done and not call.cancelled() and call.exception() is None:
+                prices = call.result()
+                if result["product"] in prices:
+                    updated_results[offer] = replace_values(
+                        result, price=prices[result["product"]], last_updated=now
+                    )
+        return updated_results
+
+
+def make_http_client(max_clients: int) -> AsyncHTTPClient:
+    """
+    Create an HTTP client using curl, which keeps connections to suppliers
+    alive, falling back with a warning if pycurl is not installed
+    """
+    try:
+        from tornado.curl_httpclient import CurlAsyncHTTPClient
+
+        return CurlAsyncHTTPClient(force_instance=True, max_clients=max_clients)
+    except ImportError:
+        LOG.warning(
+            "pycurl is not installed, so connections to supplier APIs are not "
+            "kept alive; install it from requirements.txt"
+        )
+        return AsyncHTTPClient(force_instance=True, max_clients=max_clients)
+
+
+def supplier_url(supplier: Supplier) -> str:
+    """
+    Get URL of supplier API, defaulting to http when pull_url has no scheme
+    """
+    if "://" in supplier.pull_url:
+        return supplier.pull_url
+    return f"http://{supplier.pull_url}"
@@ -0,0 +1,60 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# An offer is keyed by (supplier, product)
+Offer = Tuple[str, str]
+
+
+class RefreshPlanner:
+    """
+    Plans the supplier calls needed to refresh stale offers.
+
+    Each supplier is called at most once per refresh, for only those of its
+    offers that are not already being refreshed by a call in flight for
+    another request; those offers join the call in flight instead.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Offer, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def plan(
+        self, search_results: Iterable[Dict]
+    ) -> Tuple[Dict[str, List[Dict]], Dict[Offer, Tuple[Dict, asyncio.Future]]]:
+        """
+        Split search results into those to request, by supplier, and those
+        joining a call in flight, by offer along with that call
+        """
+        planned = defaultdict(list)
+        joined = {}
+        seen = set()
+        for result in search_results:
+            offer = (result["supplier"], result["product"])
+            if offer in seen:
+                continue
+            seen.add(offer)
+            if offer in self._inflight:
+                joined[offer] = (result, self._inflight[offer])
+            else:
+                planned[result["supplier"]].append(result)
+        return dict(planned), joined
+
+    def track(
+        self, supplier: str, search_results: List[Dict], call: asyncio.Future
+    ) -> None:
+        """
+        Record that call is refreshing the given results of supplier
+        """
+        offers = [(supplier, result["product"]) for result in search_results]
+        for offer in offers:
+            self._inflight[offer] = call
+
+        def untrack(_):
+            for offer in offers:
+                if self._inflight.get(offer) is call:
+                    del self._inflight[offer]
+
+        call.add_done_callback(untrack)
@@ -0,0 +1,39 @@
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Limits an action to rate per second on average, in bursts of up to burst.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        assert rate > 0 and burst > 0
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = burst
+        self._updated_at = clock()
+
+    @property
+    def tokens(self) -> float:
+        now = self.clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+        return self._tokens
+
+    def try_take(self, tokens: float = 1) -> bool:
+        """
+        Take tokens if available, returning whether they were
+        """
+        if self.tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
@@ -0,0 +1,205 @@
+import heapq
+import logging
+from datetime import timedelta
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from tornado.ioloop import PeriodicCallback
+
+from product_comparison_service.cache.invalidation import CacheInvalidations
+from product_comparison_service.cache.search_cache import SearchCache
+from product_comparison_service.database.database import (
+    select_suppliers,
+    update_product_search_results,
+)
+from product_comparison_service.database.pool import AsyncConnectionPool
+from product_comparison_service.database.rows import drop_values
+from product_comparison_service.database.search_index import SearchIndex
+from product_comparison_service.suppliers.clients import SupplierClients
+from product_comparison_service.suppliers.planner import Offer
+from product_comparison_service.suppliers.rate_limiter import TokenBucket
+from product_comparison_service.timestamps import epoch_now
+
+LOG = logging.getLogger(__name__)
+
+
+class PriceRefresher:
+    """
+    Keeps the prices of popular offers fresh in the background, so requests
+    for them do not wait on supplier APIs.
+
+    Requests record the offers they serve. Every interval seconds, offers
+    due to go out of date within refresh_ahead are ranked by how often they
+    were requested, weighted by how close they are to refetch_limit, and the
+    top ones are refreshed within a global rate limit and a rate limit per
+    supplier, both in offers per second. Refreshed prices are written to the
+    database, to the cached search results holding them and, if given, to the
+    search index. If given invalidations, refreshed prices are published
+    through them to the other processes, in the same commit as they are
+    written.
+
+    Request counts decay by hit_decay every interval. Offers whose count
+    decays below min_hits are no longer requested often enough to keep warm,
+    so are dropped, and only the max_offers most requested offers are tracked.
+
+    Each server process runs a refresher of its own, counting the requests it
+    serves, so with several workers the same popular offers may be refreshed
+    by each of them, and the rate limits apply per process.
+    """
+
+    def __init__(
+        self,
+        cache: SearchCache,
+        pool: AsyncConnectionPool,
+        supplier_clients: SupplierClients,
+        refetch_limit: timedelta = timedelta(hours=1),
+        refresh_ahead: timedelta = timedelta(minutes=10),
+        interval: float = 10,
+        rate_limit: float = 20,
+        supplier_rate_limit: float = 5,
+        hit_decay: float = 0.9,
+        min_hits: float = 1,
+        max_offers: int = 10000,
+        now: Callable[[], int] = epoch_now,
+        search_index: Optional[SearchIndex] = None,
+        invalidations: Optional[CacheInvalidations] = None,
+    ):
+        assert 0 < hit_decay <= 1 and min_hits > 0 and max_offers > 0
+        self.cache = cache
+        self.pool = pool
+        self.supplier_clients = supplier_clients
+        self.refetch_limit = refetch_limit.total_seconds()
+        self.refresh_ahead = refresh_ahead.total_seconds()
+        self.interval = interval
+        self.supplier_rate_limit = supplier_rate_limit
+        self.hit_decay = hit_decay
+        self.min_hits = min_hits
+        self.max_offers = max_offers
+        self.now = now
+        self.search_index = search_index
+        self.invalidations = invalidations
+        self._hits: Dict[Offer, float] = {}
+        self._offers: Dict[Offer, Dict] = {}
+        self._rate_limiter = TokenBucket(rate_limit, burst=rate_limit * interval)
+        self._supplier_rate_limiters: Dict[str, TokenBucket] = {}
+        self._poller: Optional[PeriodicCallback] = None
+        self._refreshing = False
+
+    def __len__(self) -> int:
+        return len(self._offers)
+
+    def record(self, search_results: List[Dict]) -> None:
+        """
+        Count a request for each offer in search_results, keeping them without
+        any stale flag given to responses, as refreshed copies are made of them
+        """
+        for result in search_results:
+            offer = (result["supplier"], result["product"])
+            self._hits[offer] = self._hits.get(offer, 0) + 1
+            self._offers[offer] = (
+                drop_values(result, "stale") if "stale" in result else result
+            )
+
+    def _supplier_rate_limiter(self, supplier: str) -> TokenBucket:
+        if supplier not in self._supplier_rate_limiters:
+            self._supplier_rate_limiters[supplier] = TokenBucket(
+                self.supplier_rate_limit,
+                burst=self.supplier_rate_limit * self.interval,
+            )
+        return self._supplier_rate_limiters[supplier]
+
+    def plan(self) -> List[Dict]:
+        """
+        Pick the offers to refresh now, highest priority first, taking them
+        from the rate limits
+        """
+        now = self.now()
+        due_age = self.refetch_limit - self.refresh_ahead
+        priorities = {}
+        for offer, result in self._offers.items():
+            age = now - result["last_updated"]
+            if age >= due_age and self._hits[offer] >= self.min_hits:
+                priorities[offer] = self._hits[offer] * (age / self.refetch_limit)
+
+        planned = []
+        for offer in sorted(priorities, key=priorities.__getitem__, reverse=True):
+            if self._rate_limiter.tokens < 1:
+                break
+            if self._supplier_rate_limiter(offer[0]).try_take():
+                self._rate_limiter.try_take()
+                planned.append(self._offers[offer])
+        return planned
+
+    async def refresh(self) -> int:
+        """
+        Refresh the offers planned now, returning how many were refreshed
+        """
+        # Refreshes may outlast the interval, so never overlap
+        if self._refreshing:
+            return 0
+        self._refreshing = True
+        try:
+            planned = self.plan()
+            if not planned:
+                return 0
+
+            async with self.pool.connection() as conn:
+                cursor = await conn.cursor()
+                suppliers = await select_suppliers(
+                    conn, cursor, {result["supplier"] for result in planned}
+                )
+            updated_results = await self.supplier_clients.refresh(suppliers, planned)
+            if not updated_results:
+                return 0
+
+            if self.invalidations is not None:
+                await self.invalidations.publish_many(
+                    ((product, None) for _, product in updated_results),
+                    write=partial(
+                        update_product_search_results,
+                        search_results=list(updated_results.values()),
+                        commit=False,
+                    ),
+                    local=False,
+                )
+            else:
+                async with self.pool.connection() as conn:
+                    cursor = await conn.cursor()
+                    await update_product_search_results(
+                        conn, cursor, list(updated_results.values())
+                    )
+            self.cache.update_results(updated_results)
+            if self.search_index is not None:
+                self.search_index.update_results(updated_results.values())
+            self._offers.update(updated_results)
+            LOG.info("Refreshed %d popular offers", len(updated_results))
+            return len(updated_results)
+        finally:
+            self._decay()
+            self._refreshing = False
+
+    def _decay(self) -> None:
+        for offer in self._hits:
+            self._hits[offer] *= self.hit_decay
+        cold = [offer for offer, hits in self._hits.items() if hits < self.min_hits]
+        for offer in cold:
+            del self._hits[offer]
+            del self._offers[offer]
+        if len(self._hits) > self.max_offers:
+            tracked = heapq.nlargest(
+                self.max_offers, self._hits, key=self._hits.__getitem__
+            )
+            self._hits = {offer: self._hits[offer] for offer in tracked}
+            self._offers = {offer: self._offers[offer] for offer in tracked}
+
+    def start(self) -> None:
+        """
+        Start refreshing on the current IOLoop
+        """
+        self._poller = PeriodicCallback(self.refresh, self.interval * 1000)
+        self._poller.start()
+
+    def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.stop()
+            self._poller = None
@@ -0,0 +1,43 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Union
+
+from product_comparison_service.config import DATETIME_FORMAT
+
+# Timestamps are stored and compared as integer seconds since the epoch, and
+# only formatted with DATETIME_FORMAT (in UTC) for responses and batch files.
+
+
+def epoch_now() -> int:
+    """
+    Get the current time as a timestamp
+    """
+    return int(time.time())
+
+
+def to_epoch(timestamp: Union[str, int, float]) -> int:
+    """
+    Get a timestamp from a DATETIME_FORMAT string, or a number of seconds
+    """
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    parsed = datetime.strptime(timestamp, DATETIME_FORMAT)
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+def to_iso(timestamp: int) -> str:
+    """
+    Format a timestamp with DATETIME_FORMAT
+    """
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(DATETIME_FORMAT)
+
+
+def serialize_results(search_results: List[Dict]) -> List[Dict]:
+    """
+    Copy search results, whether Rows or dicts, into dicts for a response,
+    formatting their timestamps
+    """
+    return [
+        dict(result.items(), last_updated=to_iso(result["last_updated"]))
+        for result in search_results
+    ]
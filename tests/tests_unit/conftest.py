@@ -0,0 +1,62 @@
+import asyncio
+import json
+import pytest_asyncio
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.web import Application, RequestHandler
+
+
+class StubSupplierHandler(RequestHandler):
+    """
+    Stands in for a supplier API, pricing each requested product from the
+    stub's price list and recording the requests made to it. Suppliers can be
+    made slow or failing.
+    """
+
+    def initialize(self, stub):
+        self.stub = stub
+
+    async def post(self, supplier: str) -> None:
+        products = json.loads(self.request.body)["products"]
+        self.stub.requests.append((supplier, products))
+        await asyncio.sleep(self.stub.delays.get(supplier, 0))
+        if supplier in self.stub.failing:
+            self.send_error(503)
+            return
+        prices = self.stub.prices.get(supplier, {})
+        self.write(
+            {
+                "prices": {
+                    product: prices[product]
+                    for product in products
+                    if product in prices
+                }
+            }
+        )
+
+
+class StubSupplierServer:
+    def __init__(self):
+        self.prices = {}
+        self.delays = {}
+        self.failing = set()
+        self.requests = []
+        self.port = None
+
+    def pull_url(self, supplier: str) -> str:
+        return f"localhost:{self.port}/{supplier}"
+
+
+@pytest_asyncio.fixture
+async def supplier_stub():
+    """
+    Local HTTP server standing in for supplier APIs
+    """
+    stub = StubSupplierServer()
+    app = Application([(r"/(\w+)", StubSupplierHandler, {"stub": stub})])
+    sockets = bind_sockets(0, "127.0.0.1")
+    stub.port = sockets[0].getsockname()[1]
+    server = HTTPServer(app)
+    server.add_sockets(sockets)
+    yield stub
+    server.stop()
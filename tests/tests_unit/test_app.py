@@ -0,0 +1,94 @@
+import os
+import signal
+import subprocess
+import sys
+
+from product_comparison_service.app import prepare_database
+from product_comparison_service.database.database import (
+    get_database_conn_and_cursor,
+)
+
+# Forks two workers, which print their pids and wait to be terminated
+WORKERS_SCRIPT = """
+import os, signal, sys, time
+from product_comparison_service.app import fork_workers
+fork_workers(2)
+signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+os.write(1, f"{os.getpid()}\\n".encode())
+time.sleep(30)
+"""
+
+
+def count_products(database):
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute("SELECT COUNT(*) FROM product")
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_prepare_database_seeds_only_when_asked(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+
+    # Act
+    timings = prepare_database(database)
+    unseeded = count_products(database)
+    prepare_database(database, seed=True)
+    seeded = count_products(database)
+
+    # Assert
+    assert set(timings) == {"reset", "schema", "seed"}
+    assert unseeded == 0
+    assert seeded > 0
+
+
+def test_prepare_database_keeps_existing_data(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    prepare_database(database, seed=True)
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute("UPDATE supplier_product SET price = 42")
+    conn.commit()
+    conn.close()
+
+    # Act
+    prepare_database(database, seed=True)
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute("SELECT DISTINCT price FROM supplier_product")
+    prices = cursor.fetchall()
+    conn.close()
+    prepare_database(database, reset=True)
+
+    # Assert
+    assert prices == [(42,)]
+    assert count_products(database) == 0
+
+
+def test_supervisor_terminates_only_its_workers():
+
+    # Arrange
+    supervisor = subprocess.Popen(
+        [sys.executable, "-c", WORKERS_SCRIPT],
+        stdout=subprocess.PIPE,
+        preexec_fn=os.setpgrp,
+    )
+    workers = {int(supervisor.stdout.readline()) for _ in range(2)}
+    bystander = subprocess.Popen(
+        ["sleep", "30"], preexec_fn=lambda: os.setpgid(0, supervisor.pid)
+    )
+
+    # Act
+    supervisor.send_signal(signal.SIGTERM)
+    returncode = supervisor.wait(timeout=10)
+    bystander_running = bystander.poll() is None
+    bystander.kill()
+    bystander.wait()
+
+    # Assert
+    assert returncode == 0
+    assert bystander_running
+    for pid in workers:
+        assert not os.path.exists(f"/proc/{pid}")
@@ -0,0 +1,79 @@
+from product_comparison_service.suppliers.circuit_breaker import (
+    CircuitBreaker,
+    CLOSED,
+    OPEN,
+    HALF_OPEN,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker():
+    clock = FakeClock()
+    return CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock), clock
+
+
+def test_breaker_opens_after_threshold():
+    breaker, _ = make_breaker()
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_failures():
+    breaker, _ = make_breaker()
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_allows_single_trial():
+    breaker, clock = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+
+    clock.now = 10
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_breaker_trial_success_closes():
+    breaker, clock = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now = 10
+    breaker.allow()
+
+    breaker.record_success()
+
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_trial_failure_reopens():
+    breaker, clock = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now = 10
+    breaker.allow()
+
+    breaker.record_failure()
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
@@ -0,0 +1,506 @@
+import sqlite3
+import aiosqlite
+import pytest
+from unittest import mock
+
+from product_comparison_service.database.database import (
+    BulkWrite,
+    SCHEMA_MIGRATIONS,
+    SEARCH_STATEMENTS,
+    bulk_write_supplier_product_data,
+    get_database_conn_and_cursor,
+    get_schema_version,
+    iter_search_by_product_or_category,
+    search_by_product_or_category,
+    search_many,
+    select_products_search_results,
+    setup_database,
+    update_product_search_results,
+)
+from product_comparison_service.handlers.handlers import dict_factory
+
+SEED_DATA = """
+INSERT INTO product VALUES ('dog', 'Good', 'Canines', 1602908100, 0.2);
+INSERT INTO product VALUES ('wolf', 'Wild', 'Canines', 1602908100, 0.3);
+INSERT INTO product VALUES ('gorilla', 'Big', 'Great Apes', 1602908100, 0.8);
+INSERT INTO supplier VALUES ('iPet', 'www.ipet.com/animals', 0.1);
+INSERT INTO supplier VALUES ('DavesPets', 'www.daves-pets.com/animals', 0.8);
+INSERT INTO supplier_product (supplier, product, price) VALUES ('iPet', 'dog', 7);
+INSERT INTO supplier_product (supplier, product, price) VALUES ('DavesPets', 'dog', 1);
+INSERT INTO supplier_product (supplier, product, price) VALUES ('iPet', 'wolf', 9);
+INSERT INTO supplier_product (supplier, product, price) VALUES ('iPet', 'gorilla', 15);
+"""
+
+LEGACY_SCHEMA = """
+CREATE TABLE product (
+    name text PRIMARY KEY,
+    description text,
+    category text NOT NULL,
+    last_updated timestamp NOT NULL,
+    rating real
+);
+CREATE TABLE supplier (
+    name text PRIMARY KEY,
+    pull_url text,
+    rating real
+);
+CREATE TABLE supplier_product (
+    supplier text NOT NULL,
+    product text NOT NULL,
+    price real NOT NULL,
+    FOREIGN KEY(supplier) REFERENCES supplier(name),
+    FOREIGN KEY(product) REFERENCES product(name)
+);
+INSERT INTO product VALUES ('dog', 'Good', 'Canines', '2020-10-17T04:15:00.000', 0.2);
+INSERT INTO supplier VALUES ('iPet', 'www.ipet.com/animals', 0.1);
+INSERT INTO supplier_product VALUES ('iPet', 'dog', 7);
+INSERT INTO supplier_product VALUES ('iPet', 'dog', 8);
+"""
+
+
+def get_index_names(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def test_setup_new_database(tmp_path):
+
+    # Act
+    setup_database(str(tmp_path / "test.db"))
+
+    # Assert
+    conn, cursor = get_database_conn_and_cursor(str(tmp_path / "test.db"))
+    assert get_schema_version(cursor) == len(SCHEMA_MIGRATIONS)
+    assert {
+        "supplier_product_key",
+        "supplier_product_product_rank",
+        "supplier_product_category_rank",
+        "supplier_product_rank",
+        "product_category",
+    } <= get_index_names(cursor)
+
+
+def test_migrate_existing_database(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    legacy_conn = sqlite3.connect(database)
+    legacy_conn.executescript(LEGACY_SCHEMA)
+    legacy_conn.close()
+
+    # Act
+    setup_database(database)
+    setup_database(database)
+
+    # Assert
+    conn, cursor = get_database_conn_and_cursor(database)
+    assert get_schema_version(cursor) == len(SCHEMA_MIGRATIONS)
+    cursor.execute(
+        "SELECT supplier, product, price, last_updated FROM supplier_product"
+    )
+    assert cursor.fetchall() == [("iPet", "dog", 8, 1602908100)]
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute(
+            "INSERT INTO supplier_product (supplier, product, price) VALUES ('iPet', 'dog', 9)"
+        )
+
+
+def test_foreign_keys_enforced(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    conn, cursor = get_database_conn_and_cursor(database)
+
+    # Act / Assert
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute(
+            "INSERT INTO supplier_product (supplier, product, price) VALUES ('nobody', 'dog', 9)"
+        )
+
+
+def test_category_search_uses_index(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    conn, cursor = get_database_conn_and_cursor(database)
+
+    # Act
+    cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT name FROM product WHERE category = 'Canines'"
+    )
+    plan = " ".join(row[-1] for row in cursor.fetchall())
+
+    # Assert
+    assert "product_category" in plan
+
+
+def make_seeded_database(tmp_path):
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.executescript(SEED_DATA)
+    conn.close()
+    return database
+
+
+async def search(database, product=None, category=None, limit=-1, after=None, text=""):
+    async with aiosqlite.connect(database) as conn:
+        conn.row_factory = dict_factory
+        cursor = await conn.cursor()
+        results = await search_by_product_or_category(
+            conn=conn,
+            cursor=cursor,
+            product=product,
+            category=category,
+            limit=limit,
+            after=after,
+            text=text,
+        )
+    return [(result["supplier"], result["product"]) for result in results]
+
+
+@pytest.mark.asyncio
+async def test_search_ranked_by_combined_rating(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+
+    # Act
+    everything = await search(database)
+    canines = await search(database, category="Canines")
+    dogs = await search(database, product="dog")
+    canine_dogs = await search(database, product="dog", category="Canines")
+
+    # Assert
+    assert everything == [
+        ("DavesPets", "dog"),
+        ("iPet", "gorilla"),
+        ("iPet", "wolf"),
+        ("iPet", "dog"),
+    ]
+    assert canines == [("DavesPets", "dog"), ("iPet", "wolf"), ("iPet", "dog")]
+    assert dogs == [("DavesPets", "dog"), ("iPet", "dog")]
+    assert canine_dogs == dogs
+
+
+@pytest.mark.asyncio
+async def test_search_ranking_follows_rating_updates(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+    conn, cursor = get_database_conn_and_cursor(database)
+
+    # Act
+    cursor.execute("UPDATE product SET rating = 0.1 WHERE name = 'gorilla'")
+    cursor.execute("UPDATE supplier SET rating = 0.9 WHERE name = 'iPet'")
+    cursor.execute("UPDATE product SET category = 'Wolves' WHERE name = 'wolf'")
+    conn.commit()
+
+    # Assert
+    assert await search(database) == [
+        ("iPet", "wolf"),
+        ("iPet", "dog"),
+        ("DavesPets", "dog"),
+        ("iPet", "gorilla"),
+    ]
+    assert await search(database, category="Wolves") == [("iPet", "wolf")]
+
+
+@pytest.mark.asyncio
+async def test_search_keyset_pagination(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+
+    # Act
+    first_page = await search(database, limit=2)
+    second_page = await search(database, limit=2, after=(0.45, "iPet", "gorilla"))
+    ties = await search(database, after=(0.5, "DavesPets", "dog"))
+    canines = await search(
+        database, category="Canines", limit=1, after=(0.5, "DavesPets", "dog")
+    )
+
+    # Assert
+    assert first_page == [("DavesPets", "dog"), ("iPet", "gorilla")]
+    assert second_page == [("iPet", "wolf"), ("iPet", "dog")]
+    assert ties == [("iPet", "gorilla"), ("iPet", "wolf"), ("iPet", "dog")]
+    assert canines == [("iPet", "wolf")]
+
+
+@pytest.mark.asyncio
+async def test_iter_search_in_chunks(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+
+    # Act
+    async with aiosqlite.connect(database) as conn:
+        conn.row_factory = dict_factory
+        cursor = await conn.cursor()
+        chunks = [
+            [(result["supplier"], result["product"]) for result in results]
+            async for results in iter_search_by_product_or_category(
+                conn=conn,
+                cursor=cursor,
+                product=None,
+                category=None,
+                limit=3,
+                chunk_size=2,
+            )
+        ]
+
+    # Assert
+    assert chunks == [
+        [("DavesPets", "dog"), ("iPet", "gorilla")],
+        [("iPet", "wolf")],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_update_product_search_results_per_offer(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+    refreshed = [
+        {
+            "supplier": "iPet",
+            "product": "dog",
+            "price": 7,
+            "last_updated": 1609459200,
+        },
+        {
+            "supplier": "DavesPets",
+            "product": "dog",
+            "price": 2,
+            "last_updated": 1609459200,
+        },
+        {
+            "supplier": "iPet",
+            "product": "wolf",
+            "price": 10,
+            "last_updated": 1546300800,
+        },
+    ]
+
+    # Act
+    async with aiosqlite.connect(database) as conn:
+        cursor = await conn.cursor()
+        await update_product_search_results(conn, cursor, refreshed)
+
+    # Assert
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute(
+        "SELECT supplier, product, price, last_updated FROM supplier_product"
+        " ORDER BY supplier, product"
+    )
+    offers = cursor.fetchall()
+    cursor.execute("SELECT DISTINCT last_updated FROM product")
+    product_timestamps = cursor.fetchall()
+    # Older timestamps are not written back
+    assert offers == [
+        ("DavesPets", "dog", 2, 1609459200),
+        ("iPet", "dog", 7, 1609459200),
+        ("iPet", "gorilla", 15, 1602908100),
+        ("iPet", "wolf", 9, 1602908100),
+    ]
+    assert product_timestamps == [(1602908100,)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_write_supplier_product_data(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+    writes = [
+        BulkWrite(
+            "upsert",
+            ("owl", "Wise", "Birds", 1609459200, 0.9),
+            ("DavesPets", "owl", 3, 1609459200),
+        ),
+        BulkWrite(
+            "upsert",
+            ("dog", "Good", "Pets", 1609459200, 0.6),
+            ("iPet", "dog", 5, 1609459200),
+        ),
+        BulkWrite("delete", None, ("iPet", "wolf")),
+        BulkWrite("delete", None, ("iPet", "gorilla")),
+        BulkWrite(
+            "upsert",
+            ("gorilla", "Big", "Great Apes", 1609459200, 0.8),
+            ("iPet", "gorilla", 20, 1609459200),
+        ),
+    ]
+
+    # Act
+    async with aiosqlite.connect(database) as conn:
+        cursor = await conn.cursor()
+        await bulk_write_supplier_product_data(conn, cursor, writes)
+
+    # Assert
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute(
+        "SELECT supplier, product, category, price, combined_rating, last_updated"
+        " FROM supplier_product ORDER BY combined_rating DESC"
+    )
+    offers = cursor.fetchall()
+    cursor.execute("SELECT name FROM product ORDER BY name")
+    products = cursor.fetchall()
+    assert offers == [
+        ("DavesPets", "owl", "Birds", 3, 0.85, 1609459200),
+        ("DavesPets", "dog", "Pets", 1, 0.7, 1602908100),
+        ("iPet", "gorilla", "Great Apes", 20, 0.45, 1609459200),
+        ("iPet", "dog", "Pets", 5, 0.35, 1609459200),
+    ]
+    assert products == [("dog",), ("gorilla",), ("owl",)]
+
+
+@pytest.mark.asyncio
+async def test_bulk_write_is_one_transaction(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+    writes = [
+        BulkWrite("delete", None, ("iPet", "wolf")),
+        BulkWrite(
+            "upsert",
+            ("owl", "Wise", "Birds", 1609459200, 0.9),
+            ("Nobody", "owl", 3, 1609459200),
+        ),
+    ]
+
+    # Act
+    async with aiosqlite.connect(database) as conn:
+        await conn.execute("PRAGMA foreign_keys = ON")
+        cursor = await conn.cursor()
+        with pytest.raises(sqlite3.IntegrityError):
+            await bulk_write_supplier_product_data(conn, cursor, writes)
+
+    # Assert
+    assert await search(database, product="wolf") == [("iPet", "wolf")]
+    assert await search(database, product="owl") == []
+
+
+@pytest.mark.asyncio
+async def test_search_parameterized(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+
+    # Act
+    results = await search(database, product="dog' OR '1'='1")
+
+    # Assert
+    assert results == []
+
+
+@pytest.mark.asyncio
+async def test_search_by_text(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+
+    # Act
+    by_name = await search(database, text="O")
+    by_description = await search(database, text="ild")
+    in_category = await search(database, category="Canines", text="og")
+    wildcards = await search(database, text="%")
+
+    # Assert
+    assert by_name == [
+        ("DavesPets", "dog"),
+        ("iPet", "gorilla"),
+        ("iPet", "wolf"),
+        ("iPet", "dog"),
+    ]
+    assert by_description == [("iPet", "wolf")]
+    assert in_category == [("DavesPets", "dog"), ("iPet", "dog")]
+    assert wildcards == []
+
+
+@pytest.mark.asyncio
+async def test_select_products_search_results(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+
+    # Act
+    async with aiosqlite.connect(database) as conn:
+        conn.row_factory = dict_factory
+        cursor = await conn.cursor()
+        with mock.patch(
+            "product_comparison_service.database.database.PRODUCTS_PER_QUERY", 2
+        ):
+            results = await select_products_search_results(
+                conn, cursor, ["dog", "gorilla", "owl"]
+            )
+
+    # Assert
+    assert sorted((result["supplier"], result["product"]) for result in results) == [
+        ("DavesPets", "dog"),
+        ("iPet", "dog"),
+        ("iPet", "gorilla"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_many_in_one_query(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+    searches = [
+        ("dog", None, 100),
+        (None, "Canines", 2),
+        ("dog", "Canines", 1),
+        ("gorilla", "Canines", 100),
+        (None, "Great Apes", 100),
+        ("owl", None, 100),
+    ]
+
+    # Act
+    async with aiosqlite.connect(database) as conn:
+        conn.row_factory = dict_factory
+        cursor = await conn.cursor()
+        with mock.patch.object(cursor, "execute", wraps=cursor.execute) as execute:
+            found = await search_many(conn, cursor, searches)
+
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute(
+        "EXPLAIN QUERY PLAN " + execute.call_args[0][0], execute.call_args[0][1]
+    )
+    plan = [row[-1] for row in cursor.fetchall()]
+
+    # Assert
+    execute.assert_called_once()
+    # Each search is limited on its own rank index
+    assert sum("CO-ROUTINE" in step for step in plan) == len(searches)
+    assert any("supplier_product_category_rank (category=?)" in step for step in plan)
+    assert [
+        [(result["supplier"], result["product"]) for result in results]
+        for results in found
+    ] == [
+        await search(database, product, category, limit)
+        for product, category, limit in searches
+    ]
+
+
+def test_ranked_searches_use_indexes(tmp_path):
+
+    # Arrange
+    database = make_seeded_database(tmp_path)
+    conn, cursor = get_database_conn_and_cursor(database)
+
+    for filters, statement in SEARCH_STATEMENTS.items():
+        by_product, by_category, by_text, after = filters
+        parameters = ["dog"] * by_product + ["Canines"] * by_category
+        parameters += ["%dog%", "%dog%"] * by_text
+        parameters += [0.5, 0.5, "DavesPets", "dog"] * after + [10]
+
+        # Act
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plan = " ".join(row[-1] for row in cursor.fetchall())
+
+        # Assert
+        assert "TEMP B-TREE" not in plan
+        assert "COVERING INDEX supplier_product_" in plan
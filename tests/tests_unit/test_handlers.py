@@ -1,13 +1,24 @@
+import json
 import pytest
-from asyncio import sleep
+import pytest_asyncio
+from asyncio import gather, sleep, wait_for
 from unittest import mock
-from datetime import datetime
+from tornado.web import HTTPError
 
 from product_comparison_service.handlers.handlers import (
     ProductHandler,
+    BatchSearchHandler,
+    BulkProductHandler,
     DocsHandler,
-    DATETIME_FORMAT,
+    encode_cursor,
+    decode_cursor,
 )
+from product_comparison_service.cache.search_cache import SearchCache
+from product_comparison_service.cache.singleflight import SingleFlight
+from product_comparison_service.data_classes.data_classes import Supplier
+from product_comparison_service.database.database import BulkWrite
+from product_comparison_service.database.pool import AsyncConnectionPool
+from product_comparison_service.timestamps import epoch_now, to_iso
 
 
 class AsyncMock(mock.MagicMock):
@@ -15,6 +26,41 @@ class AsyncMock(mock.MagicMock):
         return super(AsyncMock, self).__call__(*args, **kwargs)
 
 
+class FakeCache(dict):
+    generation = 0
+
+
+def make_pool():
+    # A pool lending out a connection whose cursor is "test_cur"
+    conn = mock.MagicMock()
+    conn.cursor = mock.AsyncMock(return_value="test_cur")
+    pool = mock.MagicMock()
+    pool.connection.return_value.__aenter__.return_value = conn
+    return pool, conn
+
+
+@pytest_asyncio.fixture
+async def small_pool(tmp_path):
+    """
+    A pool of a single connection, which requests must not hold while
+    waiting for another
+    """
+    pool = AsyncConnectionPool(str(tmp_path / "test.db"), size=1)
+    yield pool
+    await pool.close()
+
+
+def make_invalidations():
+    # Invalidations applying the writes published with them
+    async def publish(*args, write=None, **kwargs):
+        return await write("test_conn", "test_cur")
+
+    invalidations = mock.AsyncMock()
+    invalidations.publish.side_effect = publish
+    invalidations.publish_many.side_effect = publish
+    return invalidations
+
+
 class TestGetDocs:
     @mock.patch("product_comparison_service.handlers.handlers.get_docs")
     @pytest.mark.asyncio
@@ -37,26 +83,35 @@ class TestGetProducts:
     async def test_cached_hit(self, mock_get_docs):
 
         # Arrange
-        timestamp = datetime.strftime(datetime.now(), DATETIME_FORMAT)
+        timestamp = epoch_now()
         mock_get_docs.return_value = "test_docs"
 
         mock_self = mock.MagicMock()
-        mock_self.get_argument.side_effect = ["test_product", "test_category"]
-        mock_self.cache_dict = {
-            ("test_product", "test_category"): [
-                {
-                    "product": "coyotee",
-                    "description": "Oportunistic",
-                    "category": "Canines",
-                    "price": 1000000000.0,
-                    "supplier": "DavesPets",
-                    "product_rating": 0.4,
-                    "supplier_rating": 0.8,
-                    "combined_rating": 0.6,
-                    "last_updated": timestamp,
-                }
-            ]
-        }
+        mock_self.get_argument.side_effect = [
+            "test_product",
+            "test_category",
+            None,
+            None,
+            None,
+            "false",
+        ]
+        mock_self.cache_dict = FakeCache(
+            {
+                ("test_product", "test_category", 100, None, None): [
+                    {
+                        "product": "coyotee",
+                        "description": "Oportunistic",
+                        "category": "Canines",
+                        "price": 1000000000.0,
+                        "supplier": "DavesPets",
+                        "product_rating": 0.4,
+                        "supplier_rating": 0.8,
+                        "combined_rating": 0.6,
+                        "last_updated": timestamp,
+                    }
+                ]
+            }
+        )
 
         expected_write_value = {
             "success": True,
@@ -70,9 +125,10 @@ class TestGetProducts:
                     "product_rating": 0.4,
                     "supplier_rating": 0.8,
                     "combined_rating": 0.6,
-                    "last_updated": timestamp,
+                    "last_updated": to_iso(timestamp),
                 }
             ],
+            "next_cursor": None,
         }
 
         # Act
@@ -89,10 +145,18 @@ class TestGetProducts:
     async def test_db_hit(self, mock_search_by_product_or_category):
 
         # Arrange
-        timestamp = datetime.strftime(datetime.now(), DATETIME_FORMAT)
+        timestamp = epoch_now()
         mock_self = mock.MagicMock()
-        mock_self.get_argument.side_effect = ["test_product", "test_category"]
-        mock_self.cache_dict = {}
+        mock_self.get_argument.side_effect = [
+            "test_product",
+            "test_category",
+            None,
+            None,
+            None,
+            "false",
+        ]
+        mock_self.cache_dict = FakeCache()
+        mock_self.search_index = None
         mock_self.get_async_conn_and_cur = mock.AsyncMock()
         mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
         mock_search_by_product_or_category.return_value = [
@@ -121,9 +185,10 @@ class TestGetProducts:
                     "product_rating": 0.4,
                     "supplier_rating": 0.8,
                     "combined_rating": 0.6,
-                    "last_updated": timestamp,
+                    "last_updated": to_iso(timestamp),
                 }
             ],
+            "next_cursor": None,
         }
 
         # Act
@@ -132,6 +197,84 @@ class TestGetProducts:
         # Assert
         mock_self.write.assert_called_once_with(expected_write_value)
 
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_by_product_or_category",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_db_hit_invalidated_during_read(
+        self, mock_search_by_product_or_category
+    ):
+
+        # Arrange
+        mock_self = mock.MagicMock()
+        mock_self.get_argument.side_effect = ["dog", None, None, None, None, "false"]
+        mock_self.cache_dict = SearchCache()
+        mock_self.search_index = None
+        mock_self.get_async_conn_and_cur = mock.AsyncMock()
+        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        result = {
+            "product": "dog",
+            "supplier": "iPet",
+            "combined_rating": 0.6,
+            "last_updated": epoch_now(),
+        }
+
+        # A write to dog is invalidated while its results are read
+        def search(**kwargs):
+            mock_self.cache_dict.invalidate("dog")
+            return [result]
+
+        mock_search_by_product_or_category.side_effect = search
+
+        # Act
+        await ProductHandler.get(mock_self)
+
+        # Assert
+        assert len(mock_self.write.call_args[0][0]["search_results"]) == 1
+        assert len(mock_self.cache_dict) == 0
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_by_product_or_category",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_search_index_hit(self, mock_search_by_product_or_category):
+
+        # Arrange
+        timestamp = epoch_now()
+        mock_self = mock.MagicMock()
+        mock_self.get_argument.side_effect = [
+            None,
+            "Canines",
+            None,
+            None,
+            None,
+            "false",
+        ]
+        mock_self.cache_dict = FakeCache()
+        result = {
+            "product": "coyotee",
+            "supplier": "DavesPets",
+            "combined_rating": 0.6,
+            "last_updated": timestamp,
+        }
+        mock_self.search_index.search.return_value = [result]
+
+        # Act
+        await ProductHandler.get(mock_self)
+
+        # Assert
+        mock_self.search_index.search.assert_called_once_with(
+            None, "Canines", 100, None, None
+        )
+        mock_search_by_product_or_category.assert_not_called()
+        written = mock_self.write.call_args[0][0]
+        assert written["search_results"] == [
+            dict(result, last_updated=to_iso(timestamp))
+        ]
+        assert mock_self.cache_dict == {(None, "Canines", 100, None, None): [result]}
+
     @mock.patch(
         "product_comparison_service.handlers.handlers.search_by_product_or_category",
         new_callable=AsyncMock,
@@ -141,8 +284,16 @@ class TestGetProducts:
 
         # Arrange
         mock_self = mock.MagicMock()
-        mock_self.get_argument.side_effect = ["test_product", "test_category"]
-        mock_self.cache_dict = {}
+        mock_self.get_argument.side_effect = [
+            "test_product",
+            "test_category",
+            None,
+            None,
+            None,
+            "false",
+        ]
+        mock_self.cache_dict = FakeCache()
+        mock_self.search_index = None
         mock_self.get_async_conn_and_cur = mock.AsyncMock()
         mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
         mock_search_by_product_or_category.return_value = [
@@ -155,7 +306,7 @@ class TestGetProducts:
                 "product_rating": 0.4,
                 "supplier_rating": 0.8,
                 "combined_rating": 0.6,
-                "last_updated": "2020-10-10T09:22:37.398697",
+                "last_updated": 1602321757,
             }
         ]
         updated_results = {
@@ -168,12 +319,19 @@ class TestGetProducts:
                 "product_rating": 0.4,
                 "supplier_rating": 0.8,
                 "combined_rating": 0.6,
-                "last_updated": "2020-10-10T09:22:37.398697",
+                "last_updated": 1602321757,
             }
         }
-        mock_self.make_dummy_calls_to_supplier_apis = mock.AsyncMock()
-        mock_self.make_dummy_calls_to_supplier_apis.return_value = updated_results
+        mock_self.call_supplier_apis = mock.AsyncMock()
+        mock_self.call_supplier_apis.return_value = updated_results
         mock_self.update_db = mock.AsyncMock()
+        mock_self.refreshes = SingleFlight()
+        mock_self.refresh_search_results = (
+            lambda *args: ProductHandler.refresh_search_results(mock_self, *args)
+        )
+        mock_self.refresh_offers = lambda *args: ProductHandler.refresh_offers(
+            mock_self, *args
+        )
 
         expected_write_value = {
             "success": True,
@@ -187,9 +345,10 @@ class TestGetProducts:
                     "product_rating": 0.4,
                     "supplier_rating": 0.8,
                     "combined_rating": 0.6,
-                    "last_updated": "2020-10-10T09:22:37.398697",
+                    "last_updated": "2020-10-10T09:22:37.000000",
                 }
             ],
+            "next_cursor": None,
         }
 
         # Act
@@ -197,6 +356,442 @@ class TestGetProducts:
 
         # Assert
         mock_self.write.assert_called_once_with(expected_write_value)
+        assert list(mock_self.cache_dict) == [
+            ("test_product", "test_category", 100, None, None)
+        ]
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_by_product_or_category",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_concurrent_api_hits_share_refresh(
+        self, mock_search_by_product_or_category
+    ):
+
+        # Arrange
+        refreshes = SingleFlight()
+        stale_result = {
+            "product": "coyotee",
+            "description": "Oportunistic",
+            "category": "Canines",
+            "price": 1000000000.0,
+            "supplier": "DavesPets",
+            "product_rating": 0.4,
+            "supplier_rating": 0.8,
+            "combined_rating": 0.6,
+            "last_updated": 1602321757,
+        }
+        mock_search_by_product_or_category.return_value = [stale_result]
+
+        async def slow_supplier_call(search_results):
+            await sleep(0.01)
+            return {}
+
+        mock_supplier_call = mock.AsyncMock(side_effect=slow_supplier_call)
+        mock_update_db = mock.AsyncMock()
+
+        def make_mock_self():
+            mock_self = mock.MagicMock()
+            mock_self.get_argument.side_effect = [
+                "coyotee",
+                None,
+                None,
+                None,
+                None,
+                "false",
+            ]
+            mock_self.cache_dict = FakeCache()
+            mock_self.search_index = None
+            mock_self.get_async_conn_and_cur = mock.AsyncMock()
+            mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+            mock_self.call_supplier_apis = mock_supplier_call
+            mock_self.update_db = mock_update_db
+            mock_self.refreshes = refreshes
+            mock_self.refresh_search_results = (
+                lambda *args: ProductHandler.refresh_search_results(mock_self, *args)
+            )
+            mock_self.refresh_offers = lambda *args: ProductHandler.refresh_offers(
+                mock_self, *args
+            )
+            return mock_self
+
+        mock_selves = [make_mock_self() for _ in range(3)]
+
+        # Act
+        await gather(*[ProductHandler.get(mock_self) for mock_self in mock_selves])
+
+        # Assert
+        mock_supplier_call.assert_called_once()
+        mock_update_db.assert_called_once()
+        for mock_self in mock_selves:
+            mock_self.write.assert_called_once_with(
+                {
+                    "success": True,
+                    "search_results": [
+                        dict(
+                            stale_result,
+                            last_updated="2020-10-10T09:22:37.000000",
+                            stale=True,
+                        )
+                    ],
+                    "next_cursor": None,
+                }
+            )
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.select_suppliers",
+        new_callable=AsyncMock,
+    )
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_by_product_or_category",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_concurrent_api_hits_share_a_small_pool(
+        self, mock_search_by_product_or_category, mock_select_suppliers, small_pool
+    ):
+
+        # Arrange
+        mock_search_by_product_or_category.return_value = [
+            {
+                "product": "coyotee",
+                "supplier": "DavesPets",
+                "last_updated": 1602321757,
+            }
+        ]
+        mock_select_suppliers.return_value = {}
+
+        async def update_db(search_results):
+            # As when publishing the refresh without a write buffer
+            async with small_pool.connection():
+                pass
+
+        def make_mock_self(product):
+            mock_self = mock.MagicMock()
+            mock_self.get_argument.side_effect = [
+                product,
+                None,
+                None,
+                None,
+                None,
+                "false",
+            ]
+            mock_self.cache_dict = FakeCache()
+            mock_self.search_index = None
+            mock_self.application.db_pool = small_pool
+            mock_self.application.supplier_clients.refresh = mock.AsyncMock(
+                return_value={}
+            )
+            mock_self.async_conn = None
+            mock_self.get_async_conn_and_cur = (
+                lambda: ProductHandler.get_async_conn_and_cur(mock_self)
+            )
+            mock_self.release_async_conn = lambda: ProductHandler.release_async_conn(
+                mock_self
+            )
+            mock_self.call_supplier_apis = (
+                lambda *args: ProductHandler.call_supplier_apis(mock_self, *args)
+            )
+            mock_self.update_db = update_db
+            mock_self.refreshes = SingleFlight()
+            mock_self.refresh_search_results = (
+                lambda *args: ProductHandler.refresh_search_results(mock_self, *args)
+            )
+            mock_self.refresh_offers = lambda *args: ProductHandler.refresh_offers(
+                mock_self, *args
+            )
+            return mock_self
+
+        mock_selves = [make_mock_self(f"product_{i}") for i in range(3)]
+
+        # Act
+        await wait_for(
+            gather(*[ProductHandler.get(mock_self) for mock_self in mock_selves]),
+            timeout=5,
+        )
+
+        # Assert
+        for mock_self in mock_selves:
+            mock_self.write.assert_called_once()
+            assert mock_self.async_conn is None
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.STALE_WHILE_REVALIDATE", True
+    )
+    @mock.patch("product_comparison_service.handlers.handlers.IOLoop")
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_by_product_or_category",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(
+        self, mock_search_by_product_or_category, mock_ioloop
+    ):
+
+        # Arrange
+        last_updated = epoch_now() - 2 * 60 * 60
+        mock_self = mock.MagicMock()
+        mock_self.get_argument.side_effect = [
+            "coyotee",
+            None,
+            None,
+            None,
+            None,
+            "false",
+        ]
+        mock_self.cache_dict = FakeCache()
+        mock_self.search_index = None
+        mock_self.get_async_conn_and_cur = mock.AsyncMock()
+        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        mock_search_by_product_or_category.return_value = [
+            {
+                "product": "coyotee",
+                "supplier": "DavesPets",
+                "price": 1.0,
+                "last_updated": last_updated,
+            }
+        ]
+        mock_self.refresh_search_results = mock.AsyncMock()
+
+        # Act
+        await ProductHandler.get(mock_self)
+
+        # Assert
+        mock_ioloop.current().spawn_callback.assert_called_once()
+        mock_self.refresh_search_results.assert_not_called()
+        written = mock_self.write.call_args[0][0]
+        assert written["revalidating"] is True
+        assert written["search_results"][0]["price"] == 1.0
+        assert written["search_results"][0]["age_seconds"] >= 2 * 60 * 60
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.STALE_WHILE_REVALIDATE", True
+    )
+    @mock.patch("product_comparison_service.handlers.handlers.IOLoop")
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_by_product_or_category",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate_hard_limit(
+        self, mock_search_by_product_or_category, mock_ioloop
+    ):
+
+        # Arrange
+        mock_self = mock.MagicMock()
+        mock_self.get_argument.side_effect = [
+            "coyotee",
+            None,
+            None,
+            None,
+            None,
+            "false",
+        ]
+        mock_self.cache_dict = FakeCache()
+        mock_self.search_index = None
+        mock_self.get_async_conn_and_cur = mock.AsyncMock()
+        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        mock_search_by_product_or_category.return_value = [
+            {
+                "product": "coyotee",
+                "supplier": "DavesPets",
+                "price": 1.0,
+                "last_updated": 1602321757,
+            }
+        ]
+        refreshed_timestamp = epoch_now()
+        mock_self.refreshes = SingleFlight()
+        mock_self.refresh_search_results = mock.AsyncMock()
+        mock_self.refresh_search_results.return_value = [
+            {
+                "product": "coyotee",
+                "supplier": "DavesPets",
+                "price": 2.0,
+                "last_updated": refreshed_timestamp,
+            }
+        ]
+
+        # Act
+        await ProductHandler.get(mock_self)
+
+        # Assert
+        mock_ioloop.current().spawn_callback.assert_not_called()
+        mock_self.refresh_search_results.assert_called_once()
+        written = mock_self.write.call_args[0][0]
+        assert written["revalidating"] is False
+        assert written["search_results"][0]["price"] == 2.0
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_by_product_or_category",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_paginated_db_hit(self, mock_search_by_product_or_category):
+
+        # Arrange
+        timestamp = epoch_now()
+        page_cursor = encode_cursor(
+            {"combined_rating": 0.6, "supplier": "DavesPets", "product": "coyotee"}
+        )
+        mock_self = mock.MagicMock()
+        mock_self.get_argument.side_effect = [
+            None,
+            "Canines",
+            None,
+            "1",
+            page_cursor,
+            "false",
+        ]
+        mock_self.cache_dict = FakeCache()
+        mock_self.search_index = None
+        mock_self.get_async_conn_and_cur = mock.AsyncMock()
+        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        result = {
+            "product": "coyotee",
+            "supplier": "CheapPets",
+            "combined_rating": 0.3,
+            "last_updated": timestamp,
+        }
+        mock_search_by_product_or_category.return_value = [result]
+
+        # Act
+        await ProductHandler.get(mock_self)
+
+        # Assert
+        mock_search_by_product_or_category.assert_called_once_with(
+            conn="test_conn",
+            cursor="test_cur",
+            product=None,
+            category="Canines",
+            limit=1,
+            after=(0.6, "DavesPets", "coyotee"),
+            text="",
+        )
+        written = mock_self.write.call_args[0][0]
+        assert written["search_results"] == [
+            dict(result, last_updated=to_iso(timestamp))
+        ]
+        assert decode_cursor(written["next_cursor"]) == (0.3, "CheapPets", "coyotee")
+        assert mock_self.cache_dict == {
+            (None, "Canines", 1, page_cursor, None): [result]
+        }
+
+    @pytest.mark.parametrize(
+        "arguments",
+        [
+            [None, None, None, "0", None, "false"],
+            [None, None, None, "1001", None, "false"],
+            [None, None, None, "ten", None, "false"],
+            [None, None, None, None, "not-a-cursor", "false"],
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_invalid_page(self, arguments):
+
+        # Arrange
+        mock_self = mock.MagicMock()
+        mock_self.get_argument.side_effect = arguments
+
+        # Act / Assert
+        with pytest.raises(HTTPError) as error:
+            await ProductHandler.get(mock_self)
+        assert error.value.status_code == 400
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.iter_search_by_product_or_category"
+    )
+    @mock.patch("product_comparison_service.handlers.handlers.STREAM_CHUNK_SIZE", 1)
+    @pytest.mark.asyncio
+    async def test_streamed_db_hit(self, mock_iter_search_by_product_or_category):
+
+        # Arrange
+        timestamp = epoch_now()
+        old_timestamp = epoch_now() - 2 * 60 * 60
+        mock_self = mock.MagicMock()
+        mock_self.get_argument.side_effect = [None, "Canines", None, "2", None, "true"]
+        mock_self.cache_dict = FakeCache()
+        mock_self.search_index = None
+        mock_self.get_async_conn_and_cur = mock.AsyncMock()
+        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        mock_self.flush = mock.AsyncMock()
+        mock_self.stream_search_results = (
+            lambda *args: ProductHandler.stream_search_results(mock_self, *args)
+        )
+        fresh = {
+            "product": "coyotee",
+            "supplier": "DavesPets",
+            "combined_rating": 0.6,
+            "last_updated": timestamp,
+        }
+        stale = {
+            "product": "wolf",
+            "supplier": "iPet",
+            "combined_rating": 0.3,
+            "last_updated": old_timestamp,
+        }
+
+        async def iter_results(**kwargs):
+            yield [fresh]
+            yield [stale]
+
+        mock_iter_search_by_product_or_category.side_effect = iter_results
+
+        # Act
+        await ProductHandler.get(mock_self)
+
+        # Assert
+        written = json.loads(
+            "".join(call[0][0] for call in mock_self.write.call_args_list)
+        )
+        assert written["success"]
+        assert written["search_results"] == [
+            dict(fresh, last_updated=to_iso(timestamp)),
+            dict(stale, last_updated=to_iso(old_timestamp), stale=True),
+        ]
+        assert decode_cursor(written["next_cursor"]) == (0.3, "iPet", "wolf")
+        assert mock_self.flush.call_count == 2
+        assert mock_self.cache_dict == {}
+        mock_iter_search_by_product_or_category.assert_called_once_with(
+            conn="test_conn",
+            cursor="test_cur",
+            product=None,
+            category="Canines",
+            limit=2,
+            after=None,
+            chunk_size=1,
+            text="",
+        )
+
+
+class TestUpdateDb:
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.update_product_search_results",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_update_db_publishes_refreshes(
+        self, mock_update_product_search_results
+    ):
+
+        # Arrange
+        mock_self = mock.MagicMock()
+        mock_self.invalidations = make_invalidations()
+        refreshed = [
+            {"product": "dog", "supplier": "iPet", "price": 5, "last_updated": 1}
+        ]
+
+        # Act
+        await ProductHandler.update_db(mock_self, refreshed)
+
+        # Assert
+        mock_update_product_search_results.assert_called_once_with(
+            "test_conn", "test_cur", search_results=refreshed, commit=False
+        )
+        published = mock_self.invalidations.publish_many.call_args
+        assert list(published[0][0]) == [("dog", None)]
+        assert published[1]["local"] is False
+        mock_self.search_index.update_results.assert_called_once_with(refreshed)
 
 
 class TestDeleteProduct:
@@ -208,11 +803,10 @@ class TestDeleteProduct:
     async def test_delete(self, mock_delete_supplier_product_data):
 
         # Arrange
-        timestamp = datetime.strftime(datetime.now(), DATETIME_FORMAT)
+        timestamp = epoch_now()
         mock_self = mock.MagicMock()
         mock_self.get_argument.side_effect = ["test_product", "test_category"]
-        mock_self.get_async_conn_and_cur = mock.AsyncMock()
-        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        mock_self.invalidations = make_invalidations()
 
         expected_write_value = {
             "success": True,
@@ -224,23 +818,30 @@ class TestDeleteProduct:
 
         # Assert
         mock_delete_supplier_product_data.assert_called_once_with(
-            "test_conn", "test_cur", "test_product", "test_category"
+            "test_conn",
+            "test_cur",
+            product="test_product",
+            supplier="test_category",
+            commit=False,
+        )
+        mock_self.invalidations.publish.assert_awaited_once_with(
+            "test_product", write=mock.ANY
         )
         mock_self.write.assert_called_once_with(expected_write_value)
 
 
 class TestPutProduct:
-    @mock.patch("product_comparison_service.handlers.handlers.datetime")
+    @mock.patch("product_comparison_service.handlers.handlers.epoch_now")
     @mock.patch(
         "product_comparison_service.handlers.handlers.update_supplier_product_data",
         new_callable=AsyncMock,
     )
     @pytest.mark.asyncio
-    async def test_delete(self, mock_update_supplier_product_data, mock_datetime):
+    async def test_delete(self, mock_update_supplier_product_data, mock_epoch_now):
 
         # Arrange
-        timestamp = datetime.strftime(datetime.now(), DATETIME_FORMAT)
-        mock_datetime.strftime.return_value = timestamp
+        timestamp = epoch_now()
+        mock_epoch_now.return_value = timestamp
         mock_self = mock.MagicMock()
         mock_self.get_argument.side_effect = [
             "test_product",
@@ -250,8 +851,7 @@ class TestPutProduct:
             "test_supplier",
             "test_product_rating",
         ]
-        mock_self.get_async_conn_and_cur = mock.AsyncMock()
-        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        mock_self.invalidations = make_invalidations()
 
         expected_write_value = {
             "success": True,
@@ -262,7 +862,7 @@ class TestPutProduct:
                 "price": "test_price",
                 "supplier": "test_supplier",
                 "product_rating": "test_product_rating",
-                "last_updated": timestamp,
+                "last_updated": to_iso(timestamp),
             },
         }
 
@@ -271,4 +871,378 @@ class TestPutProduct:
 
         # Assert
         mock_update_supplier_product_data.assert_called_once()
+        assert mock_update_supplier_product_data.call_args[1]["commit"] is False
+        mock_self.invalidations.publish.assert_awaited_once_with(
+            "test_product", "test_category", write=mock.ANY
+        )
         mock_self.write.assert_called_once_with(expected_write_value)
+
+
+class TestBatchSearch:
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.search_many",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_batch_search_misses_in_one_query(self, mock_search_many):
+
+        # Arrange
+        timestamp = epoch_now()
+        dog = {
+            "product": "dog",
+            "category": "Canines",
+            "supplier": "iPet",
+            "combined_rating": 0.5,
+            "last_updated": timestamp,
+        }
+        wolf = dict(dog, product="wolf")
+        mock_self = mock.MagicMock()
+        mock_self.request.body = json.dumps(
+            {
+                "queries": [
+                    {"product": "dog"},
+                    {"category": "Canines", "limit": 1},
+                    {"product": "owl"},
+                    {"product": "dog"},
+                ]
+            }
+        )
+        mock_self.cache_dict = FakeCache({("dog", None, 100, None, None): [dog]})
+        mock_self.search_index = None
+        mock_self.get_async_conn_and_cur = mock.AsyncMock()
+        mock_self.get_async_conn_and_cur.return_value = ("test_conn", "test_cur")
+        mock_search_many.return_value = [[wolf], []]
+
+        # Act
+        await BatchSearchHandler.post(mock_self)
+
+        # Assert
+        mock_search_many.assert_called_once_with(
+            "test_conn", "test_cur", [(None, "Canines", 1), ("owl", None, 100)]
+        )
+        mock_self.release_async_conn.assert_called_once()
+        assert mock_self.cache_dict == {
+            ("dog", None, 100, None, None): [dog],
+            (None, "Canines", 1, None, None): [wolf],
+            ("owl", None, 100, None, None): [],
+        }
+        written = mock_self.write.call_args[0][0]
+        assert [
+            (result["product"], result["category"], result["search_results"])
+            for result in written["results"]
+        ] == [
+            ("dog", None, [dict(dog, last_updated=to_iso(timestamp))]),
+            (None, "Canines", [dict(wolf, last_updated=to_iso(timestamp))]),
+            ("owl", None, []),
+            ("dog", None, [dict(dog, last_updated=to_iso(timestamp))]),
+        ]
+        assert written["results"][1]["next_cursor"] == encode_cursor(wolf)
+
+    @pytest.mark.asyncio
+    async def test_batch_search_refreshes_in_one_fan_out(self):
+
+        # Arrange
+        dog = {
+            "product": "dog",
+            "category": "Canines",
+            "supplier": "iPet",
+            "combined_rating": 0.5,
+            "price": 7,
+            "last_updated": 1602321757,
+        }
+        wolf = dict(dog, product="wolf")
+        refreshed_dog = dict(dog, price=5, last_updated=epoch_now())
+        mock_self = mock.MagicMock()
+        mock_self.request.body = json.dumps(
+            {"queries": [{"product": "dog"}, {"category": "Canines"}]}
+        )
+        mock_self.cache_dict = FakeCache(
+            {
+                ("dog", None, 100, None, None): [dog],
+                (None, "Canines", 100, None, None): [dog, wolf],
+            }
+        )
+        mock_self.search_index = None
+        mock_self.refreshes = SingleFlight()
+        mock_self.call_supplier_apis = mock.AsyncMock(
+            return_value={("iPet", "dog"): refreshed_dog}
+        )
+        mock_self.update_db = mock.AsyncMock()
+        mock_self.refresh_batch_results = (
+            lambda *args: BatchSearchHandler.refresh_batch_results(mock_self, *args)
+        )
+        mock_self.refresh_offers = lambda *args: ProductHandler.refresh_offers(
+            mock_self, *args
+        )
+
+        # Act
+        await BatchSearchHandler.post(mock_self)
+
+        # Assert
+        mock_self.call_supplier_apis.assert_awaited_once_with([dog, wolf])
+        mock_self.update_db.assert_awaited_once_with([refreshed_dog])
+        assert mock_self.cache_dict == {
+            ("dog", None, 100, None, None): [refreshed_dog],
+            (None, "Canines", 100, None, None): [refreshed_dog, wolf],
+        }
+        written = mock_self.write.call_args[0][0]
+        assert [
+            [(result["product"], result.get("stale")) for result in results]
+            for results in (result["search_results"] for result in written["results"])
+        ] == [[("dog", None)], [("dog", None), ("wolf", True)]]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_batches_share_refresh(self):
+
+        # Arrange
+        dog = {
+            "product": "dog",
+            "category": "Canines",
+            "supplier": "iPet",
+            "combined_rating": 0.5,
+            "price": 7,
+            "last_updated": 1602321757,
+        }
+        refreshed_dog = dict(dog, price=5, last_updated=epoch_now())
+        refreshes = SingleFlight()
+
+        async def call_supplier_apis(search_results):
+            await sleep(0.01)
+            return {("iPet", "dog"): refreshed_dog}
+
+        call_supplier_apis = mock.MagicMock(side_effect=call_supplier_apis)
+
+        def make_batch(queries):
+            mock_self = mock.MagicMock()
+            mock_self.request.body = json.dumps({"queries": queries})
+            mock_self.cache_dict = FakeCache(
+                {
+                    ("dog", None, 100, None, None): [dog],
+                    ("dog", None, 5, None, None): [dog],
+                }
+            )
+            mock_self.search_index = None
+            mock_self.refreshes = refreshes
+            mock_self.call_supplier_apis = call_supplier_apis
+            mock_self.update_db = mock.AsyncMock()
+            mock_self.refresh_batch_results = (
+                lambda *args: BatchSearchHandler.refresh_batch_results(mock_self, *args)
+            )
+            mock_self.refresh_offers = lambda *args: ProductHandler.refresh_offers(
+                mock_self, *args
+            )
+            return mock_self
+
+        first = make_batch([{"product": "dog"}])
+        second = make_batch([{"product": "dog", "limit": 5}])
+
+        # Act
+        await gather(BatchSearchHandler.post(first), BatchSearchHandler.post(second))
+
+        # Assert
+        call_supplier_apis.assert_called_once()
+        for batch in (first, second):
+            results = batch.write.call_args[0][0]["results"]
+            assert [result["search_results"][0]["price"] for result in results] == [5]
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            b"not json",
+            b"[]",
+            b'{"queries": []}',
+            b'{"queries": [{}]}',
+            b'{"queries": [{"product": 1}]}',
+            b'{"queries": [{"product": "dog", "limit": 0}]}',
+            json.dumps({"queries": [{"product": "dog"}] * 101}).encode(),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_invalid_batch(self, body):
+
+        # Arrange
+        mock_self = mock.MagicMock()
+        mock_self.request.body = body
+
+        # Act / Assert
+        with pytest.raises(HTTPError) as error:
+            await BatchSearchHandler.post(mock_self)
+        assert error.value.status_code == 400
+
+
+class TestBulkProducts:
+    @mock.patch("product_comparison_service.handlers.handlers.epoch_now")
+    @mock.patch(
+        "product_comparison_service.handlers.handlers"
+        ".bulk_write_supplier_product_data",
+        new_callable=AsyncMock,
+    )
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.select_suppliers",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_bulk_write(
+        self, mock_select_suppliers, mock_bulk_write, mock_epoch_now
+    ):
+
+        # Arrange
+        mock_epoch_now.return_value = 1602908100
+        mock_select_suppliers.return_value = {
+            "iPet": Supplier("iPet", "www.ipet.com/animals", 0.1)
+        }
+        mock_self = mock.MagicMock()
+        mock_self.request.body = json.dumps(
+            [
+                {
+                    "product": "owl",
+                    "description": "wise",
+                    "category": "Birds",
+                    "price": 3,
+                    "supplier": "iPet",
+                },
+                {"op": "delete", "product": "dog", "supplier": "iPet"},
+                {"product": "owl", "category": "Birds", "price": 3, "supplier": "iPet"},
+                {"op": "delete", "product": "dog", "supplier": "Nobody"},
+            ]
+        ).encode()
+        mock_self.application.db_pool, conn = make_pool()
+        mock_self.invalidations = make_invalidations()
+
+        # Act
+        await BulkProductHandler.post(mock_self)
+
+        # Assert
+        mock_select_suppliers.assert_called_once_with(
+            conn, "test_cur", {"iPet", "Nobody"}
+        )
+        mock_bulk_write.assert_called_once_with(
+            "test_conn",
+            "test_cur",
+            writes=[
+                BulkWrite(
+                    "upsert",
+                    ("owl", "wise", "Birds", 1602908100, 0.5),
+                    ("iPet", "owl", 3, 1602908100),
+                ),
+                BulkWrite("delete", None, ("iPet", "dog")),
+            ],
+            commit=False,
+        )
+        published = mock_self.invalidations.publish_many.call_args[0][0]
+        assert list(published) == [("owl", "Birds"), ("dog", None)]
+        written = mock_self.write.call_args[0][0]
+        assert written["upserted"] == 1
+        assert written["deleted"] == 1
+        assert written["invalid"] == 2
+        assert [item["status"] for item in written["items"]] == [
+            "upserted",
+            "deleted",
+            "invalid",
+            "invalid",
+        ]
+        assert "description" in written["items"][2]["error"]
+        assert written["items"][3]["error"] == "Unknown supplier: Nobody"
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers"
+        ".bulk_write_supplier_product_data",
+        new_callable=AsyncMock,
+    )
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.select_suppliers",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_bulk_write_ndjson(self, mock_select_suppliers, mock_bulk_write):
+
+        # Arrange
+        mock_select_suppliers.return_value = {
+            "iPet": Supplier("iPet", "www.ipet.com/animals", 0.1)
+        }
+        mock_self = mock.MagicMock()
+        mock_self.request.body = (
+            b'{"op": "delete", "product": "dog", "supplier": "iPet"}\n'
+            b"\n"
+            b'{"op": "delete", "product": "wolf", "supplier": "iPet"}\n'
+        )
+        mock_self.application.db_pool, _ = make_pool()
+        mock_self.invalidations = make_invalidations()
+
+        # Act
+        await BulkProductHandler.post(mock_self)
+
+        # Assert
+        mock_bulk_write.assert_called_once_with(
+            "test_conn",
+            "test_cur",
+            writes=[
+                BulkWrite("delete", None, ("iPet", "dog")),
+                BulkWrite("delete", None, ("iPet", "wolf")),
+            ],
+            commit=False,
+        )
+        assert mock_self.write.call_args[0][0]["deleted"] == 2
+
+    @mock.patch(
+        "product_comparison_service.handlers.handlers.select_suppliers",
+        new_callable=AsyncMock,
+    )
+    @pytest.mark.asyncio
+    async def test_concurrent_bulk_writes_share_a_small_pool(
+        self, mock_select_suppliers, small_pool
+    ):
+
+        # Arrange
+        mock_select_suppliers.return_value = {
+            "iPet": Supplier("iPet", "www.ipet.com/animals", 0.1)
+        }
+
+        async def publish_many(*args, write=None, **kwargs):
+            # As when reloading the search index after the write
+            async with small_pool.connection():
+                pass
+
+        def make_handler():
+            mock_self = mock.MagicMock()
+            mock_self.request.body = (
+                b'{"op": "delete", "product": "dog", "supplier": "iPet"}\n'
+            )
+            mock_self.application.db_pool = small_pool
+            mock_self.async_conn = None
+            mock_self.get_async_conn_and_cur = (
+                lambda: ProductHandler.get_async_conn_and_cur(mock_self)
+            )
+            mock_self.invalidations.publish_many = publish_many
+            return mock_self
+
+        # Act
+        await wait_for(
+            gather(*(BulkProductHandler.post(make_handler()) for _ in range(10))),
+            timeout=5,
+        )
+
+        # Assert
+        assert mock_select_suppliers.call_count == 10
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            b"",
+            b"[]",
+            b"[{",
+            b'{"product": "dog"}\nnot json\n',
+            json.dumps([{"op": "delete"}] * 10001).encode(),
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_invalid_bulk_write(self, body):
+
+        # Arrange
+        mock_self = mock.MagicMock()
+        mock_self.request.body = body
+
+        # Act / Assert
+        with pytest.raises(HTTPError) as error:
+            await BulkProductHandler.post(mock_self)
+        assert error.value.status_code == 400
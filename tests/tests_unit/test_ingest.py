@@ -0,0 +1,107 @@
+import json
+import pytest
+
+from product_comparison_service.database.database import (
+    get_database_conn_and_cursor,
+    setup_database,
+)
+from product_comparison_service.database.ingest import (
+    find_shards,
+    ingest_shards,
+    shard_table,
+)
+
+
+def write_shard(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+@pytest.fixture
+def shards(tmp_path):
+    shard_dir = tmp_path / "shards"
+    shard_dir.mkdir()
+    # Written in reverse dependency order, to check shards are reordered
+    write_shard(
+        shard_dir / "supplier_products.jsonl",
+        [
+            {"supplier": "iPet", "product": f"dog{i}", "price": float(i)}
+            for i in range(10)
+        ],
+    )
+    for shard in range(2):
+        write_shard(
+            shard_dir / f"products-{shard}.jsonl",
+            [
+                {
+                    "name": f"dog{i}",
+                    "description": "Good",
+                    "category": "Canines",
+                    "last_updated": "2020-10-17T04:15:00.000",
+                    "rating": 0.2,
+                }
+                for i in range(shard * 5, shard * 5 + 5)
+            ],
+        )
+    write_shard(
+        shard_dir / "suppliers.jsonl",
+        [{"name": "iPet", "pull_url": "www.ipet.com/animals", "rating": 0.1}],
+    )
+    return shard_dir
+
+
+def make_database(tmp_path):
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    return database
+
+
+def test_shard_table():
+
+    # Assert
+    assert shard_table("/data/suppliers.jsonl") == "supplier"
+    assert shard_table("/data/products-0001.jsonl") == "product"
+    assert shard_table("/data/supplier_products-0001.jsonl") == "supplier_product"
+    assert shard_table("/data/readme.jsonl") is None
+
+
+def test_find_shards_by_glob(shards):
+
+    # Act
+    found = find_shards(str(shards / "products-*.jsonl"))
+
+    # Assert
+    assert found == {
+        "supplier": [],
+        "product": [
+            str(shards / "products-0.jsonl"),
+            str(shards / "products-1.jsonl"),
+        ],
+        "supplier_product": [],
+    }
+
+
+def test_ingest_shards(tmp_path, shards):
+
+    # Arrange
+    database = make_database(tmp_path)
+
+    # Act
+    rows = ingest_shards(database, str(shards), chunk_size=3, workers=2)
+
+    # Assert
+    assert rows == {"supplier": 1, "product": 10, "supplier_product": 10}
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute("SELECT SUM(price), COUNT(combined_rating) FROM supplier_product")
+    assert cursor.fetchone() == (45.0, 10)
+
+
+def test_ingest_shards_reports_invalid_lines(tmp_path, shards):
+
+    # Arrange
+    database = make_database(tmp_path)
+    with open(shards / "products-1.jsonl", "a") as file:
+        file.write("not json\n")
+
+    # Act / Assert
+    with pytest.raises(ValueError, match="products-1.jsonl: Invalid JSON on line 6"):
+        ingest_shards(database, str(shards), chunk_size=3, workers=2)
@@ -0,0 +1,257 @@
+import sqlite3
+import pytest
+from datetime import timedelta
+from functools import partial
+
+from product_comparison_service.app import prepare_database
+from product_comparison_service.cache.invalidation import CacheInvalidations
+from product_comparison_service.cache.search_cache import SearchCache
+from product_comparison_service.database.database import (
+    get_database_conn_and_cursor,
+    select_search_results,
+    setup_database,
+    update_product_search_results,
+)
+from product_comparison_service.database.pool import AsyncConnectionPool
+from product_comparison_service.database.search_index import SearchIndex
+from product_comparison_service.database.write_buffer import WriteBuffer
+from product_comparison_service.handlers.handlers import (
+    cache_unless_invalidated,
+    dict_factory,
+)
+
+
+def make_process(database, clock=None):
+    # A search cache and its invalidations, as set up by each server process
+    cache = SearchCache(cache_len=10)
+    cache[("dog", "Canines")] = [{"product": "dog"}]
+    cache[("wolf", "Canines")] = [{"product": "wolf"}]
+    pool = AsyncConnectionPool(database, size=1, row_factory=dict_factory)
+    invalidations = CacheInvalidations(cache, pool, clock=clock or (lambda: 0))
+    return cache, invalidations
+
+
+@pytest.mark.asyncio
+async def test_invalidations_reach_other_processes(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    cache, invalidations = make_process(database)
+    other_cache, other_invalidations = make_process(database)
+    await invalidations.poll()
+    await other_invalidations.poll()
+
+    # Act
+    await invalidations.publish("dog", "Canines")
+    immediately = ("dog", "Canines") in other_cache
+    applied = await other_invalidations.poll()
+    applied_to_self = await invalidations.poll()
+
+    # Assert
+    assert ("dog", "Canines") not in cache
+    assert immediately
+    assert applied == 1
+    assert applied_to_self == 0
+    assert ("dog", "Canines") not in other_cache
+    assert ("wolf", "Canines") in other_cache
+    await invalidations.pool.close()
+    await other_invalidations.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_publish_many_invalidations_at_once(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    cache, invalidations = make_process(database)
+    other_cache, other_invalidations = make_process(database)
+    await invalidations.poll()
+    await other_invalidations.poll()
+
+    # Act
+    await invalidations.publish_many(
+        [("dog", "Canines"), ("wolf", None), ("dog", "Canines")]
+    )
+    applied = await other_invalidations.poll()
+    applied_to_self = await invalidations.poll()
+
+    # Assert
+    assert len(cache) == 0
+    assert len(other_cache) == 0
+    assert applied == 2
+    assert applied_to_self == 0
+    await invalidations.pool.close()
+    await other_invalidations.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_publish_with_write_through_write_buffer(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    cache, invalidations = make_process(database)
+    other_cache, other_invalidations = make_process(database)
+    invalidations.writes = WriteBuffer(AsyncConnectionPool(database, size=1))
+    await invalidations.poll()
+    await other_invalidations.poll()
+
+    async def write(conn, cursor):
+        await cursor.execute("INSERT INTO supplier VALUES ('iPet', 'url', 0.5)")
+        return "written"
+
+    async def failing_write(conn, cursor):
+        await cursor.execute("INSERT INTO supplier VALUES ('iPet', 'url', 0.5)")
+
+    # Act
+    result = await invalidations.publish("dog", "Canines", write=write)
+    with pytest.raises(sqlite3.IntegrityError):
+        await invalidations.publish("wolf", "Canines", write=failing_write)
+    applied = await other_invalidations.poll()
+    applied_to_self = await invalidations.poll()
+
+    # Assert
+    assert result == "written"
+    assert ("dog", "Canines") not in other_cache
+    assert ("wolf", "Canines") in cache
+    assert applied == 1
+    assert applied_to_self == 0
+    assert invalidations.writes.stats() == {"writes": 1, "commits": 2}
+    await invalidations.writes.close()
+    await invalidations.pool.close()
+    await other_invalidations.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_expired_invalidations_clear_cache(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    now = [0]
+    cache, invalidations = make_process(database, clock=lambda: now[0])
+    other_cache, other_invalidations = make_process(database)
+    await other_invalidations.poll()
+
+    # Act
+    await invalidations.publish("dog")
+    now[0] += timedelta(hours=2).total_seconds()
+    await invalidations.publish("dog")
+    await other_invalidations.poll()
+
+    # Assert
+    assert ("wolf", "Canines") not in other_cache
+    await invalidations.pool.close()
+    await other_invalidations.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_invalidations_reload_search_index(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    prepare_database(database, seed=True)
+    _, invalidations = make_process(database)
+    _, other_invalidations = make_process(database)
+    for process in (invalidations, other_invalidations):
+        process.search_index = SearchIndex()
+        await process.poll()
+        async with process.pool.connection() as conn:
+            cursor = await conn.cursor()
+            process.search_index.load(await select_search_results(conn, cursor))
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute("DELETE FROM supplier_product WHERE product = 'dog'")
+    conn.commit()
+    conn.close()
+
+    # Act
+    await invalidations.publish("dog")
+    before_poll = other_invalidations.search_index.search("dog")
+    await other_invalidations.poll()
+
+    # Assert
+    assert invalidations.search_index.search("dog") == []
+    assert before_poll
+    assert other_invalidations.search_index.search("dog") == []
+    await invalidations.pool.close()
+    await other_invalidations.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_searches_read_during_reload_are_not_cached(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    prepare_database(database, seed=True)
+    cache, invalidations = make_process(database)
+    invalidations.search_index = SearchIndex()
+    async with invalidations.pool.connection() as conn:
+        cursor = await conn.cursor()
+        invalidations.search_index.load(await select_search_results(conn, cursor))
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute("DELETE FROM supplier_product WHERE product = 'dog'")
+    conn.commit()
+    conn.close()
+    reload_products = invalidations._reload_products
+
+    async def search_during_reload(*args):
+        # As a GET reading the index while the write's products reload
+        generation = cache.generation
+        results = invalidations.search_index.search("dog")
+        cache_unless_invalidated(cache, ("dog", None), results, generation)
+        await reload_products(*args)
+
+    invalidations._reload_products = search_during_reload
+
+    # Act
+    await invalidations.publish("dog")
+
+    # Assert
+    assert ("dog", None) not in cache
+    assert invalidations.search_index.search("dog") == []
+    await invalidations.pool.close()
+
+
+@pytest.mark.asyncio
+async def test_refreshes_reach_other_processes(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    prepare_database(database, seed=True)
+    cache, invalidations = make_process(database)
+    other_cache, other_invalidations = make_process(database)
+    for process in (invalidations, other_invalidations):
+        process.search_index = SearchIndex()
+        await process.poll()
+        async with process.pool.connection() as conn:
+            cursor = await conn.cursor()
+            process.search_index.load(await select_search_results(conn, cursor))
+    refreshed = [
+        dict(result, price=1, last_updated=result["last_updated"] + 1)
+        for result in invalidations.search_index.search("dog")
+    ]
+
+    # Act
+    await invalidations.publish_many(
+        [("dog", None)],
+        write=partial(
+            update_product_search_results, search_results=refreshed, commit=False
+        ),
+        local=False,
+    )
+    applied = await other_invalidations.poll()
+    applied_to_self = await invalidations.poll()
+
+    # Assert
+    assert ("dog", "Canines") in cache
+    assert ("dog", "Canines") not in other_cache
+    assert applied == 1
+    assert applied_to_self == 0
+    assert [
+        (result["price"], result["last_updated"])
+        for result in other_invalidations.search_index.search("dog")
+    ] == [(result["price"], result["last_updated"]) for result in refreshed]
+    await invalidations.pool.close()
+    await other_invalidations.pool.close()
@@ -0,0 +1,128 @@
+import json
+import sqlite3
+import pytest
+
+from product_comparison_service.database.database import (
+    get_database_conn_and_cursor,
+    setup_database,
+)
+from product_comparison_service.database.loader import (
+    bulk_insert,
+    get_insert_statement,
+    load_jsonl,
+    read_jsonl,
+    to_row,
+)
+
+
+def make_database(tmp_path):
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    return get_database_conn_and_cursor(database)
+
+
+def write_jsonl(path, records):
+    path.write_text("\n".join(json.dumps(record) for record in records) + "\n\n")
+    return str(path)
+
+
+def test_read_jsonl_is_lazy():
+
+    # Arrange
+    lines = iter(['{"name": "dog"}\n', "\n", '{"name": "wolf"}\n', "not json\n"])
+
+    # Act
+    records = read_jsonl(lines)
+    first = next(records)
+    second = next(records)
+
+    # Assert
+    assert first == {"name": "dog"}
+    assert second == {"name": "wolf"}
+    with pytest.raises(ValueError, match="line 4"):
+        next(records)
+
+
+def test_to_row_validates_against_data_class():
+
+    # Act
+    supplier = to_row("supplier", {"name": "iPet", "pull_url": "www.ipet.com"})
+
+    # Assert
+    assert supplier == ("iPet", "www.ipet.com", 0.5)
+    with pytest.raises(ValueError):
+        to_row("supplier_product", {"supplier": "iPet", "product": "dog"})
+
+
+def test_upsert_statement():
+
+    # Act
+    statement = get_insert_statement("supplier_product", upsert=True)
+
+    # Assert
+    assert statement == (
+        "INSERT INTO supplier_product (supplier, product, price) VALUES (?, ?, ?)"
+        " ON CONFLICT (supplier, product) DO UPDATE SET price = excluded.price"
+    )
+
+
+def test_load_jsonl_in_chunks(tmp_path):
+
+    # Arrange
+    conn, cursor = make_database(tmp_path)
+    filename = write_jsonl(
+        tmp_path / "products.jsonl",
+        [
+            {
+                "name": f"dog{i}",
+                "description": "Good",
+                "category": "Canines",
+                "last_updated": "2020-10-17T04:15:00.000",
+                "rating": 0.2,
+            }
+            for i in range(5)
+        ],
+    )
+
+    # Act
+    rows = load_jsonl(conn, cursor, "product", filename, chunk_size=2)
+
+    # Assert
+    assert rows == 5
+    cursor.execute("SELECT COUNT(*), last_updated FROM product")
+    assert cursor.fetchone() == (5, 1602908100)
+
+
+def test_load_jsonl_upsert(tmp_path):
+
+    # Arrange
+    conn, cursor = make_database(tmp_path)
+    suppliers = [{"name": "iPet", "pull_url": "www.ipet.com", "rating": 0.1}]
+    load_jsonl(conn, cursor, "supplier", write_jsonl(tmp_path / "old.jsonl", suppliers))
+    filename = write_jsonl(tmp_path / "new.jsonl", [dict(suppliers[0], rating=0.9)])
+
+    # Act
+    with pytest.raises(sqlite3.IntegrityError):
+        load_jsonl(conn, cursor, "supplier", filename)
+    rows = load_jsonl(conn, cursor, "supplier", filename, upsert=True)
+
+    # Assert
+    assert rows == 1
+    cursor.execute("SELECT name, rating FROM supplier")
+    assert cursor.fetchall() == [("iPet", 0.9)]
+
+
+def test_bulk_insert_rolls_back_failed_chunk(tmp_path):
+
+    # Arrange
+    conn, cursor = make_database(tmp_path)
+    rows = [("iPet", "www.ipet.com", 0.1), ("CheapPets", "www.cheap-pets.com", 0.2)]
+
+    # Act
+    with pytest.raises(sqlite3.IntegrityError):
+        bulk_insert(conn, cursor, "supplier", rows + rows[1:], chunk_size=2)
+
+    # Assert
+    cursor.execute("SELECT name FROM supplier ORDER BY name")
+    assert cursor.fetchall() == [("CheapPets",), ("iPet",)]
+    assert not conn.in_transaction
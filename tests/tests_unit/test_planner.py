@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+
+from product_comparison_service.suppliers.planner import RefreshPlanner
+
+
+def make_result(supplier, product):
+    return {"supplier": supplier, "product": product}
+
+
+@pytest.mark.asyncio
+async def test_plan_one_call_per_supplier():
+
+    # Arrange
+    planner = RefreshPlanner()
+    results = [
+        make_result("iPet", "dog"),
+        make_result("DavesPets", "dog"),
+        make_result("iPet", "wolf"),
+        make_result("iPet", "dog"),
+    ]
+
+    # Act
+    planned, joined = planner.plan(results)
+
+    # Assert
+    assert planned == {
+        "iPet": [make_result("iPet", "dog"), make_result("iPet", "wolf")],
+        "DavesPets": [make_result("DavesPets", "dog")],
+    }
+    assert joined == {}
+
+
+@pytest.mark.asyncio
+async def test_plan_joins_calls_in_flight():
+
+    # Arrange
+    planner = RefreshPlanner()
+    call = asyncio.get_running_loop().create_future()
+    planner.track("iPet", [make_result("iPet", "dog")], call)
+
+    # Act
+    planned, joined = planner.plan(
+        [make_result("iPet", "dog"), make_result("iPet", "wolf")]
+    )
+    call.set_result({"dog": 1})
+    await asyncio.sleep(0)
+
+    # Assert
+    assert planned == {"iPet": [make_result("iPet", "wolf")]}
+    assert joined == {("iPet", "dog"): (make_result("iPet", "dog"), call)}
+    assert len(planner) == 0
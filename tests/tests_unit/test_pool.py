@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+from product_comparison_service.database.pool import AsyncConnectionPool
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections(tmp_path):
+
+    # Arrange
+    pool = AsyncConnectionPool(str(tmp_path / "test.db"), size=2)
+
+    # Act
+    first = await pool.acquire()
+    pool.release(first)
+    second = await pool.acquire()
+    pool.release(second)
+
+    # Assert
+    assert first is second
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_waits_when_exhausted(tmp_path):
+
+    # Arrange
+    pool = AsyncConnectionPool(str(tmp_path / "test.db"), size=1)
+    conn = await pool.acquire()
+
+    # Act
+    waiter = asyncio.ensure_future(pool.acquire())
+    await asyncio.sleep(0.05)
+    waited = waiter.done()
+    pool.release(conn)
+    reused = await waiter
+
+    # Assert
+    assert not waited
+    assert reused is conn
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_applies_pragmas(tmp_path):
+
+    # Arrange
+    pool = AsyncConnectionPool(
+        str(tmp_path / "test.db"),
+        pragmas={"journal_mode": "WAL", "synchronous": "NORMAL"},
+    )
+
+    # Act
+    async with pool.connection() as conn:
+        cursor = await conn.execute("PRAGMA journal_mode")
+        journal_mode = await cursor.fetchone()
+        cursor = await conn.execute("PRAGMA synchronous")
+        synchronous = await cursor.fetchone()
+
+    # Assert
+    assert journal_mode == ("wal",)
+    assert synchronous == (1,)
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_close(tmp_path):
+
+    # Arrange
+    pool = AsyncConnectionPool(str(tmp_path / "test.db"))
+    conn = await pool.acquire()
+    pool.release(conn)
+
+    # Act
+    await pool.close()
+
+    # Assert
+    conn.join(timeout=1)
+    assert not conn.is_alive()
+    with pytest.raises(RuntimeError):
+        await pool.acquire()
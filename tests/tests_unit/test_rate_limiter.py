@@ -0,0 +1,31 @@
+from product_comparison_service.suppliers.rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_limits_bursts():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, burst=2, clock=clock)
+
+    assert bucket.try_take()
+    assert bucket.try_take()
+    assert not bucket.try_take()
+
+
+def test_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    bucket.try_take(2)
+
+    clock.now = 0.5
+    assert bucket.try_take()
+    assert not bucket.try_take()
+
+    clock.now = 10
+    assert bucket.tokens == 2
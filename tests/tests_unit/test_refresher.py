@@ -0,0 +1,150 @@
+import pytest
+from datetime import timedelta
+from unittest import mock
+
+from product_comparison_service.cache.search_cache import SearchCache
+from product_comparison_service.database.database import (
+    get_database_conn_and_cursor,
+    setup_database,
+)
+from product_comparison_service.database.pool import AsyncConnectionPool
+from product_comparison_service.handlers.handlers import dict_factory
+from product_comparison_service.suppliers.refresher import PriceRefresher
+
+# 2020-10-17T12:00:00 UTC
+NOW = 1602936000
+
+
+def make_result(supplier, product, age, price=1.0):
+    return {
+        "supplier": supplier,
+        "product": product,
+        "price": price,
+        "last_updated": NOW - int(age.total_seconds()),
+    }
+
+
+def make_refresher(supplier_clients=None, pool=None, cache=None, **kwargs):
+    return PriceRefresher(
+        cache or SearchCache(),
+        pool,
+        supplier_clients,
+        refetch_limit=timedelta(hours=1),
+        refresh_ahead=timedelta(minutes=10),
+        interval=1,
+        now=lambda: NOW,
+        **kwargs
+    )
+
+
+def test_plan_ranks_popular_offers_due_to_go_stale():
+
+    # Arrange
+    refresher = make_refresher()
+    fresh = make_result("iPet", "dog", timedelta(minutes=5))
+    due = make_result("iPet", "wolf", timedelta(minutes=55))
+    stale = make_result("DavesPets", "dog", timedelta(hours=2))
+    popular = make_result("DavesPets", "wolf", timedelta(minutes=55))
+    for _ in range(5):
+        refresher.record([fresh, due, stale, popular])
+    for _ in range(10):
+        refresher.record([popular])
+
+    # Act
+    planned = refresher.plan()
+
+    # Assert
+    assert planned == [popular, stale, due]
+
+
+def test_plan_within_rate_limits():
+
+    # Arrange
+    refresher = make_refresher(rate_limit=3, supplier_rate_limit=2)
+    results = [
+        make_result(supplier, product, timedelta(hours=2))
+        for supplier in ["iPet", "DavesPets"]
+        for product in ["dog", "wolf", "gorilla"]
+    ]
+    refresher.record(results)
+
+    # Act
+    first = refresher.plan()
+    second = refresher.plan()
+
+    # Assert
+    assert len(first) == 3
+    assert sorted(result["supplier"] for result in first).count("iPet") <= 2
+    assert second == []
+
+
+def test_stale_flags_are_not_recorded():
+
+    # Arrange
+    refresher = make_refresher()
+    result = make_result("iPet", "dog", timedelta(hours=2))
+
+    # Act
+    refresher.record([dict(result, stale=True)])
+    planned = refresher.plan()
+
+    # Assert
+    assert planned == [result]
+    assert "stale" not in planned[0]
+
+
+def test_cold_offers_are_dropped():
+
+    # Arrange
+    refresher = make_refresher(hit_decay=0.5, min_hits=1)
+    cold = make_result("iPet", "dog", timedelta(hours=2))
+    popular = make_result("iPet", "wolf", timedelta(hours=2))
+    refresher.record([cold, popular, popular])
+    refresher.record([popular])
+
+    # Act
+    refresher._decay()
+    planned = refresher.plan()
+
+    # Assert
+    assert len(refresher) == 1
+    assert planned == [popular]
+
+
+@pytest.mark.asyncio
+async def test_refresh_writes_back_and_updates_cache(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    setup_database(database)
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.executescript("""
+        INSERT INTO product VALUES ('dog', 'Good', 'Canines', 1602928800, 0.2);
+        INSERT INTO supplier VALUES ('iPet', 'www.ipet.com/animals', 0.1);
+        INSERT INTO supplier_product (supplier, product, price) VALUES ('iPet', 'dog', 7);
+        """)
+    conn.close()
+    pool = AsyncConnectionPool(database, size=1, row_factory=dict_factory)
+    cache = SearchCache()
+    stale = make_result("iPet", "dog", timedelta(hours=2), price=7)
+    cache[("dog", None, 100, None)] = [stale]
+    refreshed = dict(stale, price=8, last_updated=NOW)
+    supplier_clients = mock.MagicMock()
+    supplier_clients.refresh = mock.AsyncMock(return_value={("iPet", "dog"): refreshed})
+    refresher = make_refresher(supplier_clients, pool, cache)
+    refresher.record([stale])
+
+    # Act
+    count = await refresher.refresh()
+    await pool.close()
+
+    # Assert
+    assert count == 1
+    suppliers, planned = supplier_clients.refresh.call_args[0]
+    assert list(suppliers) == ["iPet"]
+    assert planned == [stale]
+    assert cache[("dog", None, 100, None)] == [refreshed]
+    conn, cursor = get_database_conn_and_cursor(database)
+    cursor.execute("SELECT price, last_updated FROM supplier_product")
+    assert cursor.fetchall() == [(8, NOW)]
+    assert refresher.plan() == []
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+
+import pytest
+
+from product_comparison_service.database.rows import (
+    Row,
+    drop_values,
+    replace_values,
+    row_factory,
+    sizeof_rows,
+)
+from product_comparison_service.timestamps import serialize_results
+
+
+def select_rows(sql):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = row_factory
+    rows = conn.execute(sql).fetchall()
+    conn.close()
+    return rows
+
+
+def test_rows_read_like_dicts():
+
+    # Act
+    rows = select_rows(
+        "SELECT 'coyotee' AS product, 1.5 AS price, 1602908100 AS last_updated"
+        " UNION ALL SELECT 'dog', 2.5, 1602908100"
+    )
+
+    # Assert
+    assert isinstance(rows[0], Row)
+    assert type(rows[0]) is type(rows[1])
+    assert rows[0]["product"] == "coyotee"
+    assert rows[1][1] == 2.5
+    assert rows[0].get("supplier") is None
+    assert "price" in rows[0] and "supplier" not in rows[0]
+    assert dict(rows[0]) == {
+        "product": "coyotee",
+        "price": 1.5,
+        "last_updated": 1602908100,
+    }
+    with pytest.raises(KeyError):
+        rows[0]["supplier"]
+
+
+def test_rows_share_column_names():
+
+    # Arrange
+    rows = select_rows("SELECT 'coyotee' AS product, 1.5 AS price")
+    other_rows = select_rows("SELECT 'dog' AS product, 2.5 AS price")
+    as_dicts = [dict(row) for row in rows]
+
+    # Assert
+    assert type(rows[0]) is type(other_rows[0])
+    assert sizeof_rows(rows) < sizeof_rows(as_dicts)
+
+
+def test_replace_values_keeps_row_type():
+
+    # Arrange
+    row = select_rows("SELECT 'coyotee' AS product, 1.5 AS price")[0]
+
+    # Act
+    replaced = replace_values(row, price=2.5)
+    replaced_dict = replace_values({"product": "dog", "price": 1.5}, price=2.5)
+
+    # Assert
+    assert isinstance(replaced, Row)
+    assert dict(replaced) == {"product": "coyotee", "price": 2.5}
+    assert row["price"] == 1.5
+    assert replaced_dict == {"product": "dog", "price": 2.5}
+
+
+def test_drop_values_keeps_row_type():
+
+    # Arrange
+    row = select_rows("SELECT 0 AS search, 'coyotee' AS product, 1.5 AS price")[0]
+
+    # Act
+    dropped = drop_values(row, "search")
+    dropped_dict = drop_values({"search": 0, "product": "dog"}, "search")
+
+    # Assert
+    assert isinstance(dropped, Row)
+    assert dict(dropped) == {"product": "coyotee", "price": 1.5}
+    assert dropped_dict == {"product": "dog"}
+
+
+def test_serialize_rows_to_json():
+
+    # Arrange
+    rows = select_rows("SELECT 'coyotee' AS product, 1602908100 AS last_updated")
+
+    # Act
+    serialized = json.dumps(serialize_results(rows))
+
+    # Assert
+    assert json.loads(serialized) == [
+        {"product": "coyotee", "last_updated": "2020-10-17T04:15:00.000000"}
+    ]
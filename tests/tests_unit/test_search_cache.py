@@ -0,0 +1,147 @@
+from datetime import timedelta
+import pytest
+
+from product_comparison_service.cache.search_cache import SearchCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(cache_len=10, ttl_seconds=60):
+    clock = FakeClock()
+    cache = SearchCache(
+        cache_len=cache_len, ttl=timedelta(seconds=ttl_seconds), clock=clock
+    )
+    return cache, clock
+
+
+def test_search_cache_hit():
+    cache, _ = make_cache()
+    cache[("coyotee", "Canines")] = [{"product": "coyotee"}]
+
+    assert ("coyotee", "Canines") in cache
+    assert cache.get(("coyotee", "Canines")) == [{"product": "coyotee"}]
+
+
+def test_search_cache_miss():
+    cache, _ = make_cache()
+
+    assert cache.get(("coyotee", None)) is None
+    with pytest.raises(KeyError):
+        cache[("coyotee", None)]
+
+
+def test_search_cache_expiry():
+    cache, clock = make_cache(ttl_seconds=60)
+    cache[("coyotee", None)] = []
+
+    clock.now = 59
+    assert cache.get(("coyotee", None)) == []
+
+    clock.now = 60
+    assert cache.get(("coyotee", None)) is None
+    assert len(cache) == 0
+
+
+def test_search_cache_length_limited():
+    cache, _ = make_cache(cache_len=2)
+    cache[("one", None)] = []
+    cache[("two", None)] = []
+    cache.get(("one", None))
+    cache[("three", None)] = []
+
+    assert ("one", None) in cache
+    assert ("two", None) not in cache
+    assert ("three", None) in cache
+
+
+def test_search_cache_invalidate():
+    cache, _ = make_cache()
+    cache[("coyotee", "Canines")] = [{"product": "coyotee"}]
+    cache[("coyotee", None)] = [{"product": "coyotee"}]
+    cache[(None, "Canines")] = [{"product": "dog"}]
+    cache[(None, "Great Apes")] = [{"product": "gorilla"}]
+    cache[(None, "Birds")] = [{"product": "coyotee"}]
+    cache[(None, None)] = [{"product": "dog"}]
+    cache[("dog", None)] = [{"product": "dog"}]
+
+    evicted = cache.invalidate("coyotee", "Canines")
+
+    assert evicted == 5
+    assert list(cache._entries) == [(None, "Great Apes"), ("dog", None)]
+
+
+def test_search_cache_invalidate_without_category():
+    cache, _ = make_cache()
+    cache[(None, "Canines")] = [{"product": "dog"}]
+    cache[(None, "Birds")] = [{"product": "owl"}]
+
+    evicted = cache.invalidate("owl")
+
+    assert evicted == 1
+    assert (None, "Canines") in cache
+
+
+def test_search_cache_invalidate_many():
+    cache, _ = make_cache()
+    cache[("coyotee", None)] = [{"product": "coyotee"}]
+    cache[(None, "Canines")] = [{"product": "dog"}]
+    cache[(None, "Great Apes")] = [{"product": "gorilla"}]
+    cache[(None, "Birds")] = [{"product": "owl"}]
+    cache[("dog", None)] = [{"product": "dog"}]
+
+    evicted = cache.invalidate_many([("coyotee", "Canines"), ("owl", None)])
+
+    assert evicted == 3
+    assert list(cache._entries) == [(None, "Great Apes"), ("dog", None)]
+
+
+def test_search_cache_invalidation_generation():
+    cache, _ = make_cache()
+    generation = cache.generation
+
+    cache.invalidate("coyotee")
+    invalidated = cache.generation
+    cache.clear()
+
+    assert invalidated == generation + 1
+    assert cache.generation == generation + 2
+
+
+def test_search_cache_bytes_limited():
+    clock = FakeClock()
+    cache = SearchCache(cache_len=10, clock=clock, max_bytes=10, sizeof=len)
+    cache[("one", None)] = [{"product": "dog"}] * 4
+    cache[("two", None)] = [{"product": "dog"}] * 4
+    cache.get(("one", None))
+    cache[("three", None)] = [{"product": "dog"}] * 4
+    cache[("huge", None)] = [{"product": "dog"}] * 11
+
+    assert ("one", None) in cache
+    assert ("two", None) not in cache
+    assert ("three", None) in cache
+    assert ("huge", None) not in cache
+    assert cache.bytes == 8
+
+    cache.invalidate("one")
+    assert cache.bytes == 4
+
+
+def test_search_cache_stats():
+    clock = FakeClock()
+    cache = SearchCache(
+        cache_len=2, ttl=timedelta(seconds=60), clock=clock, policy="w-tinylfu"
+    )
+    cache[("coyotee", None)] = []
+    cache.get(("coyotee", None))
+    clock.now = 60
+    cache.get(("coyotee", None))
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert len(cache) == 0
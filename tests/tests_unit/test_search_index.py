@@ -0,0 +1,140 @@
+import aiosqlite
+import pytest
+
+from product_comparison_service.app import prepare_database
+from product_comparison_service.database.database import (
+    search_by_product_or_category,
+    select_search_results,
+    update_supplier_product_data,
+)
+from product_comparison_service.database.rows import replace_values, row_factory
+from product_comparison_service.database.search_index import SearchIndex
+
+
+def offers(results):
+    return [(result["supplier"], result["product"]) for result in results]
+
+
+async def load_index(conn, cursor):
+    index = SearchIndex()
+    index.load(await select_search_results(conn, cursor))
+    return index
+
+
+@pytest.mark.asyncio
+async def test_search_index_matches_database(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    prepare_database(database, seed=True)
+
+    async with aiosqlite.connect(database) as conn:
+        conn.row_factory = row_factory
+        cursor = await conn.cursor()
+        index = await load_index(conn, cursor)
+        everything = await search_by_product_or_category(conn, cursor)
+        searches = [(None, None)]
+        searches += [(result["product"], None) for result in everything]
+        searches += [(None, result["category"]) for result in everything]
+        searches += [(result["product"], "Canines") for result in everything]
+
+        for product, category in set(searches):
+            for limit in [-1, 1, 2]:
+                # Act
+                after = None
+                indexed, searched = [], []
+                while True:
+                    page = index.search(product, category, limit, after)
+                    indexed += offers(page)
+                    searched += offers(
+                        await search_by_product_or_category(
+                            conn, cursor, product, category, limit, after
+                        )
+                    )
+                    if limit < 0 or len(page) < limit:
+                        break
+                    after = (
+                        page[-1]["combined_rating"],
+                        page[-1]["supplier"],
+                        page[-1]["product"],
+                    )
+
+                # Assert
+                assert indexed == searched, (product, category, limit)
+
+
+@pytest.mark.asyncio
+async def test_search_index_follows_writes(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    prepare_database(database, seed=True)
+
+    async with aiosqlite.connect(database) as conn:
+        conn.row_factory = row_factory
+        cursor = await conn.cursor()
+        index = await load_index(conn, cursor)
+        dog = index.search("dog")[0]
+
+        # Act
+        await update_supplier_product_data(
+            conn, cursor, "dog", "Good", "Pets", 1.0, "iPet", 1.0, 1602908100
+        )
+        index.replace_product("dog", await select_search_results(conn, cursor, "dog"))
+        refreshed = replace_values(dog, price=0.5, last_updated=dog["last_updated"] + 1)
+        replaced = index.update_results(
+            [refreshed, replace_values(dog, last_updated=0)]
+        )
+
+        # Assert
+        assert replaced == 1
+        assert offers(index.search("dog")) == offers(
+            await search_by_product_or_category(conn, cursor, "dog")
+        )
+        assert offers(index.search(category="Pets")) == offers(index.search("dog"))
+        assert "dog" not in [
+            result["product"] for result in index.search(category="Canines")
+        ]
+        assert offers(index.search()) == offers(
+            await search_by_product_or_category(conn, cursor)
+        )
+        assert 0.5 in [result["price"] for result in index.search("dog")]
+
+
+@pytest.mark.asyncio
+async def test_search_index_text_search(tmp_path):
+
+    # Arrange
+    database = str(tmp_path / "test.db")
+    prepare_database(database, seed=True)
+
+    async with aiosqlite.connect(database) as conn:
+        conn.row_factory = row_factory
+        cursor = await conn.cursor()
+        index = await load_index(conn, cursor)
+        ranking = index.search()
+
+        # Act
+        typo = index.search(text="cyote")
+        first_page = index.search(text="fr", limit=2)
+        last_result = first_page[-1]
+        second_page = index.search(
+            text="fr",
+            after=(
+                last_result["combined_rating"],
+                last_result["supplier"],
+                last_result["product"],
+            ),
+        )
+        canines = index.search(category="Canines", text="o")
+        dog = index.search("dog", text="best friend")
+
+        # Assert
+        assert offers(typo) == offers(index.search("coyotee"))
+        # Matches keep their order in the ranking
+        assert offers(first_page + second_page) == [
+            offer for offer in offers(ranking) if offer[1] in {"dog", "gorilla"}
+        ]
+        assert offers(canines) == offers(index.search("coyotee"))
+        assert offers(dog) == offers(index.search("dog"))
+        assert index.search("wolf", text="best friend") == []
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+
+from product_comparison_service.cache.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_singleflight_coalesces_concurrent_calls():
+
+    # Arrange
+    singleflight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    # Act
+    results = await asyncio.gather(*[singleflight.do("key", work) for _ in range(5)])
+
+    # Assert
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert "key" not in singleflight
+
+
+@pytest.mark.asyncio
+async def test_singleflight_separate_keys():
+
+    # Arrange
+    singleflight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    # Act
+    await asyncio.gather(singleflight.do("one", work), singleflight.do("two", work))
+
+    # Assert
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_singleflight_shares_exceptions():
+
+    # Arrange
+    singleflight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("supplier down")
+
+    # Act
+    results = await asyncio.gather(
+        singleflight.do("key", work),
+        singleflight.do("key", work),
+        return_exceptions=True,
+    )
+
+    # Assert
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(singleflight) == 0
+
+
+@pytest.mark.asyncio
+async def test_singleflight_runs_again_after_completion():
+
+    # Arrange
+    singleflight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+
+    # Act
+    await singleflight.do("key", work)
+    await singleflight.do("key", work)
+
+    # Assert
+    assert len(calls) == 2
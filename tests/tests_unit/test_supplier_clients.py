@@ -0,0 +1,242 @@
+import asyncio
+import sys
+import time
+import pytest
+from unittest import mock
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+
+from product_comparison_service.data_classes.data_classes import Supplier
+from product_comparison_service.suppliers.clients import (
+    DummySupplierClient,
+    HTTPSupplierClient,
+    SupplierClients,
+    make_http_client,
+    supplier_url,
+)
+
+
+def make_result(supplier, product, price=1.0):
+    return {
+        "product": product,
+        "supplier": supplier,
+        "price": price,
+        "last_updated": "2020-10-10T09:22:37.398697",
+    }
+
+
+@pytest.mark.asyncio
+async def test_http_client_batches_per_supplier(supplier_stub):
+
+    # Arrange
+    supplier_stub.prices = {
+        "iPet": {"coyotee": 6.5, "dog": 8},
+        "DavesPets": {"dog": 0.2},
+    }
+    suppliers = {
+        name: Supplier(name=name, pull_url=supplier_stub.pull_url(name))
+        for name in ["iPet", "DavesPets"]
+    }
+    client = HTTPSupplierClient()
+    supplier_clients = SupplierClients(default=client)
+    stale_results = [
+        make_result("iPet", "coyotee"),
+        make_result("iPet", "dog"),
+        make_result("DavesPets", "dog"),
+    ]
+
+    # Act
+    updated_results = await supplier_clients.refresh(suppliers, stale_results)
+    client.close()
+
+    # Assert
+    assert sorted(supplier_stub.requests) == [
+        ("DavesPets", ["dog"]),
+        ("iPet", ["coyotee", "dog"]),
+    ]
+    assert updated_results[("iPet", "coyotee")]["price"] == 6.5
+    assert updated_results[("iPet", "dog")]["price"] == 8
+    assert updated_results[("DavesPets", "dog")]["price"] == 0.2
+    assert (
+        updated_results[("iPet", "dog")]["last_updated"] != "2020-10-10T09:22:37.398697"
+    )
+    assert stale_results[0]["price"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_http_client_splits_batches(supplier_stub):
+
+    # Arrange
+    supplier_stub.prices = {"iPet": {"coyotee": 6.5, "dog": 8, "wolf": 9}}
+    supplier = Supplier(name="iPet", pull_url=supplier_stub.pull_url("iPet"))
+    client = HTTPSupplierClient(batch_size=2)
+
+    # Act
+    prices = await client.fetch_prices(
+        supplier,
+        [make_result("iPet", product) for product in ["wolf", "coyotee", "dog"]],
+    )
+    client.close()
+
+    # Assert
+    assert len(supplier_stub.requests) == 2
+    assert prices == {"coyotee": 6.5, "dog": 8, "wolf": 9}
+
+
+@pytest.mark.asyncio
+async def test_unpriced_products_left_out(supplier_stub):
+
+    # Arrange
+    supplier_stub.prices = {"iPet": {"coyotee": 6.5}}
+    suppliers = {"iPet": Supplier(name="iPet", pull_url=supplier_stub.pull_url("iPet"))}
+    client = HTTPSupplierClient()
+
+    # Act
+    updated_results = await SupplierClients(default=client).refresh(
+        suppliers, [make_result("iPet", "coyotee"), make_result("iPet", "dog")]
+    )
+    client.close()
+
+    # Assert
+    assert list(updated_results) == [("iPet", "coyotee")]
+
+
+@pytest.mark.asyncio
+async def test_clients_keyed_on_pull_url():
+
+    # Arrange
+    default = DummySupplierClient(delay=0)
+    registered = DummySupplierClient(delay=0)
+    supplier_clients = SupplierClients(default=default)
+    supplier_clients.register("www.ipet.com/animals", registered)
+
+    # Act / Assert
+    assert (
+        supplier_clients.client_for(Supplier("iPet", "www.ipet.com/animals"))
+        is registered
+    )
+    assert (
+        supplier_clients.client_for(Supplier("CheapPets", "www.cheap-pets.com"))
+        is default
+    )
+
+
+def test_supplier_url():
+    assert supplier_url(Supplier("iPet", "www.ipet.com/animals")) == (
+        "http://www.ipet.com/animals"
+    )
+    assert supplier_url(Supplier("iPet", "https://ipet.com")) == "https://ipet.com"
+
+
+@pytest.mark.asyncio
+async def test_http_client_warns_without_pycurl(caplog):
+
+    # Arrange
+    with mock.patch.dict(sys.modules, {"tornado.curl_httpclient": None}):
+
+        # Act
+        http_client = make_http_client(max_clients=5)
+
+    # Assert
+    assert isinstance(http_client, SimpleAsyncHTTPClient)
+    assert "pycurl is not installed" in caplog.text
+    http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_supplier_times_out(supplier_stub):
+
+    # Arrange
+    supplier_stub.prices = {"iPet": {"dog": 8}, "DavesPets": {"dog": 0.2}}
+    supplier_stub.delays = {"iPet": 1}
+    suppliers = {
+        name: Supplier(name=name, pull_url=supplier_stub.pull_url(name))
+        for name in ["iPet", "DavesPets"]
+    }
+    client = HTTPSupplierClient()
+    supplier_clients = SupplierClients(default=client, supplier_timeout=0.1)
+
+    # Act
+    updated_results = await supplier_clients.refresh(
+        suppliers, [make_result("iPet", "dog"), make_result("DavesPets", "dog")]
+    )
+    client.close()
+
+    # Assert
+    assert list(updated_results) == [("DavesPets", "dog")]
+    assert supplier_clients.breaker_for(suppliers["iPet"]).failures == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_bounded_by_budget(supplier_stub):
+
+    # Arrange
+    supplier_stub.prices = {"iPet": {"dog": 8}}
+    supplier_stub.delays = {"iPet": 1}
+    suppliers = {"iPet": Supplier(name="iPet", pull_url=supplier_stub.pull_url("iPet"))}
+    client = HTTPSupplierClient()
+    supplier_clients = SupplierClients(default=client, supplier_timeout=5, budget=0.1)
+
+    # Act
+    started = time.monotonic()
+    updated_results = await supplier_clients.refresh(
+        suppliers, [make_result("iPet", "dog")]
+    )
+    elapsed = time.monotonic() - started
+    client.close()
+
+    # Assert
+    assert updated_results == {}
+    assert elapsed < 0.5
+
+
+@pytest.mark.asyncio
+async def test_failing_supplier_opens_circuit(supplier_stub):
+
+    # Arrange
+    supplier_stub.failing = {"iPet"}
+    suppliers = {"iPet": Supplier(name="iPet", pull_url=supplier_stub.pull_url("iPet"))}
+    client = HTTPSupplierClient()
+    supplier_clients = SupplierClients(default=client, failure_threshold=2)
+
+    # Act
+    for _ in range(3):
+        updated_results = await supplier_clients.refresh(
+            suppliers, [make_result("iPet", "dog")]
+        )
+    client.close()
+
+    # Assert
+    assert updated_results == {}
+    assert len(supplier_stub.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_share_offers(supplier_stub):
+
+    # Arrange
+    supplier_stub.prices = {"iPet": {"coyotee": 6.5, "dog": 8, "wolf": 9}}
+    supplier_stub.delays = {"iPet": 0.1}
+    suppliers = {"iPet": Supplier(name="iPet", pull_url=supplier_stub.pull_url("iPet"))}
+    client = HTTPSupplierClient()
+    supplier_clients = SupplierClients(default=client)
+
+    # Act
+    canines, dogs = await asyncio.gather(
+        supplier_clients.refresh(
+            suppliers, [make_result("iPet", "coyotee"), make_result("iPet", "dog")]
+        ),
+        supplier_clients.refresh(
+            suppliers, [make_result("iPet", "dog"), make_result("iPet", "wolf")]
+        ),
+    )
+    client.close()
+
+    # Assert
+    assert sorted(supplier_stub.requests) == [
+        ("iPet", ["coyotee", "dog"]),
+        ("iPet", ["wolf"]),
+    ]
+    assert canines[("iPet", "dog")]["price"] == 8
+    assert dogs[("iPet", "dog")]["price"] == 8
+    assert dogs[("iPet", "wolf")]["price"] == 9
+    assert len(supplier_clients.planner) == 0
@@ -0,0 +1,85 @@
+from product_comparison_service.database.text_index import (
+    TextIndex,
+    prefix_distance,
+    tokenize,
+)
+
+
+def make_index():
+    index = TextIndex()
+    index.add("coyotee", "Oportunistic")
+    index.add("dog", "Man's best friend")
+    index.add("orangutan", "Ball of evervescent orange fury")
+    index.add("chimpanzee", "Humanish, all to humanish")
+    return index
+
+
+def test_tokenize():
+
+    # Act / Assert
+    assert tokenize("Man's best-friend") == ["man", "s", "best", "friend"]
+    assert tokenize(None) == []
+
+
+def test_prefix_distance():
+
+    # Act / Assert
+    assert prefix_distance("coyote", "coyotee", 1) == 0
+    assert prefix_distance("cyote", "coyotee", 1) == 1
+    assert prefix_distance("coyoet", "coyotee", 1) == 1
+    assert prefix_distance("kyote", "coyotee", 1) == 2
+
+
+def test_match_prefixes():
+
+    # Arrange
+    index = make_index()
+
+    # Act / Assert
+    assert index.match("coy") == {"coyotee"}
+    assert index.match("Oran") == {"orangutan"}
+    assert index.match("o") == {"coyotee", "orangutan"}
+    assert index.match("be") == {"dog"}
+    assert index.match("cat") == set()
+
+
+def test_match_tolerates_typos():
+
+    # Arrange
+    index = make_index()
+
+    # Act / Assert
+    assert index.match("cyote") == {"coyotee"}
+    assert index.match("coyoet") == {"coyotee"}
+    assert index.match("chimpanzeee") == {"chimpanzee"}
+    assert index.match("chimapnze") == {"chimpanzee"}
+    # Short words must match exactly
+    assert index.match("dgo") == set()
+
+
+def test_match_every_word():
+
+    # Arrange
+    index = make_index()
+
+    # Act / Assert
+    assert index.match("orange fury") == {"orangutan"}
+    assert index.match("best friend") == {"dog"}
+    assert index.match("best fury") == set()
+
+
+def test_remove():
+
+    # Arrange
+    index = make_index()
+
+    # Act
+    index.remove("orangutan")
+    index.add("dog", "Loyal")
+
+    # Assert
+    assert index.match("o") == {"coyotee"}
+    assert index.match("loyal") == {"dog"}
+    assert index.match("best") == set()
+    assert len(index) == 3
+    assert "orangutan" not in index
@@ -0,0 +1,40 @@
+import pytest
+
+from product_comparison_service.timestamps import (
+    serialize_results,
+    to_epoch,
+    to_iso,
+)
+
+
+def test_timestamps_round_trip_in_utc():
+
+    # Act
+    timestamp = to_epoch("2020-10-17T04:15:00.000")
+
+    # Assert
+    assert timestamp == 1602908100
+    assert to_epoch(1602908100.5) == timestamp
+    assert to_iso(timestamp) == "2020-10-17T04:15:00.000000"
+
+
+def test_to_epoch_rejects_other_formats():
+
+    # Act / Assert
+    with pytest.raises(ValueError):
+        to_epoch("17/10/2020")
+
+
+def test_serialize_results_copies_rows():
+
+    # Arrange
+    results = [{"product": "dog", "last_updated": 1602908100}]
+
+    # Act
+    serialized = serialize_results(results)
+
+    # Assert
+    assert serialized == [
+        {"product": "dog", "last_updated": "2020-10-17T04:15:00.000000"}
+    ]
+    assert results[0]["last_updated"] == 1602908100
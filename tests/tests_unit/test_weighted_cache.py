@@ -0,0 +1,120 @@
+import pytest
+
+from product_comparison_service.cache.policies import FrequencySketch
+from product_comparison_service.cache.weighted_cache import WeightedCache
+
+
+def fill(cache, keys):
+    for key in keys:
+        cache.get(key)
+        cache[key] = key
+
+
+def test_weighted_cache_counters():
+
+    # Arrange
+    cache = WeightedCache(2)
+
+    # Act
+    fill(cache, ["one", "two", "three"])
+    cache.get("three")
+
+    # Assert
+    assert cache.stats() == {
+        "length": 2,
+        "weight": 2,
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+        "rejections": 0,
+    }
+    with pytest.raises(KeyError):
+        cache["one"]
+
+
+def test_weighted_cache_limits_total_weight():
+
+    # Arrange
+    cache = WeightedCache(10, weigher=len, max_len=3)
+
+    # Act
+    cache["a"] = "xxxx"
+    cache["b"] = "xxxx"
+    cache.get("a")
+    cache["c"] = "xxxx"
+    cache["huge"] = "x" * 11
+    cache["d"] = "x"
+    cache["e"] = "x"
+
+    # Assert
+    assert list(cache) == ["c", "d", "e"]
+    assert cache.weight == 6
+    assert cache.rejections == 1
+    assert cache.evictions == 2
+
+
+def test_lfu_policy_evicts_least_used():
+
+    # Arrange
+    cache = WeightedCache(2, policy="lfu")
+    fill(cache, ["one", "two"])
+    cache.get("one")
+    cache.get("one")
+    cache.get("two")
+
+    # Act
+    cache["three"] = 3
+    cache["four"] = 4
+
+    # Assert
+    assert set(cache) == {"one", "four"}
+
+
+@pytest.mark.parametrize("policy", ["tinylfu", "w-tinylfu"])
+def test_tinylfu_policies_resist_scans(policy):
+
+    # Arrange
+    cache = WeightedCache(10, policy=policy)
+    popular = [f"popular{i}" for i in range(8)]
+    for _ in range(5):
+        fill(cache, popular)
+
+    # Act
+    fill(cache, [f"scan{i}" for i in range(100)])
+
+    # Assert
+    assert set(popular) <= set(cache)
+    assert len(cache) == 10
+    assert cache.rejections + cache.evictions == 98
+
+
+def test_lru_policy_is_wiped_by_scans():
+
+    # Arrange
+    cache = WeightedCache(10, policy="lru")
+    popular = [f"popular{i}" for i in range(8)]
+    for _ in range(5):
+        fill(cache, popular)
+
+    # Act
+    fill(cache, [f"scan{i}" for i in range(100)])
+
+    # Assert
+    assert not set(popular) & set(cache)
+
+
+def test_frequency_sketch_ages_counts():
+
+    # Arrange
+    sketch = FrequencySketch(16)
+    for _ in range(10):
+        sketch.increment("popular")
+
+    # Act
+    before = sketch.frequency("popular")
+    for i in range(10 * sketch.width):
+        sketch.increment(i)
+
+    # Assert
+    assert before == 10
+    assert sketch.frequency("popular") < before
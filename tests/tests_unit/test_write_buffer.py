@@ -0,0 +1,98 @@
+import asyncio
+import sqlite3
+import pytest
+
+from product_comparison_service.database.pool import AsyncConnectionPool
+from product_comparison_service.database.write_buffer import WriteBuffer
+
+
+def make_buffer(tmp_path, **kwargs) -> WriteBuffer:
+    database = str(tmp_path / "test.db")
+    with sqlite3.connect(database) as conn:
+        conn.execute("CREATE TABLE animal (name TEXT PRIMARY KEY)")
+    return WriteBuffer(AsyncConnectionPool(database, size=1), **kwargs)
+
+
+def insert(name: str):
+    async def write(conn, cursor):
+        await cursor.execute("INSERT INTO animal VALUES (?)", (name,))
+        return cursor.lastrowid
+
+    return write
+
+
+def select_names(tmp_path):
+    with sqlite3.connect(str(tmp_path / "test.db")) as conn:
+        return {name for name, in conn.execute("SELECT name FROM animal")}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_one_commit(tmp_path):
+
+    # Arrange
+    buffer = make_buffer(tmp_path, window=0.05)
+
+    # Act
+    results = await asyncio.gather(*(buffer.write(insert(str(i))) for i in range(5)))
+    committed = select_names(tmp_path)
+
+    # Assert
+    assert results == [1, 2, 3, 4, 5]
+    assert committed == {"0", "1", "2", "3", "4"}
+    assert buffer.stats() == {"writes": 5, "commits": 1}
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_failing_write_fails_alone(tmp_path):
+
+    # Arrange
+    buffer = make_buffer(tmp_path, window=0.05)
+
+    # Act
+    results = await asyncio.gather(
+        buffer.write(insert("dog")),
+        buffer.write(insert("dog")),
+        buffer.write(insert("cat")),
+        return_exceptions=True,
+    )
+
+    # Assert
+    assert results[0] == 1
+    assert isinstance(results[1], sqlite3.IntegrityError)
+    assert results[2] == 2
+    assert select_names(tmp_path) == {"dog", "cat"}
+    assert buffer.stats() == {"writes": 2, "commits": 1}
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_batches_are_bounded(tmp_path):
+
+    # Arrange
+    buffer = make_buffer(tmp_path, window=0.05, max_batch=2)
+
+    # Act
+    await asyncio.gather(*(buffer.write(insert(str(i))) for i in range(5)))
+
+    # Assert
+    assert buffer.stats() == {"writes": 5, "commits": 3}
+    await buffer.close()
+
+
+@pytest.mark.asyncio
+async def test_close_applies_pending_writes(tmp_path):
+
+    # Arrange
+    buffer = make_buffer(tmp_path, window=0.05)
+    pending = asyncio.ensure_future(buffer.write(insert("owl")))
+    await asyncio.sleep(0)
+
+    # Act
+    await buffer.close()
+
+    # Assert
+    assert pending.done() and pending.result() == 1
+    assert select_names(tmp_path) == {"owl"}
+    with pytest.raises(RuntimeError):
+        await buffer.write(insert("cat"))